@@ -0,0 +1,80 @@
+"""
+Execution helpers for running blocking service calls from async routes
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+import logging
+
+from ..utils.metrics import timed
+from ..utils.profiling import run_sampled
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCapacityError(Exception):
+    """Raised when no generation slot frees up within the configured wait"""
+
+
+class BlockingExecutor:
+    """Offloads blocking calls to a managed thread pool and limits concurrent generations"""
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        max_concurrent_generations: int = 4,
+        slot_timeout: Optional[float] = None
+    ):
+        self.max_workers = max_workers
+        self.max_concurrent_generations = max_concurrent_generations
+        self.slot_timeout = slot_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="meme-blocking")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.active_generations = 0
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking callable in the pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        # Carry context variables into the worker thread, like asyncio.to_thread does
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, run_sampled, func, *args, **kwargs)
+        return await loop.run_in_executor(self._pool, call)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the generation semaphore bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_generations)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    @asynccontextmanager
+    async def generation_slot(self, bounded_wait: bool = True) -> AsyncIterator[None]:
+        """Hold one of the limited generation slots for the duration of the block.
+
+        With bounded_wait=False the caller queues for a slot indefinitely, which suits
+        background jobs that have no client connection to time out.
+        """
+        semaphore = self._get_semaphore()
+        try:
+            timeout = self.slot_timeout if bounded_wait else None
+            with timed("slot_wait"):
+                await asyncio.wait_for(semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise GenerationCapacityError(
+                f"No generation slot available within {self.slot_timeout} seconds"
+            )
+        self.active_generations += 1
+        try:
+            yield
+        finally:
+            self.active_generations -= 1
+            semaphore.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Release worker threads"""
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,36 @@
+"""
+Debug-only routes for downloading request profiles
+"""
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from . import memes as memes_routes
+from ..services.request_profiler import RequestProfiler
+from ..core.config import settings
+
+router = APIRouter(prefix="/debug", tags=["debug"], include_in_schema=False)
+
+
+def get_debug_profiler() -> RequestProfiler:
+    """Get the request profiler, hiding these routes unless debug mode and profiling are on"""
+    profiler = memes_routes.get_request_profiler() if settings.debug else None
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return profiler
+
+
+@router.get("/profiles")
+async def list_profiles() -> Dict[str, Any]:
+    """List saved request profiles, newest first"""
+    profiler = get_debug_profiler()
+    return {"profiles": profiler.list_profiles(), **profiler.stats()}
+
+
+@router.get("/profiles/{name}")
+async def get_profile(name: str) -> FileResponse:
+    """Download a profile in collapsed-stack format, e.g. for flamegraph.pl or speedscope"""
+    path = get_debug_profiler().path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
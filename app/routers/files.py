@@ -0,0 +1,144 @@
+"""
+Routes serving rendered memes from the storage backend
+"""
+import hashlib
+import mimetypes
+import posixpath
+import re
+from typing import Dict, Optional, Tuple
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+
+from . import memes as memes_routes
+from ..schemas.meme_schemas import ErrorResponse
+from ..services.image_encoder import ImageEncoder
+from ..services.output_janitor import AccessThrottle
+from ..services.storage import STATIC_MEMES_PATH, CachingStorage, InvalidStorageKeyError, validate_key
+from ..utils.http_cache import RangeNotSatisfiableError, etag_matches, parse_byte_range
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["files"])
+
+# Served files count as used, so the output janitor evicts the least recently served first
+access_throttle = AccessThrottle(settings.output_access_record_interval_seconds)
+
+# Renders named by the hash of their inputs never change, so caches may keep them forever
+CONTENT_ADDRESSED_KEY = re.compile(r"^[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})\.[a-z0-9]+$")
+
+
+def cache_headers(key: str, data: bytes, variant: Optional[str] = None) -> Dict[str, str]:
+    """Validator and caching headers for a stored file or one of its variants"""
+    match = CONTENT_ADDRESSED_KEY.match(key)
+    if match:
+        tag = match.group("digest") + (f"-{variant}" if variant else "")
+        return {
+            "ETag": f'"{tag}"',
+            "Cache-Control": f"public, max-age={settings.static_cache_max_age_seconds}, immutable",
+            "Accept-Ranges": "bytes"
+        }
+    # Placeholders and other files may be replaced, so clients must revalidate them
+    return {
+        "ETag": f'"{hashlib.sha256(data).hexdigest()[:32]}"',
+        "Cache-Control": "no-cache",
+        "Accept-Ranges": "bytes"
+    }
+
+
+async def read_file(key: str) -> bytes:
+    """Read a stored file, from the in-memory render cache when possible"""
+    storage = memes_routes.get_storage()
+    data = storage.get_cached(key) if isinstance(storage, CachingStorage) else None
+    if data is None:
+        data = await memes_routes.get_blocking_executor().run(storage.get, key)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Meme not found")
+    return data
+
+
+async def record_access(key: str) -> None:
+    """Mark a served file as used, including files answered from memory"""
+    if access_throttle.should_record(key):
+        await memes_routes.get_blocking_executor().run(memes_routes.get_storage().touch, key)
+
+
+async def read_variant(key: str, width: Optional[int], output_format: Optional[str]) -> Tuple[bytes, str]:
+    """Get a resized or re-encoded variant of a stored file and its format"""
+    renderer = memes_routes.get_variant_renderer()
+    if width is not None and not renderer.is_allowed_width(width):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Width must be one of: {', '.join(str(w) for w in renderer.widths)}"
+        )
+    output_format = output_format or ImageEncoder.format_for_extension(posixpath.splitext(key)[1][1:])
+    if output_format is None or not ImageEncoder.is_supported(output_format):
+        raise HTTPException(status_code=400, detail=f"Output format '{output_format}' is not supported")
+
+    variant = renderer.get_cached(key, width, output_format)
+    if variant is None:
+        data = await read_file(key)
+        variant = await memes_routes.get_blocking_executor().run(renderer.render, key, data, width, output_format)
+    return variant, output_format
+
+
+def build_file_response(request: Request, data: bytes, media_type: str, headers: Dict[str, str]) -> Response:
+    """Answer conditional and range requests for a file's bytes"""
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # A stale If-Range validator means the client's partial copy is outdated: send everything
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == headers["ETag"]:
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), len(data))
+        except RangeNotSatisfiableError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(data)}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return Response(
+                content=data[start:end + 1],
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(data)}"}
+            )
+
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+@router.api_route(
+    STATIC_MEMES_PATH + "/{key:path}",
+    methods=["GET", "HEAD"],
+    responses={
+        400: {"model": ErrorResponse, "description": "Width or format not allowed"},
+        404: {"model": ErrorResponse, "description": "Meme not found"}
+    },
+    summary="Get a rendered meme",
+    description=(
+        "Serve a rendered meme image with ETag validation and byte range support. "
+        "Pass w and/or format for a resized or re-encoded variant, such as a grid thumbnail."
+    )
+)
+async def get_meme_file(
+    key: str,
+    request: Request,
+    w: Optional[int] = Query(default=None, description="Variant width; must be one of the allowed widths"),
+    output_format: Optional[str] = Query(default=None, alias="format", description="Variant image format")
+) -> Response:
+    """Serve a stored meme image or one of its variants"""
+    try:
+        key = validate_key(key)
+    except InvalidStorageKeyError:
+        raise HTTPException(status_code=404, detail="Meme not found")
+
+    if w is None and output_format is None:
+        data = await read_file(key)
+        await record_access(key)
+        media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        return build_file_response(request, data, media_type, cache_headers(key, data))
+
+    data, output_format = await read_variant(key, w, output_format)
+    await record_access(key)
+    headers = cache_headers(key, data, variant=f"w{w or 'full'}-{output_format}")
+    return build_file_response(request, data, ImageEncoder.content_type(output_format), headers)
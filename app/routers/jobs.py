@@ -0,0 +1,187 @@
+"""
+Asynchronous meme generation job API routes
+"""
+import asyncio
+import time
+from typing import Optional
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from . import memes as memes_routes
+from ..schemas.job_schemas import (
+    JobRecord,
+    JobResult,
+    JobStatus,
+    JobStatusResponse,
+    JobSubmitResponse
+)
+from ..schemas.meme_schemas import MemeGenerationRequest, MemeData, ErrorResponse
+from ..services.job_manager import JobManager, JobQueueFullError
+from ..services.job_store import create_job_store
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1", tags=["jobs"])
+
+# Global job manager instance, started and stopped with the application
+job_manager = None
+
+
+def get_job_manager() -> JobManager:
+    """Get the running job manager"""
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="Job queue is not running")
+    return job_manager
+
+
+async def start_job_manager() -> None:
+    """Create the configured job store and start the job workers"""
+    global job_manager
+    job_manager = JobManager(
+        store=create_job_store(settings.job_store_backend, settings.job_store_path),
+        runner=run_generation_job,
+        workers=settings.job_workers,
+        queue_size=settings.job_queue_size,
+        ttl_seconds=settings.job_ttl_seconds,
+        cleanup_interval_seconds=settings.job_cleanup_interval_seconds
+    )
+    await job_manager.start()
+
+
+async def stop_job_manager() -> None:
+    """Stop the job workers"""
+    global job_manager
+    if job_manager is not None:
+        await job_manager.stop()
+        job_manager = None
+
+
+async def run_generation_job(manager: JobManager, job: JobRecord) -> None:
+    """Generate and render the memes for a job, recording each meme as it finishes"""
+    start_time = time.time()
+    request_data = job.request
+    render_options = memes_routes.get_render_options(request_data)
+    executor = memes_routes.get_blocking_executor()
+
+    # Jobs wait for a free slot instead of timing out like interactive requests
+    async with executor.generation_slot(bounded_wait=False):
+        generator = memes_routes.get_meme_generator()
+        try:
+            meme_results, run_id = await memes_routes.request_meme_results(generator, executor, request_data)
+        except HTTPException as e:
+            manager.update(job, status=JobStatus.FAILED, error=e.detail)
+            return
+
+        output_dir = memes_routes.create_output_directory()
+        manager.update(
+            job,
+            total=len(meme_results),
+            run_id=run_id,
+            output_directory=memes_routes.get_storage().location
+        )
+
+        futures = memes_routes.get_render_pipeline().render_all(generator, meme_results, output_dir, **render_options)
+        pending = {asyncio.wrap_future(future): i for i, future in enumerate(futures, 1)}
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i = pending.pop(task)
+                try:
+                    result = JobResult(
+                        index=i,
+                        meme=MemeData(**meme_results[i - 1]),
+                        file_path=task.result(),
+                        format=render_options["output_format"]
+                    )
+                except Exception as e:
+                    logger.error(f"Job {job.id}: error generating meme {i}: {e}")
+                    manager.update(job, failed=job.failed + 1)
+                    continue
+                manager.update(job, completed=job.completed + 1, results=job.results + [result])
+
+    results = sorted(job.results, key=lambda result: result.index)
+    if results:
+        manager.update(job, status=JobStatus.COMPLETED, results=results, generation_time=time.time() - start_time)
+    else:
+        manager.update(
+            job,
+            status=JobStatus.FAILED,
+            error="Failed to generate any meme images",
+            generation_time=time.time() - start_time
+        )
+    logger.info(f"Job {job.id} finished with status {job.status.value}")
+
+
+def build_job_status(request: Request, job: JobRecord) -> JobStatusResponse:
+    """Build the public view of a job with URLs for the memes rendered so far"""
+    results = sorted(job.results, key=lambda result: result.index)
+    generated_files = [
+        memes_routes.build_meme_file(request, result.meme.model_dump(), result.file_path, result.index, result.format)
+        for result in results
+    ]
+    return JobStatusResponse(
+        success=job.status != JobStatus.FAILED,
+        job_id=job.id,
+        status=job.status,
+        total=job.total,
+        completed=job.completed,
+        failed=job.failed,
+        run_id=job.run_id,
+        meme_list=[meme_file.image_url for meme_file in generated_files],
+        memes=[result.meme for result in results],
+        generated_files=generated_files,
+        output_directory=job.output_directory,
+        error=job.error,
+        generation_time=job.generation_time,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
+
+@router.post(
+    "/jobs",
+    response_model=JobSubmitResponse,
+    status_code=202,
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request parameters"},
+        503: {"model": ErrorResponse, "description": "Job queue is full"}
+    },
+    summary="Submit a meme generation job",
+    description="Queue meme generation and return a job id immediately; poll the job for progress and results"
+)
+async def submit_job(request_data: MemeGenerationRequest, request: Request) -> JobSubmitResponse:
+    """Queue a meme generation job"""
+    memes_routes.resolve_render_options(request_data)
+    manager = get_job_manager()
+    try:
+        job = manager.submit(request_data)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting job submission: {e}")
+        raise HTTPException(status_code=503, detail="Job queue is full. Please retry shortly.")
+
+    return JobSubmitResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=str(request.url_for("get_job", job_id=job.id))
+    )
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobStatusResponse,
+    responses={404: {"model": ErrorResponse, "description": "Job not found"}},
+    summary="Get job progress and results",
+    description="Return progress and the memes rendered so far; pass wait to block until the job finishes"
+)
+async def get_job(
+    job_id: str,
+    request: Request,
+    wait: Optional[float] = Query(default=None, ge=0, le=60, description="Seconds to wait for the job to finish")
+) -> JobStatusResponse:
+    """Get the status of a meme generation job"""
+    manager = get_job_manager()
+    job = await manager.wait(job_id, wait) if wait else await manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return build_job_status(request, job)
@@ -1,12 +1,15 @@
 """
 Meme generation API routes
 """
+import asyncio
+import json
 import time
-import os
-from typing import Dict, Any
+import posixpath
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Any, AsyncIterator, List, Optional, Tuple, Union
 import logging
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from ..schemas.meme_schemas import (
     MemeGenerationRequest, 
@@ -15,7 +18,23 @@ from ..schemas.meme_schemas import (
     MemeData, 
     MemeFile
 )
-from ..services.meme_generator import SuperMemeGenerator
+from ..schemas.render_schemas import RenderRequest
+from ..services.meme_generator import SuperMemeGenerator, caption_layer_nbytes
+from ..services.font_registry import FontRegistry, DEFAULT_FONT_PATHS
+from ..services.text_layout import TextLayoutEngine
+from ..services.template_cache import TemplateCache, image_nbytes
+from ..services.image_encoder import ImageEncoder
+from ..services.render_pipeline import RenderPipeline
+from ..services.result_cache import ResultCache, create_result_cache, request_cache_key
+from ..services.single_flight import SingleFlight
+from ..services.output_janitor import OutputJanitor
+from ..services.storage import CachingStorage, MemeStorage, create_storage
+from ..services.variants import VariantRenderer
+from ..services.request_profiler import RequestProfiler
+from ..services.http_client import HttpClient
+from ..utils.lru import LRUCache
+from ..utils.metrics import STAGE_DURATION, StageTimings, collect_timings
+from ..core.concurrency import BlockingExecutor, GenerationCapacityError
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -25,6 +44,59 @@ router = APIRouter(prefix="/api/v1", tags=["memes"])
 # Global meme generator instance
 meme_generator = None
 
+# Global render pipeline instance
+render_pipeline = None
+
+# Global executor for blocking service calls
+blocking_executor = None
+
+# Global prompt-level result cache
+result_cache = None
+
+# Global coalescer for concurrent identical generation requests
+single_flight = None
+
+# Global janitor for the output directory, started and stopped with the application
+output_janitor = None
+
+# Global storage backend for rendered memes
+storage = None
+
+# Global renderer for resized and re-encoded variants of stored memes
+variant_renderer = None
+
+# Global sampling profiler for slow requests
+request_profiler = None
+
+
+def get_storage() -> MemeStorage:
+    """Get or create the configured storage backend for rendered memes"""
+    global storage
+    if storage is None:
+        storage = create_storage(
+            backend=settings.storage_backend,
+            directory=settings.output_directory,
+            bucket=settings.s3_bucket,
+            prefix=settings.s3_prefix,
+            public_url=settings.storage_public_url,
+            endpoint_url=settings.s3_endpoint_url,
+            region_name=settings.s3_region,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            memory_cache_bytes=settings.render_memory_cache_mb * 1024 * 1024
+        )
+    return storage
+
+
+def create_image_encoder() -> ImageEncoder:
+    """Build an image encoder with the configured quality settings"""
+    return ImageEncoder(
+        png_compress_level=settings.png_compress_level,
+        webp_quality=settings.webp_quality,
+        jpeg_quality=settings.jpeg_quality,
+        avif_quality=settings.avif_quality
+    )
+
 
 def get_meme_generator() -> SuperMemeGenerator:
     """Get or create meme generator instance"""
@@ -34,135 +106,525 @@ def get_meme_generator() -> SuperMemeGenerator:
             api_url=settings.supermeme_api_url,
             supabase_url=settings.supabase_url,
             supabase_api_key=settings.supabase_api_key,
-            mail_api_url=settings.mail_api_url
+            mail_api_url=settings.mail_api_url,
+            font_registry=FontRegistry(
+                font_paths=[settings.font_path] + DEFAULT_FONT_PATHS if settings.font_path else None,
+                cache_size=settings.font_cache_size
+            ),
+            layout_engine=TextLayoutEngine(cache_size=settings.layout_cache_size),
+            resized_template_cache=LRUCache(
+                max_bytes=settings.resized_template_cache_mb * 1024 * 1024,
+                sizeof=image_nbytes
+            ),
+            image_encoder=create_image_encoder(),
+            max_output_bytes=settings.max_file_size_mb * 1024 * 1024,
+            storage=get_storage(),
+            caption_layer_cache=LRUCache(
+                max_bytes=settings.caption_layer_cache_mb * 1024 * 1024,
+                sizeof=caption_layer_nbytes
+            ),
+            access_token=settings.supermeme_access_token,
+            http_client=HttpClient(
+                pool_size=settings.http_pool_size,
+                max_connections_per_host=settings.http_max_connections_per_host,
+                http2=settings.http2_enabled
+            ),
+            allow_private_templates=settings.template_allow_private_hosts
+        )
+        meme_generator.template_cache = TemplateCache(
+            cache_dir=settings.template_cache_directory,
+            fetch=meme_generator.fetch_template,
+            max_disk_bytes=settings.template_cache_max_disk_mb * 1024 * 1024,
+            max_memory_bytes=settings.template_cache_max_memory_mb * 1024 * 1024,
+            ttl_seconds=settings.template_cache_ttl_seconds
         )
     return meme_generator
 
 
-def generate_image_url(request: Request, file_path: str) -> str:
+def get_variant_renderer() -> VariantRenderer:
+    """Get or create the variant renderer"""
+    global variant_renderer
+    if variant_renderer is None:
+        variant_renderer = VariantRenderer(
+            encoder=create_image_encoder(),
+            widths=settings.variant_widths,
+            max_bytes=settings.variant_cache_mb * 1024 * 1024
+        )
+    return variant_renderer
+
+
+def get_render_pipeline() -> RenderPipeline:
+    """Get or create render pipeline instance"""
+    global render_pipeline
+    if render_pipeline is None:
+        render_pipeline = RenderPipeline(
+            download_workers=settings.download_workers,
+            render_workers=settings.render_workers
+        )
+    return render_pipeline
+
+
+def get_blocking_executor() -> BlockingExecutor:
+    """Get or create the executor used for blocking service calls"""
+    global blocking_executor
+    if blocking_executor is None:
+        blocking_executor = BlockingExecutor(
+            max_workers=settings.blocking_workers,
+            max_concurrent_generations=settings.max_concurrent_generations,
+            slot_timeout=settings.generation_slot_timeout_seconds
+        )
+    return blocking_executor
+
+
+def get_result_cache(request_data: MemeGenerationRequest) -> Optional[ResultCache]:
+    """Get the result cache, or None when caching is disabled for this request"""
+    global result_cache
+    if not settings.result_cache_enabled or not request_data.use_cache:
+        return None
+    if result_cache is None:
+        result_cache = create_result_cache(
+            backend=settings.result_cache_backend,
+            ttl_seconds=settings.result_cache_ttl_seconds,
+            max_entries=settings.result_cache_max_entries,
+            sqlite_path=settings.result_cache_path,
+            storage=get_storage()
+        )
+    return result_cache
+
+
+def get_request_profiler() -> Optional[RequestProfiler]:
+    """Get the request profiler, or None when profiling is disabled"""
+    global request_profiler
+    if not settings.profiling_enabled:
+        return None
+    if request_profiler is None:
+        request_profiler = RequestProfiler(
+            directory=settings.profile_directory,
+            sample_rate=settings.profile_sample_rate,
+            slow_threshold_seconds=settings.profile_slow_threshold_seconds,
+            interval_seconds=settings.profile_interval_ms / 1000,
+            max_files=settings.profile_max_files
+        )
+    return request_profiler
+
+
+def profile_request(request: Request, name: str) -> ContextManager:
+    """Sample the work of a request when the client asks for it or the sample rate picks it"""
+    profiler = get_request_profiler()
+    if profiler is None:
+        return nullcontext()
+    return profiler.profile(name, forced=settings.profile_header in request.headers)
+
+
+def get_single_flight() -> SingleFlight:
+    """Get or create the coalescer for identical generation requests"""
+    global single_flight
+    if single_flight is None:
+        single_flight = SingleFlight()
+    return single_flight
+
+
+async def start_output_janitor() -> None:
+    """Start enforcing retention limits on the output directory"""
+    global output_janitor
+    if settings.storage_backend != "local":
+        # Object stores handle retention with their own lifecycle rules
+        return
+    output_janitor = OutputJanitor(
+        directory=settings.output_directory,
+        max_age_seconds=settings.output_max_age_seconds,
+        max_total_bytes=settings.output_max_total_mb * 1024 * 1024,
+        max_files=settings.output_max_files,
+        interval_seconds=settings.output_janitor_interval_seconds,
+        batch_size=settings.output_janitor_batch_size,
+        scan_directories=settings.output_janitor_scan_directories
+    )
+    output_janitor.start()
+
+
+async def stop_output_janitor() -> None:
+    """Stop the output janitor"""
+    global output_janitor
+    if output_janitor is not None:
+        await output_janitor.stop()
+        output_janitor = None
+
+
+def shutdown_services() -> None:
+    """Release worker pools and caches owned by this router"""
+    global render_pipeline, blocking_executor, result_cache, single_flight
+    single_flight = None
+    if result_cache is not None:
+        result_cache.close()
+        result_cache = None
+    if render_pipeline is not None:
+        render_pipeline.shutdown(wait=False)
+        render_pipeline = None
+    if blocking_executor is not None:
+        blocking_executor.shutdown(wait=False)
+        blocking_executor = None
+    if meme_generator is not None:
+        # Connections reopen on demand if the application starts again
+        meme_generator.http_client.close()
+
+
+def get_render_options(request_data: Union[MemeGenerationRequest, RenderRequest]) -> Dict[str, Any]:
+    """Resolve per-request render options against the server defaults"""
+    return {
+        "resize_mode": request_data.resize_mode or settings.resize_mode,
+        "output_format": request_data.output_format or settings.output_format,
+        "quality": request_data.output_quality
+    }
+
+
+def generate_image_url(request: Request, key: str) -> str:
     """Generate HTTP URL for accessing the meme image"""
-    # Convert file path to URL path
-    relative_path = file_path.replace("\\", "/")  # Handle Windows paths
-    if relative_path.startswith("generated_memes/"):
-        relative_path = relative_path[len("generated_memes/"):]
-    
-    # Build full URL
     base_url = f"{request.url.scheme}://{request.url.netloc}"
-    image_url = f"{base_url}/static/memes/{relative_path}"
-    return image_url
+    return get_storage().url(key, base_url)
 
 
-@router.post(
-    "/generate-meme",
-    response_model=MemeGenerationResponse,
-    responses={
-        400: {"model": ErrorResponse, "description": "Invalid request parameters"},
-        500: {"model": ErrorResponse, "description": "Internal server error"},
-        503: {"model": ErrorResponse, "description": "Service temporarily unavailable"}
-    },
-    summary="Generate memes from text",
-    description="Generate AI-powered memes from a text prompt using SuperMeme AI"
-)
-async def generate_meme(request_data: MemeGenerationRequest, request: Request) -> MemeGenerationResponse:
-    """Generate memes from text prompt"""
-    start_time = time.time()
+def build_meme_file(
+    request: Request, 
+    meme_data: Dict[str, Any], 
+    key: str, 
+    index: int, 
+    output_format: str
+) -> MemeFile:
+    """Describe a stored meme with its public URL"""
+    # Pydantic will automatically convert integer meme_id to string
+    return MemeFile(
+        filename=posixpath.basename(key),
+        file_path=get_storage().describe(key),
+        image_url=generate_image_url(request, key),
+        meme_id=meme_data.get('id', f'meme_{index}'),
+        format=output_format
+    )
+
+
+def resolve_render_options(request_data: Union[MemeGenerationRequest, RenderRequest]) -> Dict[str, Any]:
+    """Get render options for a request, rejecting formats this server cannot encode"""
+    render_options = get_render_options(request_data)
+    if not ImageEncoder.is_supported(render_options["output_format"]):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Output format '{render_options['output_format']}' is not supported by this server"
+        )
+    return render_options
+
+
+def create_output_directory() -> str:
+    """Get the local output directory, used by generators without a storage backend"""
+    return settings.output_directory
+
+
+async def request_meme_results(
+    generator: SuperMemeGenerator, 
+    executor: BlockingExecutor, 
+    request_data: MemeGenerationRequest
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch meme layouts from the upstream API without blocking the event loop"""
+    cache = get_result_cache(request_data)
+    if cache is not None:
+        cached = await executor.run(cache.get_upstream, request_data)
+        if cached is not None:
+            logger.info("Using cached upstream results")
+            return cached
     
-    try:
-        logger.info(f"Received meme generation request: '{request_data.text_prompt}'")
-        
+    meme_results, run_id = await executor.run(
+        generator.generate_memes_from_text,
+        text_prompt=request_data.text_prompt,
+        max_dimension=request_data.max_dimension,
+        input_language=request_data.input_language,
+        output_language=request_data.output_language
+    )
+    
+    if not meme_results:
+        logger.error("Failed to generate memes from API")
+        raise HTTPException(
+            status_code=503,
+            detail="Failed to generate memes. The service may be temporarily unavailable."
+        )
+    
+    if cache is not None:
+        await executor.run(cache.put_upstream, request_data, meme_results, run_id)
+    return meme_results, run_id
+
+
+def build_generation_response(
+    request: Request, 
+    rendered: Dict[str, Any], 
+    output_format: str, 
+    start_time: float,
+    cached: bool = False,
+    timings: Optional[StageTimings] = None
+) -> MemeGenerationResponse:
+    """Build a generation response from a rendered set, with URLs for the requesting host"""
+    generated_files = []
+    memes = []
+    for entry in rendered["files"]:
+        meme_data = rendered["results"][entry["index"] - 1]
+        generated_files.append(
+            build_meme_file(request, meme_data, entry["key"], entry["index"], output_format)
+        )
+        # Pydantic will automatically convert integer id to string
+        memes.append(MemeData(**meme_data))
+    
+    return MemeGenerationResponse(
+        success=True,
+        message=f"Successfully generated {len(generated_files)} memes",
+        count=len(generated_files),  # New field as requested
+        meme_list=[meme_file.image_url for meme_file in generated_files],  # New field as requested
+        run_id=rendered["run_id"],
+        meme_count=len(generated_files),  # Legacy field
+        memes=memes,
+        generated_files=generated_files,
+        output_directory=rendered["output_directory"],
+        generation_time=time.time() - start_time,
+        cached=cached,
+        timings=timings.as_dict() if timings is not None else None
+    )
+
+
+async def render_generation(
+    request_data: MemeGenerationRequest, 
+    render_options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Generate and render the memes for a request and return the rendered set"""
+    executor = get_blocking_executor()
+    
+    async with executor.generation_slot():
         # Get meme generator
         generator = get_meme_generator()
         
         # Generate memes from text
-        meme_results, run_id = generator.generate_memes_from_text(
-            text_prompt=request_data.text_prompt,
-            max_dimension=request_data.max_dimension,
-            input_language=request_data.input_language,
-            output_language=request_data.output_language
-        )
+        meme_results, run_id = await request_meme_results(generator, executor, request_data)
         
-        if not meme_results:
-            logger.error("Failed to generate memes from API")
-            raise HTTPException(
-                status_code=503,
-                detail="Failed to generate memes. The service may be temporarily unavailable."
-            )
-        
-        # Create timestamped output directory
-        timestamp = int(time.time())
-        output_dir = os.path.join(settings.output_directory, f"memes_{timestamp}")
+        # Rendered files are named by content hash, so identical memes share one file
+        output_dir = create_output_directory()
         
         logger.info(f"Generating {len(meme_results)} meme images...")
-        generated_files = []
-        memes = []
-        meme_list = []  # List of image URLs as requested
+        rendered_files = []  # Index and storage key of each rendered meme
         
-        for i, meme_data in enumerate(meme_results, 1):
+        # Render all memes concurrently; results are collected in input order
+        futures = get_render_pipeline().render_all(
+            generator,
+            meme_results,
+            output_dir,
+            **render_options
+        )
+        
+        for i, future in enumerate(futures, 1):
             try:
-                # Generate image file
-                output_path = generator.generate_image_from_meme_data(meme_data, output_dir)
-                
-                # Create meme file info
-                filename = os.path.basename(output_path)
-                relative_path = os.path.relpath(output_path)
-                
-                # Generate HTTP URL for the image
-                image_url = generate_image_url(request, relative_path)
-                meme_list.append(image_url)  # Add to meme_list as requested
-                
-                # Pydantic will automatically convert integer meme_id to string
-                meme_file = MemeFile(
-                    filename=filename,
-                    file_path=relative_path,
-                    image_url=image_url,
-                    meme_id=meme_data.get('id', f'meme_{i}')
-                )
-                generated_files.append(meme_file)
-                
-                # Pydantic will automatically convert integer id to string
-                meme = MemeData(**meme_data)
-                memes.append(meme)
-                
+                # Wait for the rendered image to be stored
+                key = await asyncio.wrap_future(future)
+                rendered_files.append({"index": i, "key": key})
                 logger.info(f"Generated meme {i}/{len(meme_results)}")
                 
             except Exception as e:
                 logger.error(f"Error generating meme {i}: {e}")
                 continue
         
-        if not generated_files:
+        if not rendered_files:
             logger.error("No memes were generated successfully")
             raise HTTPException(
                 status_code=500,
                 detail="Failed to generate any meme images"
             )
         
-        generation_time = time.time() - start_time
+        rendered = {
+            "run_id": run_id,
+            "output_directory": get_storage().location,
+            "results": meme_results,
+            "files": rendered_files
+        }
         
-        response = MemeGenerationResponse(
-            success=True,
-            message=f"Successfully generated {len(generated_files)} memes",
-            count=len(generated_files),  # New field as requested
-            meme_list=meme_list,  # New field as requested
-            run_id=run_id,
-            meme_count=len(generated_files),  # Legacy field
-            memes=memes,
-            generated_files=generated_files,
-            output_directory=os.path.relpath(output_dir),
-            generation_time=generation_time
+        # Only complete sets are kept: failed memes and placeholders for templates that
+        # could not be downloaded should be retried by the next request
+        complete = len(rendered_files) == len(meme_results) and not any(
+            ".placeholder." in rendered_file["key"] for rendered_file in rendered_files
         )
-        
-        logger.info(f"Meme generation completed in {generation_time:.2f} seconds")
-        return response
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        raise
+        cache = get_result_cache(request_data)
+        if cache is not None and complete:
+            await executor.run(cache.put_rendered, request_data, render_options, rendered)
+    return rendered
+
+
+@router.post(
+    "/generate-meme",
+    response_model=MemeGenerationResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request parameters"},
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+        503: {"model": ErrorResponse, "description": "Service temporarily unavailable"}
+    },
+    summary="Generate memes from text",
+    description="Generate AI-powered memes from a text prompt using SuperMeme AI"
+)
+async def generate_meme(request_data: MemeGenerationRequest, request: Request) -> MemeGenerationResponse:
+    """Generate memes from text prompt"""
+    start_time = time.time()
+    
+    # Stages timed anywhere below, including in worker threads, are attributed to this request
+    with collect_timings() as timings, profile_request(request, "generate-meme"):
+        try:
+            logger.info(f"Received meme generation request: '{request_data.text_prompt}'")
+            
+            render_options = resolve_render_options(request_data)
+            executor = get_blocking_executor()
+            
+            # Serve a previously rendered set for the same request without any new work
+            cache = get_result_cache(request_data)
+            if cache is not None:
+                rendered = await executor.run(cache.get_rendered, request_data, render_options)
+                if rendered is not None:
+                    logger.info("Serving memes from the result cache")
+                    return build_generation_response(
+                        request, rendered, render_options["output_format"], start_time, cached=True,
+                        timings=timings if request_data.include_timings else None
+                    )
+            
+            # Concurrent identical requests share one in-flight generation
+            async def generate() -> Tuple[Dict[str, Any], StageTimings]:
+                return await render_generation(request_data, render_options), timings
+            
+            rendered, leader_timings = await get_single_flight().run(
+                request_cache_key(request_data, render_options), generate
+            )
+            if leader_timings is not timings:
+                # The stages ran under the request that started the generation
+                timings.merge(leader_timings)
+            
+            response = build_generation_response(
+                request, rendered, render_options["output_format"], start_time,
+                timings=timings if request_data.include_timings else None
+            )
+            logger.info(f"Meme generation completed in {response.generation_time:.2f} seconds")
+            return response
+            
+        except HTTPException:
+            # Re-raise HTTP exceptions
+            raise
+        except GenerationCapacityError as e:
+            logger.warning(f"Rejecting meme generation request: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy generating other memes. Please retry shortly."
+            )
+        except Exception as e:
+            logger.error(f"Unexpected error in meme generation: {e}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"An unexpected error occurred: {str(e)}"
+            )
+
+
+def format_stream_event(event: Dict[str, Any], sse: bool) -> str:
+    """Serialize a stream event as an NDJSON line or a server-sent event"""
+    payload = json.dumps(event, default=str)
+    if sse:
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+async def generation_events(
+    request_data: MemeGenerationRequest, 
+    request: Request, 
+    render_options: Dict[str, Any]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield an event for each meme as soon as it is rendered, then a summary"""
+    start_time = time.time()
+    executor = get_blocking_executor()
+    
+    try:
+        async with executor.generation_slot():
+            generator = get_meme_generator()
+            meme_results, run_id = await request_meme_results(generator, executor, request_data)
+            output_dir = create_output_directory()
+            yield {"event": "started", "run_id": run_id, "total": len(meme_results)}
+            
+            futures = get_render_pipeline().render_all(generator, meme_results, output_dir, **render_options)
+            pending = {asyncio.wrap_future(future): i for i, future in enumerate(futures, 1)}
+            meme_list: List[Optional[str]] = [None] * len(meme_results)
+            
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    i = pending.pop(task)
+                    meme_data = meme_results[i - 1]
+                    try:
+                        meme_file = build_meme_file(
+                            request, meme_data, task.result(), i, render_options["output_format"]
+                        )
+                        meme = MemeData(**meme_data)
+                    except Exception as e:
+                        logger.error(f"Error generating meme {i}: {e}")
+                        yield {"event": "meme_error", "index": i, "detail": str(e)}
+                        continue
+                    
+                    meme_list[i - 1] = meme_file.image_url
+                    logger.info(f"Streamed meme {i}/{len(meme_results)}")
+                    yield {
+                        "event": "meme",
+                        "index": i,
+                        "image_url": meme_file.image_url,
+                        "meme": meme.model_dump(mode="json"),
+                        "file": meme_file.model_dump(mode="json")
+                    }
+            
+            generated = [url for url in meme_list if url is not None]
+            yield {
+                "event": "summary",
+                "success": bool(generated),
+                "count": len(generated),
+                "meme_list": generated,
+                "run_id": str(run_id) if run_id is not None else None,
+                "output_directory": get_storage().location,
+                "generation_time": time.time() - start_time
+            }
+    except HTTPException as e:
+        yield {"event": "error", "status_code": e.status_code, "detail": e.detail}
+    except GenerationCapacityError as e:
+        logger.warning(f"Rejecting meme generation stream: {e}")
+        yield {
+            "event": "error",
+            "status_code": 503,
+            "detail": "Server is busy generating other memes. Please retry shortly."
+        }
     except Exception as e:
-        logger.error(f"Unexpected error in meme generation: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"An unexpected error occurred: {str(e)}"
-        )
+        logger.error(f"Unexpected error in meme generation stream: {e}")
+        yield {"event": "error", "status_code": 500, "detail": f"An unexpected error occurred: {str(e)}"}
+
+
+@router.post(
+    "/generate-meme/stream",
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}, "text/event-stream": {}},
+            "description": "One event per rendered meme followed by a summary event"
+        },
+        400: {"model": ErrorResponse, "description": "Invalid request parameters"}
+    },
+    summary="Generate memes from text as a stream",
+    description=(
+        "Stream each meme as soon as it is rendered. Responds with NDJSON by default, "
+        "or server-sent events when the client accepts text/event-stream."
+    )
+)
+async def generate_meme_stream(request_data: MemeGenerationRequest, request: Request) -> StreamingResponse:
+    """Generate memes from text prompt and stream them as they finish"""
+    logger.info(f"Received streaming meme generation request: '{request_data.text_prompt}'")
+    render_options = resolve_render_options(request_data)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    async def body() -> AsyncIterator[str]:
+        async for event in generation_events(request_data, request, render_options):
+            yield format_stream_event(event, sse)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/clear-token")
@@ -170,8 +632,7 @@ async def clear_token() -> Dict[str, Any]:
     """Clear saved authentication token"""
     try:
         generator = get_meme_generator()
-        success = generator.token_manager.clear_token()
-        generator.current_token = None
+        success = await get_blocking_executor().run(generator.clear_token)
         
         if success:
             return {
@@ -188,4 +649,28 @@ async def clear_token() -> Dict[str, Any]:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to clear token: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+
+@router.get("/stats", summary="Rendering cache statistics")
+async def get_stats() -> Dict[str, Any]:
+    """Get hit/miss counters for the rendering caches, output disk usage and stage timings"""
+    generator = get_meme_generator()
+    return {
+        "fonts": generator.font_registry.stats(),
+        "layout": generator.layout_engine.stats(),
+        "caption_layers": generator.caption_layer_cache.stats() if generator.caption_layer_cache else None,
+        "templates": generator.template_cache.stats() if generator.template_cache else None,
+        "resized_templates": (
+            generator.resized_template_cache.stats() if generator.resized_template_cache else None
+        ),
+        "results": result_cache.stats() if result_cache else None,
+        "coalescing": single_flight.stats() if single_flight else None,
+        "output": output_janitor.stats() if output_janitor else None,
+        "served_renders": storage.stats() if isinstance(storage, CachingStorage) else None,
+        "variants": variant_renderer.stats() if variant_renderer else None,
+        "pipeline": render_pipeline.stats() if render_pipeline else None,
+        "stages": STAGE_DURATION.snapshot(),
+        "profiling": request_profiler.stats() if request_profiler else None,
+        "http": generator.http_client.stats()
+    }
@@ -0,0 +1,133 @@
+"""
+Prometheus metrics for stage timings, caches and in-flight work
+"""
+from typing import Any, Dict, List
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from . import jobs as jobs_routes
+from . import memes as memes_routes
+from ..services.storage import CachingStorage
+from ..utils.metrics import CONTENT_TYPE, STAGE_DURATION, render_metric
+from ..core.config import settings
+
+router = APIRouter(tags=["metrics"])
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of every cache created so far, keyed by the cache label"""
+    caches: Dict[str, Dict[str, Any]] = {}
+    generator = memes_routes.meme_generator
+    if generator is not None:
+        caches["fonts"] = generator.font_registry.stats()
+        layout = generator.layout_engine.stats()
+        caches["layouts"] = layout["layouts"]
+        caches["glyph_advances"] = layout["advances"]
+        if generator.caption_layer_cache is not None:
+            caches["caption_layers"] = generator.caption_layer_cache.stats()
+        if generator.resized_template_cache is not None:
+            caches["resized_templates"] = generator.resized_template_cache.stats()
+        if generator.template_cache is not None:
+            templates = generator.template_cache.stats()
+            # Revalidated templates were served from disk after a 304, so they count as hits
+            caches["templates"] = {
+                "hits": templates["memory_hits"] + templates["disk_hits"] + templates["revalidations"],
+                "misses": templates["misses"],
+                "bytes": templates["disk_bytes"]
+            }
+            caches["template_images"] = templates["memory"]
+    if memes_routes.result_cache is not None:
+        for kind, counters in memes_routes.result_cache.stats().items():
+            caches[f"results_{kind}"] = counters
+    if isinstance(memes_routes.storage, CachingStorage):
+        caches["served_renders"] = memes_routes.storage.stats()
+    if memes_routes.variant_renderer is not None:
+        caches["variants"] = memes_routes.variant_renderer.stats()
+    return caches
+
+
+def cache_metrics() -> List[str]:
+    """Hit, miss and eviction counters plus size gauges for each cache"""
+    caches = cache_stats()
+    lines: List[str] = []
+    for field, name, metric_type, help_text in (
+        ("hits", "meme_cache_hits_total", "counter", "Cache lookups answered from the cache"),
+        ("misses", "meme_cache_misses_total", "counter", "Cache lookups that had to do the work"),
+        ("evictions", "meme_cache_evictions_total", "counter", "Entries dropped to stay within bounds"),
+        ("entries", "meme_cache_entries", "gauge", "Entries currently held"),
+        ("bytes", "meme_cache_bytes", "gauge", "Approximate bytes currently held")
+    ):
+        samples = [
+            ({"cache": cache}, counters[field])
+            for cache, counters in caches.items()
+            if counters.get(field) is not None
+        ]
+        lines.extend(render_metric(name, metric_type, help_text, samples))
+    return lines
+
+
+def in_flight_metrics() -> List[str]:
+    """Gauges for generations, coalesced requests, scheduled renders, HTTP requests and queued jobs"""
+    lines: List[str] = []
+    executor = memes_routes.blocking_executor
+    if executor is not None:
+        lines.extend(render_metric(
+            "meme_generations_active", "gauge", "Generations holding a generation slot",
+            [({}, executor.active_generations)]
+        ))
+        lines.extend(render_metric(
+            "meme_generation_slots", "gauge", "Generation slots available in total",
+            [({}, executor.max_concurrent_generations)]
+        ))
+    single_flight = memes_routes.single_flight
+    if single_flight is not None:
+        stats = single_flight.stats()
+        lines.extend(render_metric(
+            "meme_coalescing_in_flight", "gauge", "Distinct generations currently running",
+            [({}, stats["in_flight"])]
+        ))
+        lines.extend(render_metric(
+            "meme_coalescing_waiting", "gauge", "Requests waiting on another request's generation",
+            [({}, stats["waiting"])]
+        ))
+        lines.extend(render_metric(
+            "meme_coalesced_requests_total", "counter", "Requests served by another request's generation",
+            [({}, stats["coalesced"])]
+        ))
+    pipeline = memes_routes.render_pipeline
+    if pipeline is not None:
+        lines.extend(render_metric(
+            "meme_renders_in_flight", "gauge", "Memes scheduled on the render pipeline and not yet finished",
+            [({}, pipeline.stats()["in_flight"])]
+        ))
+    generator = memes_routes.meme_generator
+    if generator is not None:
+        lines.extend(render_metric(
+            "meme_http_requests_in_flight", "gauge", "Upstream and template requests in flight per host",
+            [({"host": host}, count) for host, count in generator.http_client.stats()["in_flight"].items()]
+        ))
+    if jobs_routes.job_manager is not None:
+        lines.extend(render_metric(
+            "meme_jobs_queued", "gauge", "Generation jobs waiting for a worker",
+            [({}, jobs_routes.job_manager.queued)]
+        ))
+    return lines
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = STAGE_DURATION.render() + cache_metrics() + in_flight_metrics()
+    return "\n".join(lines) + "\n"
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus metrics",
+    description="Per-stage timing histograms, cache counters and in-flight gauges in Prometheus text format"
+)
+async def get_metrics() -> PlainTextResponse:
+    """Expose metrics for Prometheus to scrape"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
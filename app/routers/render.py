@@ -0,0 +1,256 @@
+"""
+Direct rendering API routes that skip the upstream generation step
+"""
+import asyncio
+import socket
+import time
+from typing import Any, AsyncIterator, Dict, List
+from urllib.parse import urlparse
+import logging
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from . import memes as memes_routes
+from ..schemas.meme_schemas import MemeData, ErrorResponse
+from ..schemas.render_schemas import RenderError, RenderRequest, RenderResponse
+from ..services.batch_renderer import BatchRenderer
+from ..services.http_client import is_public_address, resolve_host
+from ..core.concurrency import GenerationCapacityError
+from ..utils.metrics import collect_timings
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1", tags=["render"])
+
+
+def is_allowed_template(image_url: str) -> bool:
+    """Check a template URL against the configured host allow-list"""
+    if not settings.template_allowed_hosts:
+        return True
+    host = (urlparse(image_url).hostname or "").lower()
+    return any(
+        host == allowed.lower() or host.endswith("." + allowed.lower())
+        for allowed in settings.template_allowed_hosts
+    )
+
+
+def is_public_host(host: str) -> bool:
+    """Check that a host does not resolve to a private, loopback, link-local or reserved address.
+
+    This only rejects bad requests early; template fetches check and pin the address again.
+    """
+    try:
+        addresses = resolve_host(host, 443)
+    except (socket.gaierror, UnicodeError):
+        # An unresolvable template cannot be downloaded either; it renders as a placeholder
+        return True
+    return all(is_public_address(address) for address in addresses)
+
+
+async def validate_templates(memes: List[MemeData]) -> None:
+    """Reject memes whose template would be fetched from a host that is not allowed"""
+    hosts = set()
+    for meme in memes:
+        if meme.image_name and meme.image_name.startswith("http"):
+            host = urlparse(meme.image_name).hostname
+            if not host or not is_allowed_template(meme.image_name):
+                raise HTTPException(status_code=400, detail=f"Template host is not allowed: {host}")
+            hosts.add(host)
+    if settings.template_allow_private_hosts:
+        return
+    executor = memes_routes.get_blocking_executor()
+    for host in hosts:
+        if not await executor.run(is_public_host, host):
+            raise HTTPException(status_code=400, detail=f"Template host is not allowed: {host}")
+
+
+def create_batch_renderer() -> BatchRenderer:
+    """Build a batch renderer around the shared meme generator"""
+    return BatchRenderer(
+        memes_routes.get_meme_generator(),
+        render_workers=settings.render_workers,
+        window_size=settings.render_batch_window_size
+    )
+
+
+@router.post(
+    "/render",
+    response_model=RenderResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request parameters"},
+        500: {"model": ErrorResponse, "description": "No meme could be rendered"},
+        503: {"model": ErrorResponse, "description": "Service temporarily unavailable"}
+    },
+    summary="Render memes from meme data",
+    description=(
+        "Render one or more memes from caller-supplied meme data (template URL, dimensions and captions) "
+        "without calling the upstream generator. The body may be a single meme, a list, or a request object."
+    )
+)
+async def render_memes(render_request: RenderRequest, request: Request) -> RenderResponse:
+    """Render memes directly from meme data"""
+    start_time = time.time()
+    render_options = memes_routes.resolve_render_options(render_request)
+    if len(render_request.memes) > settings.render_max_memes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.render_max_memes} memes can be rendered per request"
+        )
+    await validate_templates(render_request.memes)
+    
+    executor = memes_routes.get_blocking_executor()
+    meme_results: List[Dict[str, Any]] = [meme.model_dump(exclude_none=True) for meme in render_request.memes]
+    generated_files = []
+    memes = []
+    errors = []
+    
+    with collect_timings() as timings, memes_routes.profile_request(request, "render"):
+        try:
+            async with executor.generation_slot():
+                generator = memes_routes.get_meme_generator()
+                futures = memes_routes.get_render_pipeline().render_all(
+                    generator,
+                    meme_results,
+                    memes_routes.create_output_directory(),
+                    **render_options
+                )
+                for i, (meme, future) in enumerate(zip(render_request.memes, futures), 1):
+                    try:
+                        key = await asyncio.wrap_future(future)
+                    except Exception as e:
+                        logger.error(f"Error rendering meme {i}: {e}")
+                        errors.append(RenderError(index=i, meme_id=meme.id, detail=str(e)))
+                        continue
+                    generated_files.append(
+                        memes_routes.build_meme_file(request, meme_results[i - 1], key, i, render_options["output_format"])
+                    )
+                    memes.append(meme)
+        except GenerationCapacityError as e:
+            logger.warning(f"Rejecting render request: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy generating other memes. Please retry shortly."
+            )
+    
+    if not generated_files:
+        raise HTTPException(status_code=500, detail="Failed to render any meme images")
+    
+    return RenderResponse(
+        success=True,
+        message=f"Successfully rendered {len(generated_files)} memes",
+        count=len(generated_files),
+        meme_list=[meme_file.image_url for meme_file in generated_files],
+        memes=memes,
+        generated_files=generated_files,
+        errors=errors,
+        output_directory=memes_routes.get_storage().location,
+        generation_time=time.time() - start_time,
+        timings=timings.as_dict() if render_request.include_timings else None
+    )
+
+
+async def batch_events(
+    render_request: RenderRequest,
+    request: Request,
+    render_options: Dict[str, Any]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield an event for each meme of a batch as its template group finishes, then a summary"""
+    start_time = time.time()
+    executor = memes_routes.get_blocking_executor()
+    
+    try:
+        async with executor.generation_slot():
+            yield {"event": "started", "total": len(render_request.memes)}
+            results = create_batch_renderer().render(
+                (meme.model_dump(exclude_none=True) for meme in render_request.memes),
+                memes_routes.create_output_directory(),
+                **render_options
+            )
+            count = 0
+            errors = 0
+            try:
+                while True:
+                    item = await executor.run(next, results, None)
+                    if item is None:
+                        break
+                    if item.error is not None:
+                        errors += 1
+                        yield {
+                            "event": "meme_error",
+                            "index": item.index,
+                            "meme_id": item.meme_id,
+                            "detail": item.error
+                        }
+                        continue
+                    meme_file = memes_routes.build_meme_file(
+                        request, {"id": item.meme_id}, item.key, item.index, render_options["output_format"]
+                    )
+                    count += 1
+                    yield {
+                        "event": "meme",
+                        "index": item.index,
+                        "image_url": meme_file.image_url,
+                        "file": meme_file.model_dump(mode="json")
+                    }
+            finally:
+                # Stops rendering further groups when the client goes away
+                await executor.run(results.close)
+            
+            yield {
+                "event": "summary",
+                "success": count > 0,
+                "count": count,
+                "errors": errors,
+                "output_directory": memes_routes.get_storage().location,
+                "generation_time": time.time() - start_time
+            }
+    except GenerationCapacityError as e:
+        logger.warning(f"Rejecting batch render: {e}")
+        yield {
+            "event": "error",
+            "status_code": 503,
+            "detail": "Server is busy generating other memes. Please retry shortly."
+        }
+    except Exception as e:
+        logger.error(f"Unexpected error in batch render: {e}")
+        yield {"event": "error", "status_code": 500, "detail": f"An unexpected error occurred: {str(e)}"}
+
+
+@router.post(
+    "/render/batch",
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}, "text/event-stream": {}},
+            "description": "One event per rendered meme followed by a summary event"
+        },
+        400: {"model": ErrorResponse, "description": "Invalid request parameters"}
+    },
+    summary="Render many memes from meme data",
+    description=(
+        "Render a large set of memes, such as a re-render after a style change. Memes sharing a template "
+        "and size are drawn from one downloaded base and results are streamed as NDJSON, or server-sent "
+        "events when the client accepts text/event-stream."
+    )
+)
+async def render_batch(render_request: RenderRequest, request: Request) -> StreamingResponse:
+    """Render a batch of memes and stream the results"""
+    render_options = memes_routes.resolve_render_options(render_request)
+    if len(render_request.memes) > settings.render_batch_max_memes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.render_batch_max_memes} memes can be rendered per batch"
+        )
+    await validate_templates(render_request.memes)
+    logger.info(f"Received batch render request for {len(render_request.memes)} memes")
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    async def body() -> AsyncIterator[str]:
+        async for event in batch_events(render_request, request, render_options):
+            yield memes_routes.format_stream_event(event, sse)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,81 @@
+"""
+Pydantic models for asynchronous meme generation jobs
+"""
+from enum import Enum
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from datetime import datetime
+
+from .meme_schemas import MemeGenerationRequest, MemeData, MemeFile
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a generation job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobResult(BaseModel):
+    """A single rendered meme stored with its job"""
+    index: int = Field(description="1-based position of the meme in the upstream results")
+    meme: MemeData = Field(description="Meme data returned by the upstream API")
+    file_path: str = Field(description="Storage key of the rendered file")
+    format: str = Field(default="png", description="Image format of the rendered file")
+
+
+class JobRecord(BaseModel):
+    """Stored state of a generation job"""
+    id: str = Field(description="Job identifier")
+    status: JobStatus = Field(default=JobStatus.QUEUED, description="Current job status")
+    request: MemeGenerationRequest = Field(description="Original generation request")
+    total: Optional[int] = Field(default=None, description="Number of memes being rendered, once known")
+    completed: int = Field(default=0, description="Number of memes rendered so far")
+    failed: int = Field(default=0, description="Number of memes that failed to render")
+    run_id: Optional[str] = Field(default=None, description="Generation run identifier")
+    results: List[JobResult] = Field(default=[], description="Rendered memes so far")
+    output_directory: Optional[str] = Field(default=None, description="Directory containing generated files")
+    error: Optional[str] = Field(default=None, description="Error message for failed jobs")
+    generation_time: Optional[float] = Field(default=None, description="Time taken for generation in seconds")
+    created_at: datetime = Field(default_factory=datetime.now, description="Job creation time")
+    updated_at: datetime = Field(default_factory=datetime.now, description="Last update time")
+
+    @field_validator('run_id', mode='before')
+    @classmethod
+    def convert_run_id_to_string(cls, v):
+        """Convert integer run_id to string"""
+        if v is not None:
+            return str(v)
+        return v
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+class JobSubmitResponse(BaseModel):
+    """Response model for job submission"""
+    success: bool = Field(default=True, description="Whether the job was accepted")
+    job_id: str = Field(description="Job identifier")
+    status: JobStatus = Field(description="Current job status")
+    status_url: str = Field(description="URL to poll for job progress and results")
+
+
+class JobStatusResponse(BaseModel):
+    """Response model for job progress and results"""
+    success: bool = Field(description="Whether the job has not failed")
+    job_id: str = Field(description="Job identifier")
+    status: JobStatus = Field(description="Current job status")
+    total: Optional[int] = Field(default=None, description="Number of memes being rendered, once known")
+    completed: int = Field(description="Number of memes rendered so far")
+    failed: int = Field(description="Number of memes that failed to render")
+    run_id: Optional[str] = Field(default=None, description="Generation run identifier")
+    meme_list: List[str] = Field(default=[], description="HTTP URLs of the memes rendered so far")
+    memes: List[MemeData] = Field(default=[], description="Meme data of the memes rendered so far")
+    generated_files: List[MemeFile] = Field(default=[], description="Generated file information")
+    output_directory: Optional[str] = Field(default=None, description="Directory containing generated files")
+    error: Optional[str] = Field(default=None, description="Error message for failed jobs")
+    generation_time: Optional[float] = Field(default=None, description="Time taken for generation in seconds")
+    created_at: datetime = Field(description="Job creation time")
+    updated_at: datetime = Field(description="Last update time")
@@ -30,6 +30,30 @@ class MemeGenerationRequest(BaseModel):
         description="Output language code",
         pattern="^[a-z]{2}$"
     )
+    resize_mode: Optional[str] = Field(
+        default=None,
+        description="Template decode/resize mode: 'quality' (full decode, LANCZOS) or 'fast' (reduced-scale JPEG decode)",
+        pattern="^(quality|fast)$"
+    )
+    output_format: Optional[str] = Field(
+        default=None,
+        description="Output image format: png, webp, jpeg or avif (defaults to server setting)",
+        pattern="^(png|webp|jpeg|avif)$"
+    )
+    output_quality: Optional[int] = Field(
+        default=None,
+        description="Quality for lossy output formats",
+        ge=1,
+        le=100
+    )
+    use_cache: bool = Field(
+        default=True,
+        description="Serve and store results in the prompt-level result cache"
+    )
+    include_timings: bool = Field(
+        default=False,
+        description="Add a per-stage timing breakdown to the response"
+    )
     
     model_config = {
         "json_schema_extra": {
@@ -77,9 +101,10 @@ class MemeData(BaseModel):
 class MemeFile(BaseModel):
     """Model for generated meme file"""
     filename: str = Field(description="Generated file name")
-    file_path: str = Field(description="Relative path to generated file")
+    file_path: str = Field(description="Location of the generated file in the storage backend")
     image_url: str = Field(description="HTTP URL to access the generated meme image")
     meme_id: str = Field(description="Meme identifier")
+    format: str = Field(default="png", description="Image format of the generated file")
     
     @field_validator('meme_id', mode='before')
     @classmethod
@@ -88,6 +113,13 @@ class MemeFile(BaseModel):
         return str(v)
     
     
+class StageTiming(BaseModel):
+    """Time spent in one stage of generation while serving a request"""
+    count: int = Field(description="Number of times the stage ran")
+    total_seconds: float = Field(description="Summed duration; parallel renders can exceed wall time")
+    max_seconds: float = Field(description="Slowest single run of the stage")
+
+
 class MemeGenerationResponse(BaseModel):
     """Response model for meme generation"""
     success: bool = Field(description="Whether generation was successful")
@@ -98,8 +130,13 @@ class MemeGenerationResponse(BaseModel):
     meme_count: int = Field(description="Number of memes generated (legacy field)")
     memes: List[MemeData] = Field(default=[], description="Generated meme data")
     generated_files: List[MemeFile] = Field(default=[], description="Generated file information")
-    output_directory: str = Field(description="Directory containing generated files")
+    output_directory: str = Field(description="Storage location containing generated files")
     generation_time: float = Field(description="Time taken for generation in seconds")
+    cached: bool = Field(default=False, description="Whether the memes were served from the result cache")
+    timings: Optional[Dict[str, StageTiming]] = Field(
+        default=None,
+        description="Per-stage timing breakdown, when requested with include_timings"
+    )
     timestamp: datetime = Field(default_factory=datetime.now, description="Generation timestamp")
     
     @field_validator('run_id', mode='before')
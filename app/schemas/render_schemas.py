@@ -0,0 +1,106 @@
+"""
+Pydantic models for rendering memes from caller-supplied meme data
+"""
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+from .meme_schemas import CaptionData, MemeData, MemeFile, StageTiming
+
+
+class RenderCaptionData(CaptionData):
+    """Caption of a caller-supplied meme, with a bounded font size"""
+    fontSize: int = Field(description="Font size", gt=0, le=512)
+
+
+class RenderMemeData(MemeData):
+    """Caller-supplied meme data, bounded so a request cannot ask for an invalid or huge canvas"""
+    width: int = Field(description="Meme width in pixels", gt=0, le=4096)
+    height: int = Field(description="Meme height in pixels", gt=0, le=4096)
+    captions: List[RenderCaptionData] = Field(default=[], description="List of captions")
+
+
+class RenderRequest(BaseModel):
+    """Request model for rendering memes without the upstream generation step"""
+    memes: List[RenderMemeData] = Field(
+        ...,
+        description="Memes to render: template URL, dimensions and captions",
+        min_length=1
+    )
+    resize_mode: Optional[str] = Field(
+        default=None,
+        description="Template decode/resize mode: 'quality' (full decode, LANCZOS) or 'fast' (reduced-scale JPEG decode)",
+        pattern="^(quality|fast)$"
+    )
+    output_format: Optional[str] = Field(
+        default=None,
+        description="Output image format: png, webp, jpeg or avif (defaults to server setting)",
+        pattern="^(png|webp|jpeg|avif)$"
+    )
+    output_quality: Optional[int] = Field(
+        default=None,
+        description="Quality for lossy output formats",
+        ge=1,
+        le=100
+    )
+    include_timings: bool = Field(
+        default=False,
+        description="Add a per-stage timing breakdown to the response"
+    )
+    
+    @model_validator(mode='before')
+    @classmethod
+    def wrap_bare_memes(cls, data: Any) -> Any:
+        """Accept a single MemeData object or a bare list of them as the request body"""
+        if isinstance(data, list):
+            return {"memes": data}
+        if isinstance(data, dict) and "memes" not in data:
+            return {"memes": [data]}
+        return data
+    
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "memes": [
+                        {
+                            "id": "45675894",
+                            "width": 476,
+                            "height": 500,
+                            "image_name": "https://example.com/templates/drake.jpg",
+                            "captions": [
+                                {"x": 240, "y": 40, "width": 220, "text": "Round-tripping upstream", "fontSize": 18},
+                                {"x": 240, "y": 290, "width": 220, "text": "POST /render", "fontSize": 18}
+                            ]
+                        }
+                    ],
+                    "output_format": "webp"
+                }
+            ]
+        }
+    }
+
+
+class RenderError(BaseModel):
+    """A meme that could not be rendered"""
+    index: int = Field(description="1-based position of the meme in the request")
+    meme_id: str = Field(description="Meme identifier")
+    detail: str = Field(description="Why rendering failed")
+
+
+class RenderResponse(BaseModel):
+    """Response model for direct rendering"""
+    success: bool = Field(description="Whether at least one meme was rendered")
+    message: str = Field(description="Response message")
+    count: int = Field(description="Number of memes rendered")
+    meme_list: List[str] = Field(description="List of HTTP URLs to rendered meme images")
+    memes: List[MemeData] = Field(default=[], description="Meme data of the rendered memes")
+    generated_files: List[MemeFile] = Field(default=[], description="Rendered file information")
+    errors: List[RenderError] = Field(default=[], description="Memes that failed to render")
+    output_directory: str = Field(description="Storage location containing rendered files")
+    generation_time: float = Field(description="Time taken for rendering in seconds")
+    timings: Optional[Dict[str, StageTiming]] = Field(
+        default=None,
+        description="Per-stage timing breakdown, when requested with include_timings"
+    )
+    timestamp: datetime = Field(default_factory=datetime.now, description="Render timestamp")
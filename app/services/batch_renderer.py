@@ -0,0 +1,128 @@
+"""
+Bulk rendering of meme data grouped by template
+"""
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import logging
+from PIL import Image
+
+from .meme_generator import SuperMemeGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem(NamedTuple):
+    """Outcome of rendering one meme of a batch"""
+    index: int
+    meme_id: Optional[str]
+    key: Optional[str]
+    error: Optional[str] = None
+
+
+class BatchRenderer:
+    """Renders large sets of memes with bounded memory, one template group at a time.
+
+    Input is consumed in windows of window_size memes. Memes in a window that share a
+    template and size are drawn on copies of one downloaded and resized base, so at most
+    two bases are held at once: the group being rendered and the next one, which is
+    downloaded meanwhile. Files go straight to storage and only their keys are yielded.
+    """
+
+    def __init__(self, generator: SuperMemeGenerator, render_workers: int = 4, window_size: int = 256):
+        self.generator = generator
+        self.render_workers = render_workers
+        self.window_size = window_size
+
+    @staticmethod
+    def group_key(meme_data: Dict[str, Any]) -> Hashable:
+        """Memes with the same group key can share a base image"""
+        image_url = meme_data.get('image_name')
+        template = image_url if image_url and image_url.startswith('http') else None
+        return (template, meme_data.get('width', 476), meme_data.get('height', 500))
+
+    def load_base(self, meme_data: Dict[str, Any], resize_mode: str = "quality") -> Optional[Image.Image]:
+        """Download a group's template and resize it to the group's size"""
+        base_image = self.generator.fetch_base_image(meme_data, resize_mode)
+        size = (meme_data.get('width', 476), meme_data.get('height', 500))
+        if base_image is not None and base_image.size != size:
+            base_image = self.generator.resize_base_image(base_image, size, resize_mode)
+        return base_image
+
+    def render(
+        self,
+        memes: Iterable[Dict[str, Any]],
+        output_dir: str = "generated_memes",
+        **options: Any
+    ) -> Iterator[BatchItem]:
+        """Render memes lazily, yielding one item per input meme as groups finish.
+
+        Keyword options (resize_mode, output_format, quality) are passed to the renderer.
+        Items are yielded in completion order; use their index to match them to the input.
+        """
+        indexed = enumerate(memes, 1)
+        with ThreadPoolExecutor(max_workers=self.render_workers, thread_name_prefix="meme-batch") as pool, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="meme-batch-download") as downloads:
+            while True:
+                window = list(itertools.islice(indexed, self.window_size))
+                if not window:
+                    break
+                yield from self._render_window(pool, downloads, window, output_dir, options)
+
+    def _render_window(
+        self,
+        pool: ThreadPoolExecutor,
+        downloads: ThreadPoolExecutor,
+        window: List[Tuple[int, Dict[str, Any]]],
+        output_dir: str,
+        options: Dict[str, Any]
+    ) -> Iterator[BatchItem]:
+        """Render one window of memes, skipping those that are already stored"""
+        existing = pool.map(
+            lambda item: self._find_rendered(item[1], output_dir, options), window
+        )
+        groups: Dict[Hashable, List[Tuple[int, Dict[str, Any]]]] = {}
+        for (index, meme_data), key in zip(window, existing):
+            if isinstance(key, Exception):
+                yield BatchItem(index, meme_data.get('id'), None, str(key))
+            elif key is not None:
+                yield BatchItem(index, meme_data.get('id'), key)
+            else:
+                groups.setdefault(self.group_key(meme_data), []).append((index, meme_data))
+
+        resize_mode = options.get("resize_mode", "quality")
+        pending = list(groups.values())
+        next_base: Optional[Future] = None
+        for i, group in enumerate(pending):
+            base_future = next_base or downloads.submit(self.load_base, group[0][1], resize_mode)
+            # Download the next template while this group renders
+            next_base = downloads.submit(self.load_base, pending[i + 1][0][1], resize_mode) \
+                if i + 1 < len(pending) else None
+            try:
+                base_image = base_future.result()
+            except Exception as e:
+                logger.error(f"Failed to load template for {len(group)} batch memes: {e}")
+                for index, meme_data in group:
+                    yield BatchItem(index, meme_data.get('id'), None, str(e))
+                continue
+
+            renders = [
+                (index, meme_data, pool.submit(
+                    self.generator.generate_image_from_meme_data, meme_data, output_dir, base_image, **options
+                ))
+                for index, meme_data in group
+            ]
+            del base_image
+            for index, meme_data, render_future in renders:
+                try:
+                    yield BatchItem(index, meme_data.get('id'), render_future.result())
+                except Exception as e:
+                    logger.error(f"Error rendering batch meme {index}: {e}")
+                    yield BatchItem(index, meme_data.get('id'), None, str(e))
+
+    def _find_rendered(self, meme_data: Dict[str, Any], output_dir: str, options: Dict[str, Any]) -> Any:
+        """Look up an earlier render, returning the error instead of raising it"""
+        try:
+            return self.generator.find_rendered(meme_data, output_dir, **options)
+        except Exception as e:
+            return e
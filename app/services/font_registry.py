@@ -0,0 +1,64 @@
+"""
+Font registry that resolves font files once and caches loaded fonts
+"""
+import os
+from typing import List, Optional, Dict, Any
+import logging
+from PIL import ImageFont
+
+from ..utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FONT_PATHS = [
+    "/System/Library/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+    "/usr/share/fonts/TTF/arial.ttf",
+    "arial.ttf"
+]
+
+
+class FontRegistry:
+    """Resolves the caption font at startup and keeps an LRU of loaded fonts"""
+
+    def __init__(self, font_paths: Optional[List[str]] = None, cache_size: int = 64):
+        self.font_path = self.resolve_font_path(font_paths or DEFAULT_FONT_PATHS)
+        self._fonts = LRUCache(max_entries=cache_size)
+        if self.font_path:
+            logger.info(f"Using caption font: {self.font_path}")
+        else:
+            logger.warning("No caption font found, falling back to Pillow default font")
+
+    @staticmethod
+    def resolve_font_path(font_paths: List[str]) -> Optional[str]:
+        """Return the first existing font file from the candidates"""
+        for font_path in font_paths:
+            if os.path.exists(font_path):
+                return font_path
+        return None
+
+    def get_font(self, size: int = 18, face: Optional[str] = None) -> ImageFont.ImageFont:
+        """Get a loaded font for the given size, and optionally a specific font file"""
+        font_path = face or self.font_path
+        key = (font_path, size)
+        font = self._fonts.get(key)
+        if font is not None:
+            return font
+
+        font = self._load_font(font_path, size)
+        self._fonts.put(key, font)
+        return font
+
+    def _load_font(self, font_path: Optional[str], size: int) -> ImageFont.ImageFont:
+        """Parse a font file, falling back to the Pillow default font"""
+        if font_path:
+            try:
+                return ImageFont.truetype(font_path, size)
+            except Exception as e:
+                logger.warning(f"Failed to load custom font: {e}")
+        return ImageFont.load_default()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return font cache counters"""
+        return {"font_path": self.font_path, **self._fonts.stats()}
@@ -0,0 +1,178 @@
+"""
+Shared HTTP client with keep-alive connections for upstream and template requests
+"""
+import ipaddress
+import socket
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+import logging
+from curl_cffi import CurlHttpVersion, CurlOpt
+from curl_cffi import requests as cf_requests
+
+logger = logging.getLogger(__name__)
+
+
+class UnsafeAddressError(ValueError):
+    """Raised when a host resolves to an address the client must not connect to"""
+
+
+def resolve_host(host: str, port: int) -> List[str]:
+    """Resolve a host to its addresses, in the resolver's order"""
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+def is_public_address(address: str) -> bool:
+    """Check that an address is not private, loopback, link-local or reserved"""
+    return ipaddress.ip_address(address.split("%")[0]).is_global
+
+
+class _ThreadSession:
+    """Holds a thread's session; dropped with the thread's locals when the thread exits"""
+
+    def __init__(self, session: cf_requests.Session, generation: int):
+        self.session = session
+        self.generation = generation
+
+
+class HttpClient:
+    """Long-lived curl_cffi sessions that keep connections open between requests.
+
+    A curl handle must not be shared between threads, so each worker thread gets its own
+    session, whose handle keeps up to pool_size idle connections alive. A session is closed
+    when its thread exits, so short-lived pools do not leak handles. Requests to one
+    host are limited to max_connections_per_host at a time across all threads. With http2
+    the client negotiates HTTP/2 over TLS where the server supports it and uses HTTP/1.1
+    for plain HTTP, instead of asking for an h2c upgrade.
+    """
+
+    def __init__(
+        self,
+        impersonate: str = "chrome110",
+        pool_size: int = 16,
+        max_connections_per_host: int = 8,
+        http2: bool = True
+    ):
+        self.impersonate = impersonate
+        self.pool_size = pool_size
+        self.max_connections_per_host = max_connections_per_host
+        self.http2 = http2
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions: List[cf_requests.Session] = []
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        # Sessions from before a close() are replaced on their thread's next request
+        self._generation = 0
+        self.requests = 0
+
+    def _create_session(self) -> cf_requests.Session:
+        """Build a session for the calling thread"""
+        return cf_requests.Session(
+            impersonate=self.impersonate,
+            http_version=CurlHttpVersion.V2TLS if self.http2 else CurlHttpVersion.V1_1,
+            curl_options={CurlOpt.MAXCONNECTS: self.pool_size},
+            use_thread_local_curl=False
+        )
+
+    def _get_session(self) -> cf_requests.Session:
+        """Get the calling thread's session, creating it on first use"""
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.generation != self._generation:
+            session = self._create_session()
+            with self._lock:
+                self._sessions.append(session)
+                holder = _ThreadSession(session, self._generation)
+            weakref.finalize(holder, self._release_session, session)
+            self._local.holder = holder
+        return holder.session
+
+    def _release_session(self, session: cf_requests.Session) -> None:
+        """Close a session whose thread exited, unless close() already did"""
+        with self._lock:
+            if session not in self._sessions:
+                return
+            self._sessions.remove(session)
+        try:
+            session.close()
+        except Exception as e:
+            logger.warning(f"Failed to close HTTP session: {e}")
+
+    def _get_host_slot(self, host: str) -> threading.BoundedSemaphore:
+        """Get the semaphore bounding concurrent requests to a host"""
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+            return slot
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        resolve: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> cf_requests.Response:
+        """Send a request over the calling thread's pooled connections.
+
+        resolve takes curl "host:port:address" entries that pin where the request connects.
+        """
+        host = urlparse(url).netloc
+        with self._get_host_slot(host):
+            with self._lock:
+                self.requests += 1
+                self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            session = self._get_session()
+            # The session belongs to this thread, so its options can be changed per request
+            if resolve:
+                session.curl_options[CurlOpt.RESOLVE] = resolve
+            try:
+                return session.request(method, url, **kwargs)
+            finally:
+                session.curl_options.pop(CurlOpt.RESOLVE, None)
+                with self._lock:
+                    self._in_flight[host] -= 1
+
+    def get(self, url: str, **kwargs: Any) -> cf_requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> cf_requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_pinned(self, url: str, allow_private: bool = False, **kwargs: Any) -> cf_requests.Response:
+        """GET a URL without following redirects, connecting to the address that was checked.
+
+        Resolving once and pinning the result means the host cannot switch to an internal
+        address (e.g. by DNS rebinding) between the check and the connection.
+        """
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        addresses = resolve_host(parsed.hostname, port)
+        if not allow_private and not all(is_public_address(address) for address in addresses):
+            raise UnsafeAddressError(f"{parsed.hostname} resolves to a non-public address")
+        address = addresses[0]
+        pinned = f"{parsed.hostname}:{port}:{f'[{address}]' if ':' in address else address}"
+        return self.request("GET", url, resolve=[pinned], allow_redirects=False, **kwargs)
+
+    def close(self) -> None:
+        """Close every session and its connections; later requests open new ones"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+            self._generation += 1
+        for session in sessions:
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP session: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request counters and in-flight requests per host"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "sessions": len(self._sessions),
+                "http2": self.http2,
+                "in_flight": dict(self._in_flight)
+            }
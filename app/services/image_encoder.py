@@ -0,0 +1,106 @@
+"""
+Output encoders for rendered meme images
+"""
+from io import BytesIO
+from typing import Any, Dict, Optional
+import logging
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+try:
+    # AVIF support comes from an optional Pillow plugin
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pillow_avif = None
+
+OUTPUT_FORMATS: Dict[str, Dict[str, str]] = {
+    "png": {"pil_format": "PNG", "extension": "png", "content_type": "image/png"},
+    "webp": {"pil_format": "WEBP", "extension": "webp", "content_type": "image/webp"},
+    "jpeg": {"pil_format": "JPEG", "extension": "jpg", "content_type": "image/jpeg"},
+    "avif": {"pil_format": "AVIF", "extension": "avif", "content_type": "image/avif"},
+}
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when an output format is unknown or not available in this Pillow build"""
+
+
+class ImageEncoder:
+    """Encodes rendered memes as PNG, WebP, JPEG or AVIF with tunable settings"""
+
+    def __init__(
+        self,
+        png_compress_level: int = 3,
+        webp_quality: int = 80,
+        jpeg_quality: int = 85,
+        avif_quality: int = 60
+    ):
+        self.png_compress_level = png_compress_level
+        self.webp_quality = webp_quality
+        self.jpeg_quality = jpeg_quality
+        self.avif_quality = avif_quality
+
+    @staticmethod
+    def is_supported(output_format: str) -> bool:
+        """Check whether the format can be encoded here"""
+        if output_format not in OUTPUT_FORMATS:
+            return False
+        if output_format == "webp":
+            return features.check("webp")
+        if output_format == "avif":
+            Image.init()
+            return "AVIF" in Image.SAVE
+        return True
+
+    def validate(self, output_format: str) -> None:
+        """Raise UnsupportedFormatError for formats that cannot be encoded"""
+        if not self.is_supported(output_format):
+            raise UnsupportedFormatError(f"Output format '{output_format}' is not supported")
+
+    @staticmethod
+    def extension(output_format: str) -> str:
+        return OUTPUT_FORMATS[output_format]["extension"]
+
+    @staticmethod
+    def content_type(output_format: str) -> str:
+        return OUTPUT_FORMATS[output_format]["content_type"]
+
+    @staticmethod
+    def format_for_extension(extension: str) -> Optional[str]:
+        """Map a file extension back to its output format"""
+        for output_format, details in OUTPUT_FORMATS.items():
+            if details["extension"] == extension.lower():
+                return output_format
+        return None
+
+    def save_options(self, output_format: str, quality: Optional[int] = None) -> Dict[str, Any]:
+        """Build Pillow save() keyword arguments for a format"""
+        if output_format == "png":
+            return {"compress_level": self.png_compress_level}
+        if output_format == "webp":
+            return {"quality": quality or self.webp_quality, "method": 4}
+        if output_format == "jpeg":
+            return {"quality": quality or self.jpeg_quality, "optimize": False}
+        if output_format == "avif":
+            return {"quality": quality or self.avif_quality, "speed": 8}
+        return {}
+
+    def prepare(self, image: Image.Image, output_format: str) -> Image.Image:
+        """Convert the image to a mode the target format can store"""
+        if output_format == "jpeg" and image.mode not in ("RGB", "L"):
+            return image.convert("RGB")
+        if output_format in ("webp", "avif") and image.mode not in ("RGB", "RGBA"):
+            return image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+        return image
+
+    def encode(self, image: Image.Image, output_format: str = "png", quality: Optional[int] = None) -> bytes:
+        """Encode an image to bytes in the requested format"""
+        self.validate(output_format)
+        buffer = BytesIO()
+        self.prepare(image, output_format).save(
+            buffer,
+            OUTPUT_FORMATS[output_format]["pil_format"],
+            **self.save_options(output_format, quality)
+        )
+        return buffer.getvalue()
@@ -0,0 +1,179 @@
+"""
+In-process queue and workers for asynchronous generation jobs
+"""
+import asyncio
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+
+from .job_store import JobStore
+from ..schemas.job_schemas import JobRecord, JobStatus
+from ..schemas.meme_schemas import MemeGenerationRequest
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class JobManager:
+    """Runs generation jobs from a bounded queue on a fixed number of worker tasks.
+
+    Store reads and writes run in order on one background thread, off the event loop.
+    A job's progress writes that have not started yet are merged into one write.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: Callable[["JobManager", JobRecord], Awaitable[None]],
+        workers: int = 2,
+        queue_size: int = 100,
+        ttl_seconds: float = 3600,
+        cleanup_interval_seconds: float = 60
+    ):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_interval_seconds = cleanup_interval_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._finished_events: Dict[str, asyncio.Event] = {}
+        self._store_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="meme-job-store")
+        self._save_lock = threading.Lock()
+        # Latest unsaved state and its queued write, per job
+        self._unsaved: Dict[str, JobRecord] = {}
+        self._saves: Dict[str, Future] = {}
+
+    async def start(self) -> None:
+        """Start worker and cleanup tasks on the running event loop"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        # Jobs left unfinished by a previous process will never complete
+        for job in self.store.list_unfinished():
+            self.update(job, status=JobStatus.FAILED, error="Job interrupted by server restart")
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"meme-job-worker-{n}")
+            for n in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop(), name="meme-job-cleanup"))
+        logger.info(f"Started job manager with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Cancel worker tasks"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Queued writes finish before the store closes
+        await self._run_in_store_thread(self.store.close)
+        self._store_thread.shutdown()
+
+    def _run_in_store_thread(self, func: Callable, *args) -> Awaitable:
+        """Run a store call after every write queued before it"""
+        return asyncio.wrap_future(self._store_thread.submit(func, *args))
+
+    def _schedule_save(self, job: JobRecord) -> Future:
+        """Queue a write of the job's current state, merged into its queued write if there is one"""
+        with self._save_lock:
+            self._unsaved[job.id] = job.model_copy()
+            future = self._saves.get(job.id)
+            if future is None:
+                future = self._saves[job.id] = self._store_thread.submit(self._save, job.id)
+            return future
+
+    def _save(self, job_id: str) -> None:
+        """Write the latest state of a job"""
+        with self._save_lock:
+            job = self._unsaved.pop(job_id)
+            del self._saves[job_id]
+        self.store.save(job)
+
+    def submit(self, request: MemeGenerationRequest) -> JobRecord:
+        """Queue a new generation job"""
+        if self._queue is None:
+            raise RuntimeError("Job manager is not running")
+        if self._queue.full():
+            raise JobQueueFullError(f"Job queue is full ({self.queue_size} jobs waiting)")
+        job = JobRecord(id=uuid.uuid4().hex, request=request)
+        self._schedule_save(job)
+        self._finished_events[job.id] = asyncio.Event()
+        self._queue.put_nowait(job.id)
+        logger.info(f"Queued job {job.id}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        """Look up a job, including writes that are still queued"""
+        return await self._run_in_store_thread(self.store.get, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[JobRecord]:
+        """Wait up to timeout seconds for a job to finish, then return its current state"""
+        event = self._finished_events.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return await self.get(job_id)
+
+    def update(self, job: JobRecord, **changes) -> JobRecord:
+        """Apply changes to a job and queue a write; waiters wake once a finished job is saved"""
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = datetime.now()
+        saved = asyncio.wrap_future(self._schedule_save(job))
+        event = self._finished_events.pop(job.id, None) if job.finished else None
+
+        def on_saved(future: asyncio.Future) -> None:
+            if future.exception() is not None:
+                logger.error(f"Failed to save job {job.id}: {future.exception()}")
+            if event is not None:
+                event.set()
+
+        saved.add_done_callback(on_saved)
+        return job
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self, n: int) -> None:
+        """Pull jobs off the queue and run them one at a time"""
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self.get(job_id)
+                if job is None:
+                    continue
+                self.update(job, status=JobStatus.RUNNING)
+                await self.runner(self, job)
+                if not job.finished:
+                    self.update(job, status=JobStatus.COMPLETED)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                job = await self.get(job_id)
+                if job is not None:
+                    self.update(job, status=JobStatus.FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _cleanup_loop(self) -> None:
+        """Periodically delete finished jobs past their TTL"""
+        while True:
+            await asyncio.sleep(self.cleanup_interval_seconds)
+            await self._run_in_store_thread(self.cleanup)
+
+    def cleanup(self) -> int:
+        """Delete finished jobs past their TTL"""
+        cutoff = datetime.now() - timedelta(seconds=self.ttl_seconds)
+        removed = self.store.delete_finished_before(cutoff)
+        if removed:
+            logger.info(f"Removed {removed} expired jobs")
+        return removed
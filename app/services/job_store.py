@@ -0,0 +1,129 @@
+"""
+Pluggable storage backends for generation jobs
+"""
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+from ..schemas.job_schemas import JobRecord, JobStatus
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+
+
+class JobStore(ABC):
+    """Interface for persisting job records"""
+
+    @abstractmethod
+    def save(self, job: JobRecord) -> None:
+        """Insert or replace a job"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """Load a job by id"""
+
+    @abstractmethod
+    def list_unfinished(self) -> List[JobRecord]:
+        """Return queued and running jobs"""
+
+    @abstractmethod
+    def delete_finished_before(self, cutoff: datetime) -> int:
+        """Delete finished jobs last updated before cutoff and return how many were removed"""
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+
+class InMemoryJobStore(JobStore):
+    """Keeps jobs in a process-local dictionary"""
+
+    def __init__(self):
+        self._jobs: Dict[str, JobRecord] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: JobRecord) -> None:
+        with self._lock:
+            self._jobs[job.id] = job.model_copy(deep=True)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+    def list_unfinished(self) -> List[JobRecord]:
+        with self._lock:
+            return [job.model_copy(deep=True) for job in self._jobs.values() if not job.finished]
+
+    def delete_finished_before(self, cutoff: datetime) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished and job.updated_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """Persists jobs in a local SQLite database so they survive restarts"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated_at)")
+            self._conn.commit()
+
+    def save(self, job: JobRecord) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, updated_at, data) VALUES (?, ?, ?, ?)",
+                (job.id, job.status.value, job.updated_at.timestamp(), job.model_dump_json())
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return JobRecord.model_validate_json(row[0]) if row else None
+
+    def list_unfinished(self) -> List[JobRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM jobs WHERE status NOT IN (?, ?)", FINISHED_STATUSES
+            ).fetchall()
+        return [JobRecord.model_validate_json(row[0]) for row in rows]
+
+    def delete_finished_before(self, cutoff: datetime) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*FINISHED_STATUSES, cutoff.timestamp())
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store(backend: str, sqlite_path: str = "jobs.sqlite3") -> JobStore:
+    """Build the job store configured in settings"""
+    if backend == "memory":
+        return InMemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore(sqlite_path)
+    raise ValueError(f"Unknown job store backend: {backend}")
@@ -1,45 +1,95 @@
 """
 Main meme generator service
 """
+import hashlib
 import json
 import os
+import threading
 import time
-import random
 from typing import List, Optional, Tuple, Dict, Any
 from pathlib import Path
 import logging
-from curl_cffi import requests as cf_requests
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
 from io import BytesIO
 
 from .token_manager import TokenManager
 from .token_generator import TokenGenerator
+from .font_registry import FontRegistry
+from .text_layout import TextLayoutEngine
+from .template_cache import TemplateCache, decode_image
+from .image_encoder import ImageEncoder
+from .http_client import HttpClient
+from .storage import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, LocalStorage, MemeStorage
+from ..utils.lru import LRUCache
+from ..utils.metrics import timed
 from ..schemas.meme_schemas import MemeData, MemeFile, CaptionData
 
 logger = logging.getLogger(__name__)
 
+# Bump when drawing changes so existing content-addressed renders are not reused
+RENDER_VERSION = 1
+
+
+def caption_layer_nbytes(layer: Tuple[Image.Image, Image.Image, int, int]) -> int:
+    """Approximate memory held by a cached caption layer"""
+    text_mask, outline, _, _ = layer
+    return text_mask.width * text_mask.height + outline.width * outline.height
+
 
 class SuperMemeGenerator:
     """Main service for generating memes using SuperMeme AI"""
     
-    def __init__(self, api_url: str, supabase_url: str, supabase_api_key: str, mail_api_url: str):
+    def __init__(
+        self, 
+        api_url: str, 
+        supabase_url: str, 
+        supabase_api_key: str, 
+        mail_api_url: str,
+        font_registry: Optional[FontRegistry] = None,
+        layout_engine: Optional[TextLayoutEngine] = None,
+        template_cache: Optional[TemplateCache] = None,
+        resized_template_cache: Optional[LRUCache] = None,
+        image_encoder: Optional[ImageEncoder] = None,
+        max_output_bytes: Optional[int] = None,
+        storage: Optional[MemeStorage] = None,
+        caption_layer_cache: Optional[LRUCache] = None,
+        access_token: Optional[str] = None,
+        http_client: Optional[HttpClient] = None,
+        allow_private_templates: bool = False
+    ):
         self.api_url = api_url
         self.token_generator = TokenGenerator(supabase_url, supabase_api_key)
         self.token_manager = TokenManager()
         self.mail_api_url = mail_api_url
         self.current_token = None
+        # Generation threads share the token; one of them loads or refreshes it at a time
+        self._token_lock = threading.Lock()
         self.default_font_size = 18
         self.default_font_color = "white"
         self.stroke_color = "black"
         self.stroke_width = 2
+        self.font_registry = font_registry or FontRegistry()
+        self.layout_engine = layout_engine or TextLayoutEngine()
+        self.template_cache = template_cache
+        self.resized_template_cache = resized_template_cache
+        self.image_encoder = image_encoder or ImageEncoder()
+        self.max_output_bytes = max_output_bytes
+        self.storage = storage
+        self.caption_layer_cache = caption_layer_cache
+        # A fixed token (e.g. for a local stand-in upstream) replaces the e-mail sign-up flow
+        self.access_token = access_token
+        # Upstream and template requests reuse open connections instead of a new TLS handshake each
+        self.http_client = http_client or HttpClient()
+        # Templates on private or loopback addresses are refused unless explicitly allowed
+        self.allow_private_templates = allow_private_templates
         
-    def get_headers(self) -> Dict[str, str]:
+    def get_headers(self, token: Optional[str] = None) -> Dict[str, str]:
         """Get headers for API requests"""
         return {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:138.0) Gecko/20100101 Firefox/138.0',
             'Accept': 'application/json, text/plain, */*',
             'Content-Type': 'application/json',
-            'token': self.current_token,
+            'token': token or self.current_token,
             'Origin': 'https://supermeme.ai',
             'Referer': 'https://supermeme.ai/text-to-meme',
         }
@@ -66,11 +116,10 @@ class SuperMemeGenerator:
         })
         
         try:
-            response = cf_requests.post(
+            response = self.http_client.post(
                 self.api_url, 
                 headers=test_headers, 
                 data=test_payload, 
-                impersonate="chrome110",
                 timeout=10
             )
             
@@ -84,21 +133,36 @@ class SuperMemeGenerator:
     
     def ensure_valid_token(self) -> bool:
         """Ensure we have a valid authentication token"""
-        # First, try to load saved token
-        if not self.current_token:
+        return self.get_valid_token() is not None
+
+    def get_valid_token(self) -> Optional[str]:
+        """Get the current token, loading or generating it if there is none"""
+        if self.access_token:
+            self.current_token = self.access_token
+            return self.current_token
+        
+        token = self.current_token
+        if token:
+            return token
+        
+        with self._token_lock:
+            # Another thread may have refreshed the token while we waited
+            if self.current_token:
+                return self.current_token
+            
+            # First, try to load saved token
             saved_token = self.token_manager.load_token()
             if saved_token:
                 logger.info("Checking saved token...")
                 if self.test_token_validity(saved_token):
                     logger.info("Saved token is valid!")
                     self.current_token = saved_token
-                    return True
+                    return saved_token
                 else:
                     logger.info("Saved token is invalid, clearing...")
                     self.token_manager.clear_token()
-        
-        # If no valid token, generate new one
-        if not self.current_token:
+            
+            # If no valid token, generate new one
             logger.info("Generating new access token...")
             new_token = self.token_generator.generate_new_token(self.mail_api_url)
             if new_token:
@@ -107,11 +171,18 @@ class SuperMemeGenerator:
                 # Save the new token
                 if self.token_manager.save_token(new_token):
                     logger.info("Token saved for future use!")
-                return True
+                return new_token
             else:
                 logger.error("Failed to generate token")
-                return False
-        return True
+                return None
+
+    def clear_token(self, failed_token: Optional[str] = None) -> bool:
+        """Forget the token, unless another thread already replaced the failed one"""
+        with self._token_lock:
+            if failed_token is not None and self.current_token != failed_token:
+                return True
+            self.current_token = None
+            return self.token_manager.clear_token()
     
     def generate_memes_from_text(
         self, 
@@ -123,7 +194,8 @@ class SuperMemeGenerator:
     ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
         """Generate memes from text prompt"""
         for attempt in range(max_retries):
-            if not self.ensure_valid_token():
+            token = self.get_valid_token()
+            if not token:
                 return None, None
             
             payload = json.dumps({
@@ -135,24 +207,22 @@ class SuperMemeGenerator:
             
             try:
                 logger.info(f"Making meme generation request (attempt {attempt + 1})")
-                response = cf_requests.post(
-                    self.api_url, 
-                    headers=self.get_headers(), 
-                    data=payload, 
-                    impersonate="chrome110",
-                    timeout=30
-                )
+                with timed("upstream"):
+                    response = self.http_client.post(
+                        self.api_url, 
+                        headers=self.get_headers(token), 
+                        data=payload, 
+                        timeout=30
+                    )
                 
                 if response.status_code == 429:
                     logger.warning("Credit limit reached, generating new token...")
-                    self.token_manager.clear_token()
-                    self.current_token = None
+                    self.clear_token(token)
                     continue
                 
                 if response.status_code in [401, 403]:
                     logger.warning("Token expired, generating new token...")
-                    self.token_manager.clear_token()
-                    self.current_token = None
+                    self.clear_token(token)
                     continue
                 
                 response.raise_for_status()
@@ -170,8 +240,7 @@ class SuperMemeGenerator:
             except Exception as e:
                 if "429" in str(e) or "401" in str(e) or "403" in str(e):
                     logger.warning("Token issue detected, generating new token...")
-                    self.token_manager.clear_token()
-                    self.current_token = None
+                    self.clear_token(token)
                     continue
                 else:
                     logger.error(f"Request failed: {e}")
@@ -180,12 +249,24 @@ class SuperMemeGenerator:
         logger.error("All retry attempts failed")
         return None, None
     
-    def download_image(self, url: str) -> Image.Image:
-        """Download image from URL"""
+    def fetch_template(self, url: str, headers: Optional[Dict[str, str]] = None):
+        """Make the HTTP request for a template image, refusing redirects and internal addresses"""
+        with timed("template_download"):
+            response = self.http_client.get_pinned(
+                url, allow_private=self.allow_private_templates, headers=headers, timeout=10
+            )
+        if 300 <= response.status_code < 400 and response.status_code != 304:
+            raise ValueError(f"Template redirects are not followed ({response.status_code} from {url})")
+        return response
+    
+    def download_image(self, url: str, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Download image from URL (cached images are shared and must not be modified in place)"""
         try:
-            response = cf_requests.get(url, timeout=10, impersonate="chrome110")
+            if self.template_cache is not None:
+                return self.template_cache.get_image(url, draft_size)
+            response = self.fetch_template(url)
             response.raise_for_status()
-            return Image.open(BytesIO(response.content))
+            return decode_image(response.content, draft_size)
         except Exception as e:
             logger.warning(f"Failed to download image from {url}: {e}")
             return self.create_placeholder_image()
@@ -193,6 +274,7 @@ class SuperMemeGenerator:
     def create_placeholder_image(self, width: int = 476, height: int = 500) -> Image.Image:
         """Create placeholder image when base image is not available"""
         img = Image.new('RGB', (width, height), color='lightgray')
+        img.info['placeholder'] = True
         draw = ImageDraw.Draw(img)
         draw.rectangle([50, 50, width-50, height//2-25], fill='white', outline='black', width=2)
         draw.rectangle([50, height//2+25, width-50, height-50], fill='white', outline='black', width=2)
@@ -213,48 +295,11 @@ class SuperMemeGenerator:
     
     def get_font(self, size: int = 18) -> ImageFont.ImageFont:
         """Get font for text rendering"""
-        try:
-            font_paths = [
-                "/System/Library/Fonts/Arial.ttf",
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-                "C:/Windows/Fonts/arial.ttf",
-                "/usr/share/fonts/TTF/arial.ttf",
-                "arial.ttf"
-            ]
-            
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    return ImageFont.truetype(font_path, size)
-            
-            return ImageFont.load_default()
-        except Exception as e:
-            logger.warning(f"Failed to load custom font: {e}")
-            return ImageFont.load_default()
+        return self.font_registry.get_font(size)
     
     def wrap_text(self, text: str, font: ImageFont.ImageFont, max_width: int) -> List[str]:
         """Wrap text to fit within specified width"""
-        words = text.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            bbox = font.getbbox(test_line)
-            text_width = bbox[2] - bbox[0]
-            
-            if text_width <= max_width:
-                current_line.append(word)
-            else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                    current_line = [word]
-                else:
-                    lines.append(word)
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        return lines
+        return self.layout_engine.layout(text, font, max_width).lines
     
     def draw_text_with_stroke(
         self, 
@@ -269,14 +314,45 @@ class SuperMemeGenerator:
         """Draw text with stroke outline"""
         x, y = position
         
-        # Draw stroke
-        for dx in range(-stroke_width, stroke_width + 1):
-            for dy in range(-stroke_width, stroke_width + 1):
-                if dx != 0 or dy != 0:
-                    draw.text((x + dx, y + dy), text, font=font, fill=stroke_color)
+        with timed("stroke"):
+            if stroke_width <= 0:
+                draw.text((x, y), text, font=font, fill=fill_color)
+                return
+            
+            # Paste pre-rasterized glyph and outline masks, which match drawing the text directly
+            text_mask, outline, left, top = self.get_caption_layer(text, font, stroke_width)
+            origin = (x + left - stroke_width, y + top - stroke_width)
+            draw.bitmap(origin, outline, fill=stroke_color)
+            draw.bitmap(origin, text_mask, fill=fill_color)
+    
+    def get_caption_layer(
+        self, 
+        text: str, 
+        font: ImageFont.ImageFont, 
+        stroke_width: int
+    ) -> Tuple[Image.Image, Image.Image, int, int]:
+        """Rasterize a caption line into glyph and outline masks, reusing cached ones.
+
+        The outline is the glyph mask dilated with a square kernel in a single pass,
+        which matches redrawing the text at every stroke offset.
+        """
+        font_key = self.layout_engine.font_key(font)
+        # Fonts without a stable identity are rasterized every time
+        cache = self.caption_layer_cache if font_key is not None else None
+        key = (font_key, text, stroke_width)
+        if cache is not None:
+            layer = cache.get(key)
+            if layer is not None:
+                return layer
         
-        # Draw main text
-        draw.text((x, y), text, font=font, fill=fill_color)
+        left, top, right, bottom = font.getbbox(text)
+        text_mask = Image.new('L', (right - left + 2 * stroke_width, bottom - top + 2 * stroke_width), 0)
+        ImageDraw.Draw(text_mask).text((stroke_width - left, stroke_width - top), text, font=font, fill=255)
+        outline = text_mask.filter(ImageFilter.MaxFilter(2 * stroke_width + 1))
+        layer = (text_mask, outline, left, top)
+        if cache is not None:
+            cache.put(key, layer)
+        return layer
     
     def add_caption_to_image(self, image: Image.Image, caption_data: Dict[str, Any]) -> None:
         """Add caption to image"""
@@ -289,15 +365,11 @@ class SuperMemeGenerator:
         font_size = caption_data.get('fontSize', self.default_font_size)
         
         font = self.get_font(font_size)
-        wrapped_lines = self.wrap_text(text, font, width)
-        
-        bbox = font.getbbox("A")
-        line_height = bbox[3] - bbox[1] + 5
+        with timed("layout"):
+            layout = self.layout_engine.layout(text, font, width)
         
         current_y = y
-        for line in wrapped_lines:
-            bbox = font.getbbox(line)
-            text_width = bbox[2] - bbox[0]
+        for line, text_width in zip(layout.lines, layout.line_widths):
             centered_x = x + (width - text_width) // 2
             
             self.draw_text_with_stroke(
@@ -310,25 +382,127 @@ class SuperMemeGenerator:
                 self.stroke_width
             )
             
-            current_y += line_height
+            current_y += layout.line_height
+    
+    def fetch_base_image(
+        self, 
+        meme_data: Dict[str, Any], 
+        resize_mode: str = "quality"
+    ) -> Optional[Image.Image]:
+        """Download the base template for a meme, or None when it has no remote image"""
+        image_url = meme_data.get('image_name')
+        if image_url and image_url.startswith('http'):
+            size = (meme_data.get('width', 476), meme_data.get('height', 500))
+            if self.resized_template_cache is not None:
+                resized = self.resized_template_cache.get((image_url, *size, resize_mode))
+                if resized is not None:
+                    return resized
+            # In fast mode JPEG templates are decoded straight at (about) the target scale
+            draft_size = size if resize_mode == "fast" else None
+            return self.download_image(image_url, draft_size)
+        return None
+    
+    def resize_base_image(self, image: Image.Image, size: Tuple[int, int], resize_mode: str = "quality") -> Image.Image:
+        """Resize a template, reducing by integer factors first when it is much larger than the target"""
+        with timed("resize"):
+            if resize_mode == "fast":
+                return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+            return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    
+    def render_hash(
+        self, 
+        meme_data: Dict[str, Any], 
+        resize_mode: str = "quality",
+        output_format: str = "png",
+        quality: Optional[int] = None
+    ) -> str:
+        """Hash everything that affects the rendered file: template, size, captions, style and encoding"""
+        parts = {
+            "version": RENDER_VERSION,
+            "template": meme_data.get('image_name'),
+            "size": [meme_data.get('width', 476), meme_data.get('height', 500)],
+            "captions": meme_data.get('captions', []),
+            "top_header_caption": meme_data.get('top_header_caption'),
+            "bottom_header_caption": meme_data.get('bottom_header_caption'),
+            "style": {
+                "font": self.font_registry.font_path,
+                "font_size": self.default_font_size,
+                "font_color": self.default_font_color,
+                "stroke_color": self.stroke_color,
+                "stroke_width": self.stroke_width
+            },
+            "resize_mode": resize_mode,
+            "format": output_format,
+            "encoding": self.image_encoder.save_options(output_format, quality)
+        }
+        encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    def rendered_key(
+        self, 
+        meme_data: Dict[str, Any], 
+        resize_mode: str = "quality",
+        output_format: str = "png",
+        quality: Optional[int] = None
+    ) -> str:
+        """Content-addressed storage key for a meme, sharded by the first two hash characters"""
+        digest = self.render_hash(meme_data, resize_mode, output_format, quality)
+        return f"{digest[:2]}/{digest}.{self.image_encoder.extension(output_format)}"
+    
+    def get_storage(self, output_dir: str = "generated_memes") -> MemeStorage:
+        """Storage for rendered memes: the configured backend, or local files under output_dir"""
+        return self.storage if self.storage is not None else LocalStorage(output_dir)
+    
+    def find_rendered(
+        self, 
+        meme_data: Dict[str, Any], 
+        output_dir: str = "generated_memes",
+        resize_mode: str = "quality",
+        output_format: str = "png",
+        quality: Optional[int] = None
+    ) -> Optional[str]:
+        """Return the storage key of an identical earlier render, if it is still stored"""
+        storage = self.get_storage(output_dir)
+        key = self.rendered_key(meme_data, resize_mode, output_format, quality)
+        if not storage.exists(key):
+            return None
+        storage.touch(key)
+        return key
     
     def generate_image_from_meme_data(
         self, 
         meme_data: Dict[str, Any], 
-        output_dir: str = "generated_memes"
+        output_dir: str = "generated_memes",
+        base_image: Optional[Image.Image] = None,
+        resize_mode: str = "quality",
+        output_format: str = "png",
+        quality: Optional[int] = None
     ) -> str:
-        """Generate final meme image from meme data"""
-        os.makedirs(output_dir, exist_ok=True)
+        """Generate final meme image from meme data and return its storage key.
+
+        Without a configured storage backend the image is written below output_dir.
+        An identical earlier render is reused instead of drawing it again.
+        """
+        existing = self.find_rendered(meme_data, output_dir, resize_mode, output_format, quality)
+        if existing is not None:
+            logger.info(f"Reusing rendered meme image: {existing}")
+            return existing
         
-        meme_id = meme_data.get('id', f'meme_{random.randint(1000, 9999)}')
         width = meme_data.get('width', 476)
         height = meme_data.get('height', 500)
         
         # Download or create base image
-        image_url = meme_data.get('image_name')
-        if image_url and image_url.startswith('http'):
-            base_image = self.download_image(image_url)
-            base_image = base_image.resize((width, height), Image.Resampling.LANCZOS)
+        if base_image is None:
+            base_image = self.fetch_base_image(meme_data, resize_mode)
+        placeholder = base_image is not None and bool(base_image.info.get('placeholder'))
+        if base_image is not None:
+            if base_image.size != (width, height):
+                base_image = self.resize_base_image(base_image, (width, height), resize_mode)
+                if self.resized_template_cache is not None and not placeholder:
+                    key = (meme_data.get('image_name'), width, height, resize_mode)
+                    self.resized_template_cache.put(key, base_image)
+            # Captions are drawn on a copy so shared template bitmaps stay untouched
+            base_image = base_image.copy()
         else:
             base_image = self.create_placeholder_image(width, height)
         
@@ -352,10 +526,28 @@ class SuperMemeGenerator:
             }
             self.add_caption_to_image(base_image, footer_caption)
         
+        # A placeholder stands in for a template that failed to download, so it must not
+        # occupy the content address that a later successful render should get
+        key = self.rendered_key(meme_data, resize_mode, output_format, quality)
+        if placeholder:
+            root, extension = os.path.splitext(key)
+            key = f"{root}.placeholder{extension}"
+        
         # Save image
-        filename = f"meme_{meme_id}.png"
-        output_path = os.path.join(output_dir, filename)
-        base_image.save(output_path, 'PNG')
+        with timed("encode"):
+            image_bytes = self.image_encoder.encode(base_image, output_format, quality)
+        if self.max_output_bytes and len(image_bytes) > self.max_output_bytes:
+            raise ValueError(
+                f"Rendered meme is {len(image_bytes)} bytes, over the {self.max_output_bytes} byte limit"
+            )
+        with timed("store"):
+            self.get_storage(output_dir).put(
+                key,
+                image_bytes,
+                self.image_encoder.content_type(output_format),
+                # Content-addressed renders never change; placeholders are replaced once the template loads
+                REVALIDATE_CACHE_CONTROL if placeholder else IMMUTABLE_CACHE_CONTROL
+            )
         
-        logger.info(f"Generated meme image: {output_path}")
-        return output_path 
\ No newline at end of file
+        logger.info(f"Generated meme image: {key}")
+        return key
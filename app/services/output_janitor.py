@@ -0,0 +1,219 @@
+"""
+Retention and garbage collection for rendered meme files
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+import logging
+
+from ..utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Temporary files younger than this may still be being written
+TEMP_FILE_GRACE_SECONDS = 3600
+
+
+def touch(path: str) -> None:
+    """Record an access to a rendered file so the janitor evicts it last"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+class AccessThrottle:
+    """Lets an access to each key be recorded at most once per interval"""
+
+    def __init__(self, interval_seconds: float = 60, max_keys: int = 65536):
+        self.interval_seconds = interval_seconds
+        self._recorded = LRUCache(max_entries=max_keys)
+
+    def should_record(self, key: str) -> bool:
+        """Check whether an access to key is due to be recorded, and note it if so"""
+        now = time.monotonic()
+        recorded_at = self._recorded.get(key)
+        if recorded_at is not None and now - recorded_at < self.interval_seconds:
+            return False
+        self._recorded.put(key, now)
+        return True
+
+
+class OutputJanitor:
+    """Periodically deletes rendered files by age, then least recently used ones beyond the size limits.
+
+    A limit of 0 disables it. Sweeps run in a worker thread and delete at most batch_size
+    files each, so a large backlog is drained over several quick passes. The first sweep
+    scans the whole tree into an index; later sweeps rescan only the next scan_directories
+    directories, resuming where the previous sweep stopped. Shard directories are kept, so
+    concurrent writes never find their directory removed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_age_seconds: float = 0,
+        max_total_bytes: int = 0,
+        max_files: int = 0,
+        interval_seconds: float = 300,
+        batch_size: int = 1000,
+        scan_directories: int = 64
+    ):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self.max_files = max_files
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.scan_directories = scan_directories
+        # {directory: {path: (last access, size)}} as of each directory's last scan
+        self._index: Dict[str, Dict[str, Tuple[float, int]]] = {}
+        self._pending: Deque[str] = deque()
+        self._seen: Set[str] = set()
+        self._indexed = False
+        self._task: Optional[asyncio.Task] = None
+        self.files = 0
+        self.bytes = 0
+        self.sweeps = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.last_sweep_at: Optional[float] = None
+        self.last_sweep_seconds: Optional[float] = None
+
+    def start(self) -> None:
+        """Start sweeping on the running event loop"""
+        self._task = asyncio.create_task(self._run(), name="meme-output-janitor")
+        logger.info(f"Started output janitor for {self.directory}")
+
+    async def stop(self) -> None:
+        """Stop sweeping"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        """Sweep every interval, or again shortly while a backlog remains"""
+        while True:
+            try:
+                backlog = await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Output janitor sweep failed: {e}")
+                backlog = False
+            await asyncio.sleep(1 if backlog else self.interval_seconds)
+
+    def _scan_directory(self, directory: str, now: float) -> None:
+        """Refresh the index entries of one directory and queue its subdirectories"""
+        files = {}
+        try:
+            iterator = os.scandir(directory)
+        except OSError:
+            return
+        with iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        self._pending.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if entry.name.startswith(".tmp-") and now - stat.st_mtime < TEMP_FILE_GRACE_SECONDS:
+                    continue
+                files[entry.path] = (max(stat.st_atime, stat.st_mtime), stat.st_size)
+        self._index[directory] = files
+        self._seen.add(directory)
+
+    def _scan(self, now: float) -> None:
+        """Rescan the next directories of the current pass; the first pass covers the whole tree"""
+        if not self._pending:
+            self._pending.append(self.directory)
+        limit = self.scan_directories if self._indexed else None
+        scanned = 0
+        while self._pending and (limit is None or scanned < limit):
+            self._scan_directory(self._pending.popleft(), now)
+            scanned += 1
+        if not self._pending:
+            # The pass is complete; forget directories that no longer exist
+            for directory in set(self._index) - self._seen:
+                del self._index[directory]
+            self._seen = set()
+            self._indexed = True
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {e}")
+            return False
+        return True
+
+    def sweep(self) -> bool:
+        """Run one bounded pass and return whether more files are still due for eviction"""
+        started = time.time()
+        self._scan(started)
+        entries = sorted(  # Least recently accessed first
+            (accessed_at, size, path, directory)
+            for directory, files in self._index.items()
+            for path, (accessed_at, size) in files.items()
+        )
+        total_files = len(entries)
+        total_bytes = sum(size for _, size, _, _ in entries)
+
+        removed = 0
+        removed_bytes = 0
+        for accessed_at, size, path, directory in entries:
+            expired = self.max_age_seconds and started - accessed_at > self.max_age_seconds
+            over_bytes = self.max_total_bytes and total_bytes - removed_bytes > self.max_total_bytes
+            over_files = self.max_files and total_files - removed > self.max_files
+            if not (expired or over_bytes or over_files):
+                # Entries are sorted by access, so nothing later is due either
+                break
+            if removed >= self.batch_size:
+                break
+            files = self._index[directory]
+            # The index may be a few sweeps old, so check the file before deleting it
+            try:
+                stat = os.stat(path)
+            except OSError:
+                files.pop(path, None)
+                total_files -= 1
+                total_bytes -= size
+                continue
+            if max(stat.st_atime, stat.st_mtime) > accessed_at:
+                # Served since its directory was scanned; it is reconsidered next sweep
+                files[path] = (max(stat.st_atime, stat.st_mtime), stat.st_size)
+                continue
+            if self._remove(path):
+                files.pop(path, None)
+                removed += 1
+                removed_bytes += size
+
+        self.files = total_files - removed
+        self.bytes = total_bytes - removed_bytes
+        self.sweeps += 1
+        self.evicted_files += removed
+        self.evicted_bytes += removed_bytes
+        self.last_sweep_at = started
+        self.last_sweep_seconds = time.time() - started
+        if removed:
+            logger.info(f"Output janitor removed {removed} files ({removed_bytes} bytes)")
+        return removed >= self.batch_size
+
+    def stats(self) -> Dict[str, Any]:
+        """Return disk usage gauges and eviction counters"""
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "max_files": self.max_files,
+            "max_bytes": self.max_total_bytes,
+            "sweeps": self.sweeps,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+            "last_sweep_at": self.last_sweep_at,
+            "last_sweep_seconds": self.last_sweep_seconds
+        }
@@ -0,0 +1,117 @@
+"""
+Concurrent rendering pipeline for meme images
+"""
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+from PIL import Image
+
+from .meme_generator import SuperMemeGenerator
+from ..utils.profiling import run_sampled
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPipeline:
+    """Renders memes concurrently: downloads overlap on I/O, Pillow work runs on a bounded pool"""
+
+    def __init__(self, download_workers: int = 8, render_workers: int = 4):
+        self.download_workers = download_workers
+        self.render_workers = render_workers
+        self._download_pool = ThreadPoolExecutor(
+            max_workers=download_workers,
+            thread_name_prefix="meme-download"
+        )
+        # Pillow releases the GIL while resizing and encoding, so threads scale here
+        self._render_pool = ThreadPoolExecutor(
+            max_workers=render_workers,
+            thread_name_prefix="meme-render"
+        )
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def submit(
+        self,
+        generator: SuperMemeGenerator,
+        meme_data: Dict[str, Any],
+        output_dir: str,
+        **options: Any
+    ) -> Future:
+        """Schedule a single meme and return a future resolving to its storage key.
+
+        Keyword options (resize_mode, output_format, quality) are passed to the renderer.
+        Memes that were already rendered with the same inputs resolve without any work.
+        """
+        result: Future = Future()
+        # Download and render run one after the other in the caller's context, so stage
+        # timings and profiles recorded by the generator reach the request that scheduled them
+        context = contextvars.copy_context()
+        with self._lock:
+            self.in_flight += 1
+        result.add_done_callback(self._finished)
+
+        def on_rendered(render_future: Future) -> None:
+            try:
+                result.set_result(render_future.result())
+            except Exception as e:
+                result.set_exception(e)
+
+        def download() -> Tuple[Optional[str], Optional[Image.Image]]:
+            existing = generator.find_rendered(meme_data, output_dir, **options)
+            if existing is not None:
+                return existing, None
+            return None, generator.fetch_base_image(meme_data, options.get("resize_mode", "quality"))
+
+        def on_downloaded(download_future: Future) -> None:
+            try:
+                existing, base_image = download_future.result()
+                if existing is not None:
+                    result.set_result(existing)
+                    return
+                render_future = self._render_pool.submit(
+                    context.run,
+                    run_sampled,
+                    generator.generate_image_from_meme_data,
+                    meme_data,
+                    output_dir,
+                    base_image,
+                    **options
+                )
+            except Exception as e:
+                result.set_exception(e)
+                return
+            render_future.add_done_callback(on_rendered)
+
+        download_future = self._download_pool.submit(context.run, run_sampled, download)
+        download_future.add_done_callback(on_downloaded)
+        return result
+
+    def _finished(self, result: Future) -> None:
+        """Count a scheduled meme as done"""
+        with self._lock:
+            self.in_flight -= 1
+
+    def render_all(
+        self,
+        generator: SuperMemeGenerator,
+        meme_results: List[Dict[str, Any]],
+        output_dir: str,
+        **options: Any
+    ) -> List[Future]:
+        """Schedule every meme and return their futures in input order"""
+        return [self.submit(generator, meme_data, output_dir, **options) for meme_data in meme_results]
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool sizes and the number of memes scheduled but not finished"""
+        return {
+            "download_workers": self.download_workers,
+            "render_workers": self.render_workers,
+            "in_flight": self.in_flight
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and release worker threads"""
+        self._download_pool.shutdown(wait=wait)
+        self._render_pool.shutdown(wait=wait)
@@ -0,0 +1,133 @@
+"""
+Opt-in stack sampling of slow requests, kept as collapsed-stack files in a bounded directory
+"""
+import functools
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+from ..utils.profiling import StackSampler, activate
+
+logger = logging.getLogger(__name__)
+
+PROFILE_EXTENSION = ".collapsed"
+PROFILE_NAME = re.compile(r"^[A-Za-z0-9_.-]+\.collapsed$")
+
+
+class RequestProfiler:
+    """Samples requests on demand or at random and keeps the profiles of slow ones.
+
+    Only the worker threads doing a sampled request's work are sampled, so the rest of
+    the process runs unprofiled. Forced profiles are always kept; randomly sampled ones
+    only when the request took at least slow_threshold_seconds. The directory keeps the
+    newest max_files profiles.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float = 0.0,
+        slow_threshold_seconds: float = 2.0,
+        interval_seconds: float = 0.005,
+        max_files: int = 50
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_threshold_seconds = slow_threshold_seconds
+        self.interval_seconds = interval_seconds
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.saved = 0
+
+    def should_sample(self, forced: bool = False) -> bool:
+        """Decide whether to sample a request"""
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def profile(self, name: str, forced: bool = False) -> Iterator[Optional[StackSampler]]:
+        """Sample the work started inside the block, or do nothing when the request is not picked"""
+        if not self.should_sample(forced):
+            yield None
+            return
+
+        sampler = StackSampler(self.interval_seconds)
+        started = time.perf_counter()
+        sampler.start()
+        self.sampled += 1
+        try:
+            with activate(sampler):
+                yield sampler
+        finally:
+            elapsed = time.perf_counter() - started
+            keep = forced or elapsed >= self.slow_threshold_seconds
+            sampler.stop(on_stopped=functools.partial(self._save, name, elapsed) if keep else None)
+
+    def _save(self, name: str, elapsed: float, sampler: StackSampler) -> None:
+        """Write a profile and drop the oldest ones beyond max_files"""
+        if not sampler.samples:
+            return
+        filename = (
+            f"{datetime.now():%Y%m%dT%H%M%S}-{name}-{int(elapsed * 1000)}ms-{uuid.uuid4().hex[:8]}"
+            f"{PROFILE_EXTENSION}"
+        )
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, filename), "w", encoding="utf-8") as f:
+                f.write(sampler.collapsed())
+            with self._lock:
+                self.saved += 1
+                self._enforce_limit()
+            logger.info(f"Saved profile {filename} ({sampler.samples} samples over {elapsed:.2f}s)")
+        except OSError as e:
+            logger.warning(f"Failed to save profile {filename}: {e}")
+
+    def _enforce_limit(self) -> None:
+        """Delete the oldest profiles beyond max_files"""
+        profiles = self.list_profiles()
+        for profile in profiles[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, profile["name"]))
+            except OSError:
+                pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Saved profiles, newest first"""
+        try:
+            names = [name for name in os.listdir(self.directory) if PROFILE_NAME.match(name)]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        return [
+            {"name": name, "bytes": size, "created": datetime.fromtimestamp(mtime).isoformat()}
+            for mtime, name, size in sorted(entries, reverse=True)
+        ]
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of a saved profile, or None for unknown or unsafe names"""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return sampling counters"""
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_threshold_seconds": self.slow_threshold_seconds,
+            "sampled": self.sampled,
+            "saved": self.saved
+        }
@@ -0,0 +1,226 @@
+"""
+Prompt-level cache of upstream results and rendered meme sets
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from ..schemas.meme_schemas import MemeGenerationRequest
+from .storage import MemeStorage
+from ..utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize a prompt so trivially different spellings share cache entries"""
+    return " ".join(text.split()).casefold()
+
+
+def request_cache_key(request_data: MemeGenerationRequest, render_options: Optional[Dict[str, Any]] = None) -> str:
+    """Hash the parts of a request that determine the upstream results (and optionally the renders)"""
+    parts: Dict[str, Any] = {
+        "text": normalize_prompt(request_data.text_prompt),
+        "max_dimension": request_data.max_dimension,
+        "input_language": request_data.input_language,
+        "output_language": request_data.output_language
+    }
+    if render_options is not None:
+        parts["render"] = render_options
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResultCacheBackend(ABC):
+    """Interface for result cache storage"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return an unexpired value"""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        """Store a value until expires_at"""
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+
+class MemoryResultCacheBackend(ResultCacheBackend):
+    """Process-local LRU of cached results"""
+
+    def __init__(self, max_entries: int = 1024):
+        self._entries = LRUCache(max_entries=max_entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            self._entries.pop(key)
+            return None
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        self._entries.put(key, (expires_at, value))
+
+
+class SQLiteResultCacheBackend(ResultCacheBackend):
+    """Persistent result cache shared by processes on the same host"""
+
+    def __init__(self, path: str, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, accessed_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, expires_at, accessed_at, value) VALUES (?, ?, ?, ?)",
+                (key, expires_at, now, json.dumps(value, default=str))
+            )
+            # Drop expired rows, then the least recently used ones beyond the size bound
+            self._conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM results WHERE key NOT IN "
+                "(SELECT key FROM results ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """Caches upstream results per normalized request and rendered file sets per request and render options"""
+
+    def __init__(
+        self,
+        backend: ResultCacheBackend,
+        ttl_seconds: float = 900,
+        storage: Optional[MemeStorage] = None
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.storage = storage
+        self._lock = threading.Lock()
+        self.hits = {"upstream": 0, "rendered": 0}
+        self.misses = {"upstream": 0, "rendered": 0}
+
+    def _count(self, kind: str, hit: bool) -> None:
+        with self._lock:
+            (self.hits if hit else self.misses)[kind] += 1
+
+    def get_upstream(self, request_data: MemeGenerationRequest) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """Return cached upstream (results, run_id) for a request"""
+        value = self.backend.get("upstream:" + request_cache_key(request_data))
+        self._count("upstream", value is not None)
+        if value is None:
+            return None
+        return value["results"], value["run_id"]
+
+    def put_upstream(
+        self,
+        request_data: MemeGenerationRequest,
+        results: List[Dict[str, Any]],
+        run_id: Optional[str]
+    ) -> None:
+        """Cache upstream results for a request"""
+        self.backend.set(
+            "upstream:" + request_cache_key(request_data),
+            {"results": results, "run_id": run_id},
+            time.time() + self.ttl_seconds
+        )
+
+    def get_rendered(
+        self,
+        request_data: MemeGenerationRequest,
+        render_options: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Return a cached rendered set, as long as all of its files are still stored"""
+        value = self.backend.get("rendered:" + request_cache_key(request_data, render_options))
+        if value is not None and self.storage is not None:
+            if not all("key" in f and self.storage.exists(f["key"]) for f in value["files"]):
+                value = None
+            else:
+                # Served files count as used, so the output janitor keeps them
+                for f in value["files"]:
+                    self.storage.touch(f["key"])
+        self._count("rendered", value is not None)
+        return value
+
+    def put_rendered(
+        self,
+        request_data: MemeGenerationRequest,
+        render_options: Dict[str, Any],
+        rendered: Dict[str, Any]
+    ) -> None:
+        """Cache a rendered set: run_id, output_directory, upstream results and storage keys by index"""
+        self.backend.set(
+            "rendered:" + request_cache_key(request_data, render_options),
+            rendered,
+            time.time() + self.ttl_seconds
+        )
+
+    def close(self) -> None:
+        self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters per cache level"""
+        with self._lock:
+            return {
+                kind: {
+                    "hits": self.hits[kind],
+                    "misses": self.misses[kind],
+                    "hit_rate": (
+                        self.hits[kind] / (self.hits[kind] + self.misses[kind])
+                        if self.hits[kind] + self.misses[kind] else 0.0
+                    )
+                }
+                for kind in ("upstream", "rendered")
+            }
+
+
+def create_result_cache(
+    backend: str,
+    ttl_seconds: float,
+    max_entries: int,
+    sqlite_path: str = "result_cache.sqlite3",
+    storage: Optional[MemeStorage] = None
+) -> ResultCache:
+    """Build the result cache configured in settings"""
+    if backend == "memory":
+        return ResultCache(MemoryResultCacheBackend(max_entries), ttl_seconds, storage)
+    if backend == "sqlite":
+        return ResultCache(SQLiteResultCacheBackend(sqlite_path, max_entries), ttl_seconds, storage)
+    raise ValueError(f"Unknown result cache backend: {backend}")
@@ -0,0 +1,59 @@
+"""
+Coalescing of concurrent identical async operations
+"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Runs one operation per key at a time and shares its outcome with every concurrent caller"""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.waiting = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the in-flight operation for key, starting it with func if there is none"""
+        task = self._tasks.get(key)
+        if task is None:
+            # Run as its own task so a disconnecting caller does not cancel the shared work
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._finished, key))
+            self.leaders += 1
+            return await asyncio.shield(task)
+
+        self.coalesced += 1
+        self.waiting += 1
+        logger.info(f"Coalescing request onto in-flight operation {key[:12]}")
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self.waiting -= 1
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        """Forget a completed operation so the next caller starts a fresh one"""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the outcome as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def stats(self) -> Dict[str, int]:
+        """Return coalescing counters"""
+        return {
+            "in_flight": self.in_flight,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "waiting": self.waiting
+        }
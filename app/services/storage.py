@@ -0,0 +1,406 @@
+"""
+Pluggable storage backends for rendered meme files
+"""
+import os
+import posixpath
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+import logging
+
+from .output_janitor import touch
+from ..utils.lru import LRUCache
+
+try:
+    import boto3
+except ImportError:  # pragma: no cover - boto3 is only needed for the S3 backend
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+# Files get the mode open() would give them, not mkstemp's owner-only 0600, so a proxy or
+# CDN origin running as another user can read them. The umask is read once at import,
+# since reading it means briefly changing it.
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+# Path under which the application itself serves stored memes
+STATIC_MEMES_PATH = "/static/memes"
+
+# Cache policies for objects a bucket or CDN serves directly
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class InvalidStorageKeyError(ValueError):
+    """Raised for keys that are absolute or escape the storage root"""
+
+
+def validate_key(key: str) -> str:
+    """Return a normalized relative key, rejecting traversal outside the storage root"""
+    normalized = posixpath.normpath(key.replace("\\", "/"))
+    if not key or normalized.startswith(("/", "../")) or normalized in (".", ".."):
+        raise InvalidStorageKeyError(f"Invalid storage key: {key}")
+    return normalized
+
+
+class MemeStorage(ABC):
+    """Interface for storing rendered memes under relative keys such as 'ab/<hash>.png'"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Check whether a key is stored"""
+
+    @abstractmethod
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+        cache_control: Optional[str] = None
+    ) -> None:
+        """Store data under a key, replacing any previous value atomically.
+
+        cache_control is the policy for backends that serve files directly; by default
+        clients must revalidate, so only callers that know a key never changes pass
+        IMMUTABLE_CACHE_CONTROL.
+        """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Read a stored value, or None when it is missing"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a key if it exists"""
+
+    @property
+    @abstractmethod
+    def location(self) -> str:
+        """Human-readable description of where files are stored"""
+
+    def describe(self, key: str) -> str:
+        """Location of a single stored file, as reported in API responses"""
+        return f"{self.location}/{validate_key(key)}"
+
+    def url(self, key: str, base_url: str) -> str:
+        """Public URL of a stored file; by default the application serves it"""
+        return f"{base_url.rstrip('/')}{STATIC_MEMES_PATH}/{validate_key(key)}"
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of a stored file, for backends that have one"""
+        return None
+
+    def touch(self, key: str) -> None:
+        """Record an access to a stored file"""
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+
+class LocalStorage(MemeStorage):
+    """Stores memes on the local filesystem below a root directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.directory, *validate_key(key).split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+        cache_control: Optional[str] = None
+    ) -> None:
+        # Write a temporary sibling and rename it, so readers never see partial images
+        path = self.local_path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(temp_path, FILE_MODE)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.local_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    @property
+    def location(self) -> str:
+        return os.path.relpath(self.directory)
+
+    def describe(self, key: str) -> str:
+        return os.path.relpath(self.local_path(key))
+
+    def touch(self, key: str) -> None:
+        touch(self.local_path(key))
+
+
+class MemoryStorage(MemeStorage):
+    """Keeps memes in a process-local dictionary, for tests and throwaway deployments"""
+
+    def __init__(self):
+        self._files: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return validate_key(key) in self._files
+
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+        cache_control: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            self._files[validate_key(key)] = bytes(data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._files.get(validate_key(key))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._files.pop(validate_key(key), None)
+
+    @property
+    def location(self) -> str:
+        return "memory://"
+
+    def describe(self, key: str) -> str:
+        return f"memory://{validate_key(key)}"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._files)
+
+
+class S3Storage(MemeStorage):
+    """Stores memes in an S3-compatible bucket (AWS S3, MinIO, R2, ...).
+
+    Pass client to use a preconfigured or fake client; otherwise one is created with boto3.
+    With public_url set, URLs point at the bucket or CDN instead of this application.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client: Any = None,
+        public_url: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None
+    ):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("The S3 storage backend requires boto3 (pip install boto3)")
+            client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                region_name=region_name,
+                aws_access_key_id=access_key_id,
+                aws_secret_access_key=secret_access_key
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.public_url = public_url.rstrip("/") if public_url else None
+
+    def object_key(self, key: str) -> str:
+        key = validate_key(key)
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @staticmethod
+    def _is_missing(error: Exception) -> bool:
+        code = str(getattr(error, "response", {}).get("Error", {}).get("Code", ""))
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except Exception as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+        cache_control: Optional[str] = None
+    ) -> None:
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Body=data,
+            ContentType=content_type,
+            CacheControl=cache_control or REVALIDATE_CACHE_CONTROL
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return response["Body"].read()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    @property
+    def location(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}".rstrip("/")
+
+    def url(self, key: str, base_url: str) -> str:
+        if self.public_url:
+            return f"{self.public_url}/{self.object_key(key)}"
+        return super().url(key, base_url)
+
+
+class CachingStorage(MemeStorage):
+    """Keeps recently written and served memes in a bounded memory cache in front of another backend.
+
+    The wrapped backend stays authoritative for exists(), so retention decisions made
+    there (janitor, bucket lifecycle) are respected by the result cache.
+    """
+
+    def __init__(self, backend: MemeStorage, max_bytes: int):
+        self.backend = backend
+        self._cache = LRUCache(max_bytes=max_bytes, sizeof=len)
+
+    def exists(self, key: str) -> bool:
+        return self.backend.exists(key)
+
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+        cache_control: Optional[str] = None
+    ) -> None:
+        self.backend.put(key, data, content_type, cache_control)
+        self._cache.put(validate_key(key), bytes(data))
+
+    def get_cached(self, key: str) -> Optional[bytes]:
+        """Return a value only if it is already in memory, without touching the backend"""
+        return self._cache.get(validate_key(key))
+
+    def get(self, key: str) -> Optional[bytes]:
+        key = validate_key(key)
+        data = self._cache.get(key)
+        if data is None:
+            data = self.backend.get(key)
+            if data is not None:
+                self._cache.put(key, data)
+        return data
+
+    def delete(self, key: str) -> None:
+        self._cache.pop(validate_key(key))
+        self.backend.delete(key)
+
+    @property
+    def location(self) -> str:
+        return self.backend.location
+
+    def describe(self, key: str) -> str:
+        return self.backend.describe(key)
+
+    def url(self, key: str, base_url: str) -> str:
+        return self.backend.url(key, base_url)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self.backend.local_path(key)
+
+    def touch(self, key: str) -> None:
+        self.backend.touch(key)
+
+    def close(self) -> None:
+        self._cache.clear()
+        self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return memory cache counters"""
+        return self._cache.stats()
+
+
+def create_storage(
+    backend: str,
+    directory: str = "generated_memes",
+    bucket: str = "",
+    prefix: str = "",
+    public_url: Optional[str] = None,
+    endpoint_url: Optional[str] = None,
+    region_name: Optional[str] = None,
+    access_key_id: Optional[str] = None,
+    secret_access_key: Optional[str] = None,
+    memory_cache_bytes: int = 0
+) -> MemeStorage:
+    """Build the storage backend configured in settings, with an optional memory cache in front"""
+    storage = _create_backend(
+        backend, directory, bucket, prefix, public_url, endpoint_url, region_name, access_key_id, secret_access_key
+    )
+    if memory_cache_bytes and not isinstance(storage, MemoryStorage):
+        return CachingStorage(storage, memory_cache_bytes)
+    return storage
+
+
+def _create_backend(
+    backend: str,
+    directory: str,
+    bucket: str,
+    prefix: str,
+    public_url: Optional[str],
+    endpoint_url: Optional[str],
+    region_name: Optional[str],
+    access_key_id: Optional[str],
+    secret_access_key: Optional[str]
+) -> MemeStorage:
+    if backend == "local":
+        return LocalStorage(directory)
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "s3":
+        if not bucket:
+            raise ValueError("The S3 storage backend needs a bucket name")
+        return S3Storage(
+            bucket=bucket,
+            prefix=prefix,
+            public_url=public_url,
+            endpoint_url=endpoint_url,
+            region_name=region_name,
+            access_key_id=access_key_id,
+            secret_access_key=secret_access_key
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,246 @@
+"""
+Template image cache with on-disk persistence and HTTP revalidation
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+from PIL import Image
+
+from ..utils.lru import LRUCache
+from ..utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Locks that serialize downloads of templates whose keys hash to the same stripe
+KEY_LOCK_STRIPES = 64
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """Approximate decoded size of an image in memory"""
+    return image.width * image.height * len(image.getbands())
+
+
+def decode_image(data: bytes, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode image bytes, letting JPEG decode directly at a reduced scale when a draft size is given"""
+    with timed("decode"):
+        image = Image.open(BytesIO(data))
+        if draft_size is not None and image.format == 'JPEG':
+            # Picks the smallest DCT scale that still covers draft_size
+            image.draft(None, draft_size)
+        image.load()
+        return image
+
+
+class TemplateCache:
+    """Caches template images on disk keyed by URL hash and keeps decoded images in a byte-bounded LRU"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        fetch: Callable[[str, Dict[str, str]], Any],
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        max_memory_bytes: int = 128 * 1024 * 1024,
+        ttl_seconds: float = 3600
+    ):
+        self.cache_dir = cache_dir
+        self.fetch = fetch
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        # Entries are (decoded image, time the cached copy was last validated)
+        self._images = LRUCache(max_bytes=max_memory_bytes, sizeof=lambda entry: image_nbytes(entry[0]))
+        self._lock = threading.Lock()
+        # A fixed set of locks shared by hash, so locking stays bounded however many URLs are seen
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.disk_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(cache_dir)
+            if entry.is_file() and entry.name.endswith('.bin')
+        )
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        """Hash a template URL into a cache key"""
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        """Return the data and metadata file paths for a key"""
+        base = os.path.join(self.cache_dir, key)
+        return base + '.bin', base + '.json'
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        """Lock for a URL's key so concurrent misses for one template download it once"""
+        return self._key_locks[int(key[:8], 16) % len(self._key_locks)]
+
+    def _is_fresh(self, validated_at: float) -> bool:
+        return time.time() - validated_at < self.ttl_seconds
+
+    def get_image(self, url: str, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Return the decoded template image, downloading or revalidating as needed.
+
+        The returned image is shared between callers and must not be modified in place.
+        """
+        key = self.cache_key(url)
+        memory_key = (key, draft_size)
+        entry = self._images.get(memory_key)
+        if entry is not None and self._is_fresh(entry[1]):
+            self.memory_hits += 1
+            return entry[0]
+
+        with self._key_lock(key):
+            # Another thread may have filled the cache while we waited
+            entry = self._images.get(memory_key)
+            if entry is not None and self._is_fresh(entry[1]):
+                self.memory_hits += 1
+                return entry[0]
+
+            data, validated_at = self._load_bytes(url, key)
+            image = decode_image(data, draft_size)
+            self._images.put(memory_key, (image, validated_at))
+            return image
+
+    def _load_bytes(self, url: str, key: str) -> Tuple[bytes, float]:
+        """Read template bytes from disk, revalidating or downloading when stale or missing"""
+        data_path, meta_path = self._paths(key)
+        meta = self._read_meta(meta_path)
+
+        if meta is not None and os.path.exists(data_path):
+            try:
+                return self._load_cached(url, data_path, meta_path, meta)
+            except FileNotFoundError:
+                # Disk eviction removed the file after we checked for it, so treat it as a miss
+                logger.info(f"Template cache entry {key} was evicted while loading, downloading it again")
+
+        response = self.fetch(url, {})
+        response.raise_for_status()
+        return self._store_response(url, data_path, meta_path, response)
+
+    def _load_cached(self, url: str, data_path: str, meta_path: str, meta: Dict[str, Any]) -> Tuple[bytes, float]:
+        """Serve a cached template, revalidating it first when stale"""
+        if self._is_fresh(meta.get('validated_at', 0)):
+            data = self._read_data(data_path)
+            self.disk_hits += 1
+            return data, meta['validated_at']
+
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            response = self.fetch(url, headers)
+            if response.status_code == 304:
+                data = self._read_data(data_path)
+                self.revalidations += 1
+                meta['validated_at'] = time.time()
+                self._write_meta(meta_path, meta)
+                return data, meta['validated_at']
+            response.raise_for_status()
+        except FileNotFoundError:
+            # Evicted while revalidating; _load_bytes downloads it again
+            raise
+        except Exception as e:
+            # Serve the stale copy rather than failing the render
+            logger.warning(f"Failed to revalidate template {url}, using cached copy: {e}")
+            data = self._read_data(data_path)
+            self.disk_hits += 1
+            return data, meta.get('validated_at', 0)
+        return self._store_response(url, data_path, meta_path, response)
+
+    def _store_response(self, url: str, data_path: str, meta_path: str, response: Any) -> Tuple[bytes, float]:
+        """Cache a downloaded template and return its bytes"""
+        self.misses += 1
+        data = response.content
+        validated_at = time.time()
+        self._store(data_path, meta_path, data, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'validated_at': validated_at,
+            'size': len(data)
+        })
+        return data, validated_at
+
+    def _read_data(self, data_path: str) -> bytes:
+        """Read cached bytes and mark the file as recently used"""
+        with open(data_path, 'rb') as f:
+            data = f.read()
+        os.utime(data_path)
+        return data
+
+    @staticmethod
+    def _read_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: Dict[str, Any]) -> None:
+        tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _store(self, data_path: str, meta_path: str, data: bytes, meta: Dict[str, Any]) -> None:
+        """Persist template bytes and metadata, then enforce the disk budget"""
+        try:
+            previous_size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+            tmp_path = f"{data_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, data_path)
+            self._write_meta(meta_path, meta)
+            with self._lock:
+                self.disk_bytes += len(data) - previous_size
+            self._evict_disk()
+        except OSError as e:
+            logger.warning(f"Could not write template cache entry: {e}")
+
+    def _evict_disk(self) -> None:
+        """Remove least recently used templates until the cache fits on disk"""
+        with self._lock:
+            if self.disk_bytes <= self.max_disk_bytes:
+                return
+            entries = sorted(
+                (entry for entry in os.scandir(self.cache_dir)
+                 if entry.is_file() and entry.name.endswith('.bin')),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in entries:
+                if self.disk_bytes <= self.max_disk_bytes:
+                    break
+                size = entry.stat().st_size
+                key = entry.name[:-len('.bin')]
+                data_path, meta_path = self._paths(key)
+                for path in (data_path, meta_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self.disk_bytes -= size
+                logger.info(f"Evicted template cache entry {key}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return template cache counters"""
+        lookups = self.memory_hits + self.disk_hits + self.revalidations + self.misses
+        hits = lookups - self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "disk_bytes": self.disk_bytes,
+            "memory": self._images.stats()
+        }
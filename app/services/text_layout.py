@@ -0,0 +1,122 @@
+"""
+Width-aware caption layout with memoized measurements
+"""
+import os
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional
+import logging
+from PIL import ImageFont
+
+from ..utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class TextLayout(NamedTuple):
+    """Wrapped caption lines with their measured widths"""
+    lines: List[str]
+    line_widths: List[int]
+    line_height: int
+
+
+class TextLayoutEngine:
+    """Greedy word wrapper that measures each word once per font and caches layouts"""
+
+    def __init__(self, cache_size: int = 1024, advance_cache_size: int = 16384):
+        self._layouts = LRUCache(max_entries=cache_size)
+        self._advances = LRUCache(max_entries=advance_cache_size)
+        self._line_heights: Dict[Hashable, int] = {}
+
+    @staticmethod
+    def font_key(font: ImageFont.ImageFont) -> Optional[Hashable]:
+        """Identify a font by file, size and face, or None for fonts that cannot be cached safely.
+
+        Fonts loaded from memory or bitmap fonts (such as Pillow's default font) have no
+        stable identity; keying them by id() could match a different font after eviction.
+        """
+        path = getattr(font, 'path', None)
+        if isinstance(path, (str, bytes, os.PathLike)):
+            return (os.fspath(path), getattr(font, 'size', None), getattr(font, 'index', 0))
+        return None
+
+    def measure(self, font: ImageFont.ImageFont, text: str) -> float:
+        """Return the advance width of a piece of text, memoized per font"""
+        return self._measure(font, self.font_key(font), text)
+
+    def _measure(self, font: ImageFont.ImageFont, font_key: Optional[Hashable], text: str) -> float:
+        if font_key is None:
+            return font.getlength(text)
+        key = (font_key, text)
+        advance = self._advances.get(key)
+        if advance is None:
+            advance = font.getlength(text)
+            self._advances.put(key, advance)
+        return advance
+
+    def line_height(self, font: ImageFont.ImageFont) -> int:
+        """Return the caption line height for a font"""
+        return self._line_height(font, self.font_key(font))
+
+    def _line_height(self, font: ImageFont.ImageFont, font_key: Optional[Hashable]) -> int:
+        height = self._line_heights.get(font_key) if font_key is not None else None
+        if height is None:
+            bbox = font.getbbox("A")
+            height = bbox[3] - bbox[1] + 5
+            if font_key is not None:
+                self._line_heights[font_key] = height
+        return height
+
+    def layout(self, text: str, font: ImageFont.ImageFont, max_width: int) -> TextLayout:
+        """Wrap text to fit within max_width, reusing cached results"""
+        font_key = self.font_key(font)
+        if font_key is None:
+            return self._wrap(text, font, font_key, max_width)
+        cache_key = (text, font_key, max_width)
+        layout = self._layouts.get(cache_key)
+        if layout is None:
+            layout = self._wrap(text, font, font_key, max_width)
+            self._layouts.put(cache_key, layout)
+        return layout
+
+    def _wrap(
+        self,
+        text: str,
+        font: ImageFont.ImageFont,
+        font_key: Optional[Hashable],
+        max_width: int
+    ) -> TextLayout:
+        """Greedily fill lines using running widths instead of re-measuring joined text"""
+        space_width = self._measure(font, font_key, ' ')
+        lines: List[str] = []
+        line_widths: List[int] = []
+        current_line: List[str] = []
+        current_width = 0.0
+
+        for word in text.split():
+            word_width = self._measure(font, font_key, word)
+            test_width = current_width + space_width + word_width if current_line else word_width
+
+            if test_width <= max_width:
+                current_line.append(word)
+                current_width = test_width
+            elif current_line:
+                lines.append(' '.join(current_line))
+                line_widths.append(round(current_width))
+                current_line = [word]
+                current_width = word_width
+            else:
+                # A single word wider than the box gets a line of its own
+                lines.append(word)
+                line_widths.append(round(word_width))
+
+        if current_line:
+            lines.append(' '.join(current_line))
+            line_widths.append(round(current_width))
+
+        return TextLayout(lines, line_widths, self._line_height(font, font_key))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return layout and advance cache counters"""
+        return {
+            "layouts": self._layouts.stats(),
+            "advances": self._advances.stats()
+        }
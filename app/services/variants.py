@@ -0,0 +1,49 @@
+"""
+Resized and re-encoded variants of rendered memes, such as grid thumbnails
+"""
+from typing import Any, Dict, Iterable, Optional
+import logging
+from PIL import Image
+
+from .image_encoder import ImageEncoder
+from .template_cache import decode_image
+from ..utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class VariantRenderer:
+    """Derives variants from stored renders for an allow-listed set of widths.
+
+    Variants are kept in a byte-bounded LRU keyed by (storage key, width, format).
+    """
+
+    def __init__(self, encoder: ImageEncoder, widths: Iterable[int], max_bytes: int):
+        self.encoder = encoder
+        self.widths = sorted(set(widths))
+        self._cache = LRUCache(max_bytes=max_bytes, sizeof=len)
+
+    def is_allowed_width(self, width: int) -> bool:
+        return width in self.widths
+
+    def get_cached(self, key: str, width: Optional[int], output_format: str) -> Optional[bytes]:
+        """Return a variant that was rendered before"""
+        return self._cache.get((key, width, output_format))
+
+    def render(self, key: str, data: bytes, width: Optional[int], output_format: str) -> bytes:
+        """Render and cache a variant of the stored image bytes"""
+        cached = self.get_cached(key, width, output_format)
+        if cached is not None:
+            return cached
+        # JPEG sources decode straight at the smallest scale that is still at least width wide
+        image = decode_image(data, (width, 1) if width is not None else None)
+        if width is not None and width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        variant = self.encoder.encode(image, output_format)
+        self._cache.put((key, width, output_format), variant)
+        return variant
+
+    def stats(self) -> Dict[str, Any]:
+        """Return variant cache counters"""
+        return self._cache.stats()
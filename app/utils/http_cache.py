@@ -0,0 +1,49 @@
+"""
+Helpers for HTTP validators, conditional requests and byte ranges
+"""
+from typing import Optional, Tuple
+
+
+class RangeNotSatisfiableError(ValueError):
+    """Raised when a byte range lies entirely outside the representation"""
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag using weak comparison"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range Range header into inclusive (start, end) offsets.
+
+    Returns None when the whole representation should be sent instead: no header,
+    a unit other than bytes, multiple ranges or a malformed value.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, last = (part.strip() for part in spec.split("-", 1))
+    if not (first or last) or any(part and not part.isdigit() for part in (first, last)):
+        return None
+
+    if first:
+        start = int(first)
+        if start >= size:
+            raise RangeNotSatisfiableError(header)
+        end = min(int(last), size - 1) if last else size - 1
+        if start > end:
+            return None
+        return start, end
+
+    # Suffix range: the final N bytes
+    length = int(last)
+    if length == 0 or size == 0:
+        raise RangeNotSatisfiableError(header)
+    return max(size - length, 0), size - 1
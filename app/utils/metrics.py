@@ -0,0 +1,181 @@
+"""
+Per-stage timing histograms and Prometheus text exposition
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Stroke drawing takes microseconds and upstream calls seconds, so buckets span both
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def escape_label_value(value: str) -> str:
+    """Escape a label value for the Prometheus text format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    """Format a sample value, spelling out infinities as Prometheus expects"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    """One exposition line: name{label="value",...} value"""
+    if labels:
+        rendered = ",".join(f'{key}="{escape_label_value(str(val))}"' for key, val in labels.items())
+        return f"{name}{{{rendered}}} {format_value(value)}"
+    return f"{name} {format_value(value)}"
+
+
+def render_metric(name: str, metric_type: str, help_text: str, samples: Iterable[Sample]) -> List[str]:
+    """HELP and TYPE lines followed by the samples of one metric family"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    lines.extend(format_sample(name, labels, value) for labels, value in samples)
+    return lines
+
+
+class Histogram:
+    """Thread-safe cumulative histogram keyed by a single label"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Per label value: bucket counts (the last one for +Inf) and the running sum
+        self._series: Dict[str, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, label_value: str, value: float) -> None:
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Observation count and sum per label value"""
+        with self._lock:
+            return {
+                label_value: {"count": sum(counts), "sum": total[0]}
+                for label_value, (counts, total) in self._series.items()
+            }
+
+    def render(self) -> List[str]:
+        """Exposition lines with cumulative buckets, _sum and _count per label value"""
+        with self._lock:
+            series = {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+        samples: List[Tuple[str, Dict[str, str], float]] = []
+        for label_value in sorted(series):
+            counts, total = series[label_value]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", {self.label: label_value, "le": format_value(bound)}, cumulative))
+            samples.append(("_sum", {self.label: label_value}, total))
+            samples.append(("_count", {self.label: label_value}, cumulative))
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        lines.extend(format_sample(self.name + suffix, labels, value) for suffix, labels, value in samples)
+        return lines
+
+    def reset(self) -> None:
+        """Forget all observations"""
+        with self._lock:
+            self._series.clear()
+
+
+class StageTimings:
+    """Per-request totals of the stage durations observed while serving it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add one stage duration; memes render in parallel, so totals can exceed wall time"""
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def merge(self, other: "StageTimings") -> None:
+        """Add every stage recorded by another request, such as the one whose work this request shared"""
+        with other._lock:
+            stages = [(stage, list(entry)) for stage, entry in other._stages.items()]
+        with self._lock:
+            for stage, (count, total, slowest) in stages:
+                entry = self._stages.get(stage)
+                if entry is None:
+                    self._stages[stage] = [count, total, slowest]
+                else:
+                    entry[0] += count
+                    entry[1] += total
+                    entry[2] = max(entry[2], slowest)
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Count, total and slowest duration per stage"""
+        with self._lock:
+            return {
+                stage: {"count": int(count), "total_seconds": total, "max_seconds": slowest}
+                for stage, (count, total, slowest) in self._stages.items()
+            }
+
+
+STAGE_DURATION = Histogram(
+    "meme_stage_duration_seconds",
+    "Time spent in each stage of meme generation",
+    label="stage"
+)
+
+_request_timings: ContextVar[Optional[StageTimings]] = ContextVar("meme_stage_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration in the histogram and in the current request's timings"""
+    STAGE_DURATION.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the block as one occurrence of a stage, whether or not it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_timings() -> Iterator[StageTimings]:
+    """Collect the stages timed in this context, including work it hands to executors"""
+    timings = StageTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
@@ -0,0 +1,91 @@
+"""
+Stack sampling of the worker threads serving a request
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional, Set
+
+_active_sampler: ContextVar[Optional["StackSampler"]] = ContextVar("meme_stack_sampler", default=None)
+
+
+def collapse_stack(frame: Any) -> str:
+    """Format a stack root first, one frame per segment, as in collapsed-stack files"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Periodically records the Python stacks of the threads registered with it"""
+
+    def __init__(self, interval_seconds: float = 0.005):
+        super().__init__(name="meme-stack-sampler", daemon=True)
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: Set[int] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._on_stopped: Optional[Callable[["StackSampler"], None]] = None
+
+    def add_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads.add(ident)
+
+    def remove_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads.discard(ident)
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            with self._lock:
+                threads = list(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[collapse_stack(frame)] += 1
+                    self.samples += 1
+        if self._on_stopped is not None:
+            self._on_stopped(self)
+
+    def stop(self, on_stopped: Optional[Callable[["StackSampler"], None]] = None) -> None:
+        """Stop sampling; on_stopped runs on the sampler thread, keeping file writes off the caller"""
+        self._on_stopped = on_stopped
+        self._stopped.set()
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format, one 'frame;frame;frame count' line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def activate(sampler: StackSampler) -> Iterator[StackSampler]:
+    """Make sampler the one that work started from this context registers with"""
+    token = _active_sampler.set(sampler)
+    try:
+        yield sampler
+    finally:
+        _active_sampler.reset(token)
+
+
+def run_sampled(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call func with this thread sampled while it runs, if the current context is being profiled"""
+    sampler = _active_sampler.get()
+    if sampler is None:
+        return func(*args, **kwargs)
+    ident = threading.get_ident()
+    sampler.add_thread(ident)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        sampler.remove_thread(ident)
@@ -0,0 +1,3 @@
+"""
+Offline benchmarks and load-testing tools for the Meme Generator API
+"""
@@ -0,0 +1,162 @@
+"""
+Local stand-in for the SuperMeme text-to-meme API and its template CDN
+
+Serves the recorded text-to-meme response shape and generated template images with
+configurable latency, error rate and payload size, so the full request path can be
+load tested without touching SuperMeme:
+
+    python -m benchmarks.fake_upstream --port 8001 --latency-ms 800 --error-rate 0.01
+
+    SUPERMEME_API_URL=http://localhost:8001/api/meme/text-to-meme-2 \\
+    SUPERMEME_ACCESS_TOKEN=fake python run.py
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+
+from .fixtures import recorded_results, template_bytes, template_name
+
+TEXT_TO_MEME_PATH = "/api/meme/text-to-meme-2"
+
+
+class FakeUpstreamConfig(BaseModel):
+    """Behaviour of the stand-in upstream"""
+    latency_ms: float = Field(default=0, ge=0, description="Mean delay before answering a text-to-meme request")
+    jitter_ms: float = Field(default=0, ge=0, description="Uniform +/- variation around latency_ms")
+    template_latency_ms: float = Field(default=0, ge=0, description="Delay before serving a template image")
+    error_rate: float = Field(default=0, ge=0, le=1, description="Share of text-to-meme requests answered with 500")
+    results: int = Field(default=16, ge=0, description="Memes per response, cycling through the recorded ones")
+    echo_prompt: bool = Field(
+        default=True,
+        description="Use the prompt as the first caption, so different prompts render different images"
+    )
+    require_token: bool = Field(default=True, description="Answer 401 when the token header is missing")
+    seed: Optional[int] = Field(default=None, description="Seed for latency and error sampling")
+
+
+def build_results(config: FakeUpstreamConfig, prompt: str, template_base_url: str) -> Dict[str, Any]:
+    """Build a text-to-meme response body with templates pointing at this server"""
+    recorded, run_id = recorded_results()
+    results = []
+    for i in range(config.results):
+        meme = dict(recorded[i % len(recorded)])
+        if i >= len(recorded):
+            meme["id"] = f"{meme['id']}-{i // len(recorded)}"
+        meme["image_name"] = f"{template_base_url}/templates/{quote(template_name(meme['image_name']))}"
+        meme["captions"] = [dict(caption) for caption in meme["captions"]]
+        if config.echo_prompt and meme["captions"]:
+            meme["captions"][0]["text"] = prompt
+        results.append(meme)
+    return {"response": {"runId": run_id, "results": results}}
+
+
+def create_app(config: Optional[FakeUpstreamConfig] = None) -> FastAPI:
+    """Create the stand-in upstream application"""
+    app = FastAPI(title="Fake SuperMeme upstream")
+    app.state.config = config or FakeUpstreamConfig()
+    app.state.random = random.Random(app.state.config.seed)
+    app.state.counters = {
+        "text_to_meme": 0, "errors": 0, "unauthorized": 0, "templates": 0, "not_modified": 0, "connections": 0
+    }
+    app.state.clients = set()
+
+    def record_connection(request: Request) -> None:
+        """Count distinct client connections, showing whether callers reuse them"""
+        if request.client is not None:
+            app.state.clients.add((request.client.host, request.client.port))
+            app.state.counters["connections"] = len(app.state.clients)
+
+    async def delay(milliseconds: float, jitter: float = 0) -> None:
+        if jitter:
+            milliseconds = max(0.0, milliseconds + app.state.random.uniform(-jitter, jitter))
+        if milliseconds:
+            await asyncio.sleep(milliseconds / 1000)
+
+    @app.post(TEXT_TO_MEME_PATH)
+    async def text_to_meme(request: Request) -> JSONResponse:
+        config = app.state.config
+        counters = app.state.counters
+        counters["text_to_meme"] += 1
+        record_connection(request)
+        if config.require_token and not request.headers.get("token"):
+            counters["unauthorized"] += 1
+            return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+        body = await request.json()
+        await delay(config.latency_ms, config.jitter_ms)
+        if app.state.random.random() < config.error_rate:
+            counters["errors"] += 1
+            return JSONResponse({"error": "Injected upstream failure"}, status_code=500)
+
+        base_url = f"{request.url.scheme}://{request.url.netloc}"
+        return JSONResponse(build_results(config, body.get("text", ""), base_url))
+
+    @app.get("/templates/{name}")
+    async def get_template(name: str, request: Request) -> Response:
+        app.state.counters["templates"] += 1
+        record_connection(request)
+        await delay(app.state.config.template_latency_ms)
+        data = template_bytes(name)
+        etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+        if request.headers.get("if-none-match") == etag:
+            app.state.counters["not_modified"] += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=data, media_type="image/jpeg", headers={"ETag": etag})
+
+    @app.get("/config")
+    async def get_config() -> FakeUpstreamConfig:
+        return app.state.config
+
+    @app.put("/config")
+    async def put_config(config: FakeUpstreamConfig) -> FakeUpstreamConfig:
+        """Change latency, errors or payload size while a load test runs"""
+        app.state.config = config
+        if config.seed is not None:
+            app.state.random.seed(config.seed)
+        return config
+
+    @app.get("/stats")
+    async def get_stats() -> Dict[str, int]:
+        return app.state.counters
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the SuperMeme API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--template-latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--results", type=int, default=16, help="Memes per response")
+    parser.add_argument("--no-echo-prompt", action="store_true", help="Always return the recorded captions")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeUpstreamConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        template_latency_ms=args.template_latency_ms,
+        error_rate=args.error_rate,
+        results=args.results,
+        echo_prompt=not args.no_echo_prompt,
+        seed=args.seed
+    )
+    print(f"🎭 Fake upstream: http://{args.host}:{args.port}{TEXT_TO_MEME_PATH}")
+    # Browser-impersonating clients ask to upgrade plain HTTP to h2c. The httptools parser
+    # then loses the request body, while h11 ignores the upgrade and answers normally
+    uvicorn.run(create_app(config), host=args.host, port=args.port, http="h11", log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Recorded upstream payloads and locally generated template images
+"""
+import copy
+import json
+import os
+import random
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.services.font_registry import FontRegistry
+from app.services.meme_generator import SuperMemeGenerator, caption_layer_nbytes
+from app.services.storage import MemeStorage, MemoryStorage
+from app.services.template_cache import image_nbytes
+from app.services.text_layout import TextLayoutEngine
+from app.utils.lru import LRUCache
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "data")
+
+# Recorded templates are larger than the memes drawn from them, as on the real CDN
+TEMPLATE_SCALE = 2
+
+
+@lru_cache(maxsize=None)
+def load_recorded_response(name: str = "text_to_meme.json") -> Dict[str, Any]:
+    """Load a recorded text-to-meme response body"""
+    with open(os.path.join(DATA_DIRECTORY, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def recorded_results() -> Tuple[List[Dict[str, Any]], str]:
+    """Return a fresh copy of the recorded meme results and their run id"""
+    response = load_recorded_response()["response"]
+    return copy.deepcopy(response["results"]), response["runId"]
+
+
+def template_sizes() -> Dict[str, Tuple[int, int]]:
+    """Map each recorded template name to the size it is served at"""
+    sizes = {}
+    for meme in recorded_results()[0]:
+        name = template_name(meme["image_name"])
+        sizes[name] = (meme["width"] * TEMPLATE_SCALE, meme["height"] * TEMPLATE_SCALE)
+    return sizes
+
+
+def template_name(url: str) -> str:
+    """Template file name of a template URL"""
+    return unquote(os.path.basename(urlparse(url).path))
+
+
+@lru_cache(maxsize=64)
+def template_bytes(name: str, size: Optional[Tuple[int, int]] = None) -> bytes:
+    """Encode a deterministic photo-like JPEG standing in for a template"""
+    width, height = size or template_sizes().get(name, (952, 1000))
+    rng = random.Random(name)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randrange(width // 20 + 1, width // 4 + 2)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=color)
+    # Soften edges so the JPEG compresses like a photo rather than flat artwork
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class TemplateResponse:
+    """Minimal stand-in for the HTTP response object used by template downloads"""
+
+    def __init__(self, content: bytes, status_code: int = 200):
+        self.content = content
+        self.status_code = status_code
+        self.headers: Dict[str, str] = {"Content-Type": "image/jpeg"}
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+def fetch_local_template(url: str, headers: Optional[Dict[str, str]] = None) -> TemplateResponse:
+    """Serve a generated template for any template URL without touching the network"""
+    return TemplateResponse(template_bytes(template_name(url)))
+
+
+def create_generator(storage: Optional[MemeStorage] = None, caches: bool = True) -> SuperMemeGenerator:
+    """Build a generator configured like the API's, with local templates and no upstream access.
+
+    With caches=False the layout, resized template and caption layer caches are left out,
+    so every call does the full measuring and drawing work.
+    """
+    generator = SuperMemeGenerator(
+        api_url="http://upstream.invalid",
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="benchmark",
+        mail_api_url="http://mail.invalid",
+        font_registry=FontRegistry(),
+        layout_engine=TextLayoutEngine() if caches else TextLayoutEngine(cache_size=0, advance_cache_size=0),
+        resized_template_cache=LRUCache(max_bytes=64 * 1024 * 1024, sizeof=image_nbytes) if caches else None,
+        storage=storage or MemoryStorage(),
+        caption_layer_cache=(
+            LRUCache(max_bytes=16 * 1024 * 1024, sizeof=caption_layer_nbytes) if caches else None
+        )
+    )
+    generator.fetch_template = fetch_local_template
+    return generator
@@ -0,0 +1,152 @@
+"""
+Closed-loop load generator for the Meme Generator API
+
+Keeps a fixed number of requests in flight against a running API and reports
+throughput and tail latency. Run it against an API that points at the fake upstream
+(benchmarks.fake_upstream) to capacity-plan workers without calling SuperMeme:
+
+    python -m benchmarks.load_test --concurrency 8 --duration 60
+    python -m benchmarks.load_test --path /api/v1/render --concurrency 32 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from .fixtures import recorded_results, template_name
+from .runner import percentile
+
+
+def request_body(
+    path: str, 
+    i: int, 
+    unique_prompts: bool, 
+    template_base_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """Body for the i-th request; unique prompts defeat the result cache and render deduplication"""
+    if path.rstrip("/").endswith("/render"):
+        memes = recorded_results()[0]
+        meme = memes[i % len(memes)]
+        if template_base_url:
+            meme["image_name"] = f"{template_base_url.rstrip('/')}/templates/{quote(template_name(meme['image_name']))}"
+        if unique_prompts and meme["captions"]:
+            meme["captions"][0]["text"] = f"load test caption {i}"
+        return {"memes": [meme]}
+    prompt = f"load test prompt {i}" if unique_prompts else "load test prompt"
+    return {"text_prompt": prompt, "use_cache": not unique_prompts}
+
+
+async def run_load(
+    base_url: str,
+    path: str = "/api/v1/generate-meme",
+    concurrency: int = 8,
+    duration: Optional[float] = 30,
+    requests: Optional[int] = None,
+    unique_prompts: bool = True,
+    template_base_url: Optional[str] = None,
+    timeout: float = 120,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> Dict[str, Any]:
+    """Issue requests from concurrency workers until the duration or request count is reached"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = {"next": 0}
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_index() -> Optional[int]:
+        if requests is not None and counter["next"] >= requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        counter["next"] += 1
+        return counter["next"] - 1
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while True:
+            i = next_index()
+            if i is None:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=request_body(path, i, unique_prompts, template_base_url))
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        timeout=timeout,
+        transport=transport,
+        limits=httpx.Limits(max_connections=concurrency)
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    successes = statuses.get("200", 0)
+    report: Dict[str, Any] = {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "elapsed_seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "success_rps": successes / elapsed if elapsed > 0 else 0.0,
+        "error_rate": 1 - successes / len(latencies) if latencies else 0.0,
+        "statuses": dict(statuses)
+    }
+    if latencies:
+        for name, fraction in (("p50", 0.50), ("p90", 0.90), ("p95", 0.95), ("p99", 0.99)):
+            report[f"{name}_ms"] = percentile(latencies, fraction) * 1000
+        report["max_ms"] = max(latencies) * 1000
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['requests']} requests to {report['path']} in {report['elapsed_seconds']:.1f}s "
+          f"with {report['concurrency']} in flight")
+    print(f"Throughput: {report['rps']:.2f} req/s ({report['success_rps']:.2f} successful)")
+    print(f"Statuses:   {', '.join(f'{status}: {count}' for status, count in sorted(report['statuses'].items()))}")
+    if report["requests"]:
+        print("Latency:    " + "  ".join(
+            f"{name} {report[f'{name}_ms']:.0f} ms" for name in ("p50", "p90", "p95", "p99", "max")
+        ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the Meme Generator API")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--path", default="/api/v1/generate-meme", help="Endpoint to POST to")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests kept in flight")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run for")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests instead")
+    parser.add_argument("--repeat-prompt", action="store_true",
+                        help="Send the same prompt every time, measuring the cached path")
+    parser.add_argument("--template-url", help="Fake upstream base URL to serve /render templates from")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(
+        args.url,
+        path=args.path,
+        concurrency=args.concurrency,
+        duration=None if args.requests else args.duration,
+        requests=args.requests,
+        unique_prompts=not args.repeat_prompt,
+        template_base_url=args.template_url,
+        timeout=args.timeout
+    ))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline benchmarks for the rendering layer and the generate-meme endpoint
+
+Every case runs against the recorded upstream payload in benchmarks/data and locally
+generated templates, so results do not depend on the network or SuperMeme. Text and
+caption cases run without the layout and caption caches to measure the drawing work
+itself; the render and endpoint cases use caches like the API but start each
+iteration with empty storage, so every meme is really drawn and encoded.
+
+    python -m benchmarks                                  # print results
+    python -m benchmarks --save benchmarks/baselines/main.json
+    python -m benchmarks --compare benchmarks/baselines/main.json --tolerance 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+import PIL
+from PIL import Image, ImageDraw
+
+from .fixtures import create_generator, recorded_results
+from app.services.storage import MemoryStorage
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# A case is set up once and returns the operation to time; it receives the iteration number
+Operation = Callable[[int], None]
+CASES: Dict[str, Callable[[ExitStack], Operation]] = {}
+
+
+def case(name: str) -> Callable:
+    """Register a benchmark case"""
+    def register(setup: Callable[[ExitStack], Operation]) -> Callable[[ExitStack], Operation]:
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def all_captions() -> List[Dict[str, Any]]:
+    """Every caption in the recorded payload"""
+    return [caption for meme in recorded_results()[0] for caption in meme["captions"]]
+
+
+@case("wrap_text")
+def wrap_text_case(resources: ExitStack) -> Operation:
+    """Wrap every recorded caption at its box width"""
+    generator = create_generator(caches=False)
+    captions = [(c["text"], generator.get_font(c["fontSize"]), c["width"]) for c in all_captions()]
+
+    def run(i: int) -> None:
+        for text, font, width in captions:
+            generator.wrap_text(text, font, width)
+    return run
+
+
+@case("draw_text_with_stroke")
+def draw_text_with_stroke_case(resources: ExitStack) -> Operation:
+    """Draw one stroked caption line"""
+    generator = create_generator(caches=False)
+    font = generator.get_font(18)
+    canvas = Image.new("RGB", (500, 60), "gray")
+    draw = ImageDraw.Draw(canvas)
+
+    def run(i: int) -> None:
+        generator.draw_text_with_stroke(
+            draw, (10, 10), "When the tests pass on the first try", font, "white", "black", 2
+        )
+    return run
+
+
+@case("add_caption_to_image")
+def add_caption_to_image_case(resources: ExitStack) -> Operation:
+    """Add all captions of one recorded meme to a blank base"""
+    generator = create_generator(caches=False)
+    memes = recorded_results()[0]
+    bases = [Image.new("RGB", (m["width"], m["height"]), "gray") for m in memes]
+
+    def run(i: int) -> None:
+        meme = memes[i % len(memes)]
+        image = bases[i % len(memes)].copy()
+        for caption in meme["captions"]:
+            generator.add_caption_to_image(image, caption)
+    return run
+
+
+@case("generate_image_from_meme_data")
+def generate_image_case(resources: ExitStack) -> Operation:
+    """Render, encode and store one recorded meme"""
+    storage = MemoryStorage()
+    generator = create_generator(storage)
+    memes = recorded_results()[0]
+
+    def run(i: int) -> None:
+        key = generator.generate_image_from_meme_data(memes[i % len(memes)])
+        # Drop the file so the next visit to this meme renders it again
+        storage.delete(key)
+    return run
+
+
+@case("generate_meme_endpoint")
+def generate_meme_endpoint_case(resources: ExitStack) -> Operation:
+    """POST /api/v1/generate-meme for the whole recorded run, with the upstream call mocked"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    generator = create_generator()
+    state = {"storage": generator.storage}
+    resources.enter_context(
+        patch.object(generator, "generate_memes_from_text", side_effect=lambda **_: recorded_results())
+    )
+    resources.enter_context(patch("app.routers.memes.get_meme_generator", return_value=generator))
+    resources.enter_context(patch("app.routers.memes.get_storage", side_effect=lambda: state["storage"]))
+    client = resources.enter_context(TestClient(app))
+    body = {"text_prompt": "when the tests pass on the first try", "use_cache": False}
+
+    def run(i: int) -> None:
+        response = client.post("/api/v1/generate-meme", json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"generate-meme returned {response.status_code}: {response.text}")
+        state["storage"] = generator.storage = MemoryStorage()
+    return run
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Linear-interpolated percentile of a non-empty list"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_case(name: str, iterations: int, warmup: int) -> Dict[str, Any]:
+    """Time one case and summarize its latencies in milliseconds"""
+    with ExitStack() as resources:
+        operation = CASES[name](resources)
+        for i in range(warmup):
+            operation(i)
+        timings = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            operation(warmup + i)
+            timings.append(time.perf_counter() - started)
+
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "ops_per_second": iterations / total if total > 0 else None,
+        # Process high-water mark, so later cases include earlier ones
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_benchmarks(
+    cases: Optional[List[str]] = None,
+    iterations: int = 50,
+    warmup: int = 5,
+    report: Optional[Callable[[str, Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """Run the selected cases and return results with environment details"""
+    results = {}
+    for name in cases or list(CASES):
+        results[name] = run_case(name, iterations, warmup)
+        if report is not None:
+            report(name, results[name])
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": iterations,
+            "warmup": warmup
+        },
+        "results": results
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> List[Dict[str, Any]]:
+    """Compare p50 and p95 latencies with a baseline; a case regresses when either grows beyond tolerance"""
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        row = {"case": name, "regressed": False}
+        for metric in ("p50_ms", "p95_ms"):
+            change = result[metric] / base[metric] - 1 if base[metric] else 0.0
+            row[metric] = change
+            row["regressed"] = row["regressed"] or change > tolerance
+        rows.append(row)
+    return rows
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "n/a"
+    print(
+        f"{name:<32} p50 {result['p50_ms']:9.3f} ms  p95 {result['p95_ms']:9.3f} ms  "
+        f"{result['ops_per_second']:10.1f} ops/s  peak RSS {rss}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline rendering benchmarks")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run (default: all): {', '.join(CASES)}")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--save", metavar="PATH", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare with a JSON baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed slowdown before failing, e.g. 0.2 for 20%%"
+    )
+    args = parser.parse_args(argv)
+    # Per-meme info logs would dominate the output and the timings
+    logging.getLogger("app").setLevel(logging.WARNING)
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)}")
+
+    current = run_benchmarks(args.cases, args.iterations, args.warmup, report=print_result)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.tolerance)
+        print(f"\nCompared with {args.compare} (tolerance {args.tolerance:.0%}):")
+        for row in rows:
+            status = "REGRESSED" if row["regressed"] else "ok"
+            print(f"{row['case']:<32} p50 {row['p50_ms']:+7.1%}  p95 {row['p95_ms']:+7.1%}  {status}")
+        if any(row["regressed"] for row in rows):
+            return 1
+    return 0
@@ -2,15 +2,25 @@
 Meme Generator API - Main application
 """
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 import os
 
 from app.core.config import settings
-from app.routers.memes import router as memes_router
+from app.routers.memes import (
+    router as memes_router,
+    shutdown_services as shutdown_meme_services,
+    start_output_janitor,
+    stop_output_janitor
+)
+from app.routers.jobs import router as jobs_router, start_job_manager, stop_job_manager
+from app.routers.files import router as files_router
+from app.routers.render import router as render_router
+from app.routers.metrics import router as metrics_router
+from app.routers.debug import router as debug_router
 from app.schemas.meme_schemas import HealthResponse, ErrorResponse
 
 # Configure logging
@@ -20,6 +30,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage startup and shutdown of shared services"""
+    await start_job_manager()
+    await start_output_janitor()
+    yield
+    await stop_output_janitor()
+    await stop_job_manager()
+    shutdown_meme_services()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
@@ -27,7 +49,8 @@ app = FastAPI(
     description=settings.app_description,
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -40,10 +63,8 @@ app.add_middleware(
 )
 
 # Create generated_memes directory if it doesn't exist
-os.makedirs(settings.output_directory, exist_ok=True)
-
-# Mount static files for serving generated memes
-app.mount("/static/memes", StaticFiles(directory=settings.output_directory), name="memes")
+if settings.storage_backend == "local":
+    os.makedirs(settings.output_directory, exist_ok=True)
 
 
 # Global exception handler
@@ -85,6 +106,7 @@ async def root():
         "description": settings.app_description,
         "docs": "/docs",
         "health": "/health",
+        "metrics": "/metrics",
         "static_memes": "/static/memes",
         "timestamp": datetime.now().isoformat()
     }
@@ -92,6 +114,11 @@ async def root():
 
 # Include routers
 app.include_router(memes_router)
+app.include_router(jobs_router)
+app.include_router(render_router)
+app.include_router(files_router)
+app.include_router(metrics_router)
+app.include_router(debug_router)
 
 
 if __name__ == "__main__":
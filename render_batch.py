@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Batch render script: re-renders meme data records into the configured storage
+
+Reads one MemeData JSON object per line (for example memes exported from earlier
+responses) and writes one JSON result line per meme:
+
+    python render_batch.py memes.jsonl --format webp > results.jsonl
+    cat memes.jsonl | python render_batch.py - --resize-mode fast
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, Iterator, TextIO
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.routers import memes as memes_routes
+from app.routers.render import create_batch_renderer
+from app.schemas.meme_schemas import MemeData
+
+
+def read_memes(source: TextIO) -> Iterator[Dict[str, Any]]:
+    """Yield validated meme data one line at a time, skipping invalid records"""
+    for line_number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            yield MemeData.model_validate(json.loads(line)).model_dump(exclude_none=True)
+        except (ValueError, ValidationError) as e:
+            print(f"⚠️  Skipping line {line_number}: {e}", file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Render many memes from meme data")
+    parser.add_argument("input", help="JSON Lines file with one meme per line, or - for stdin")
+    parser.add_argument("--output", help="Write result lines here instead of stdout")
+    parser.add_argument("--format", dest="output_format", default=settings.output_format,
+                        choices=["png", "webp", "jpeg", "avif"])
+    parser.add_argument("--quality", type=int, default=None, help="Quality for lossy formats")
+    parser.add_argument("--resize-mode", default=settings.resize_mode, choices=["quality", "fast"])
+    parser.add_argument("--base-url", default=f"http://localhost:{settings.api_port}",
+                        help="API address used for image URLs when storage has no public URL")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    storage = memes_routes.get_storage()
+    start_time = time.time()
+    rendered = 0
+    failed = 0
+
+    try:
+        results = create_batch_renderer().render(
+            read_memes(source),
+            memes_routes.create_output_directory(),
+            resize_mode=args.resize_mode,
+            output_format=args.output_format,
+            quality=args.quality
+        )
+        for item in results:
+            result = {"index": item.index, "meme_id": item.meme_id}
+            if item.error is None:
+                rendered += 1
+                result.update(key=item.key, image_url=storage.url(item.key, args.base_url))
+            else:
+                failed += 1
+                result["error"] = item.error
+            output.write(json.dumps(result) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+        storage.close()
+
+    elapsed = time.time() - start_time
+    rate = rendered / elapsed if elapsed > 0 else 0.0
+    print(f"🎭 Rendered {rendered} memes ({failed} failed) in {elapsed:.1f}s, {rate:.1f}/s", file=sys.stderr)
+    return 1 if failed and not rendered else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
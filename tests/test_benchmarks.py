@@ -0,0 +1,156 @@
+"""
+Unit tests for the offline benchmark suite
+"""
+import threading
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from main import app
+from benchmarks.fake_upstream import TEXT_TO_MEME_PATH, FakeUpstreamConfig, create_app
+from benchmarks.fixtures import create_generator, fetch_local_template, recorded_results
+from benchmarks.load_test import run_load
+from benchmarks.runner import compare, percentile, run_benchmarks
+from app.services.batch_renderer import BatchRenderer
+from app.services.meme_generator import SuperMemeGenerator
+from app.services.storage import MemoryStorage
+
+
+def test_recorded_fixtures_render_without_network():
+    """Test that recorded memes render from locally generated templates"""
+    results, run_id = recorded_results()
+    assert run_id and len(results) == 16
+
+    response = fetch_local_template(results[2]["image_name"])
+    assert response.content == fetch_local_template(results[2]["image_name"]).content
+
+    generator = create_generator()
+    key = generator.generate_image_from_meme_data(results[2])
+    assert generator.storage.exists(key) and ".placeholder" not in key
+
+
+def test_benchmark_results_and_baseline_comparison():
+    """Test result fields and regression detection against a baseline"""
+    current = run_benchmarks(["wrap_text", "draw_text_with_stroke"], iterations=3, warmup=1)
+    result = current["results"]["wrap_text"]
+    assert result["iterations"] == 3
+    assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["max_ms"]
+    assert result["ops_per_second"] > 0
+
+    slower = {"results": {name: {**r, "p50_ms": r["p50_ms"] * 2} for name, r in current["results"].items()}}
+    assert not any(row["regressed"] for row in compare(current, current))
+    assert all(row["regressed"] for row in compare(slower, current, tolerance=0.5))
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+
+
+@pytest.fixture
+def fake_upstream():
+    """Serve the fake upstream over real HTTP on a free local port"""
+    upstream = create_app(FakeUpstreamConfig(results=20, seed=1))
+    server = uvicorn.Server(uvicorn.Config(upstream, host="127.0.0.1", port=0, http="h11", log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield upstream, f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def test_fake_upstream_serves_the_text_to_meme_shape(fake_upstream):
+    """Test the generator against the fake upstream with a fixed token and no mail.tm sign-up"""
+    upstream, base_url = fake_upstream
+    generator = SuperMemeGenerator(
+        api_url=base_url + TEXT_TO_MEME_PATH,
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid",
+        access_token="fake",
+        allow_private_templates=True
+    )
+    with patch.object(generator.token_generator, "generate_new_token") as sign_up:
+        results, run_id = generator.generate_memes_from_text("deploys on friday")
+    assert sign_up.call_count == 0
+    assert run_id == "3410823" and len(results) == 20
+    assert len({meme["id"] for meme in results}) == 20
+    assert results[0]["captions"][0]["text"] == "deploys on friday"
+    assert results[0]["image_name"].startswith(base_url + "/templates/")
+
+    template = generator.download_image(results[2]["image_name"])
+    assert not template.info.get("placeholder")
+    assert template.size == (results[2]["width"] * 2, results[2]["height"] * 2)
+    # The upstream call and the template download share one kept-alive connection
+    assert upstream.state.counters["connections"] == 1
+
+    generator.http_client.close()
+    generator.download_image(results[3]["image_name"])
+    assert upstream.state.counters["connections"] == 2
+    assert generator.http_client.stats()["requests"] == 3
+
+
+def test_batches_do_not_leak_http_sessions(fake_upstream):
+    """Test that sessions of short-lived batch download threads are closed with their threads"""
+    upstream, base_url = fake_upstream
+    generator = SuperMemeGenerator(
+        api_url=base_url + TEXT_TO_MEME_PATH,
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid",
+        access_token="fake",
+        storage=MemoryStorage(),
+        allow_private_templates=True
+    )
+    results, _ = generator.generate_memes_from_text("fresh templates every batch")
+    sessions = []
+    for meme_data in results[:5]:
+        items = list(BatchRenderer(generator).render([meme_data], output_dir="unused"))
+        assert items[0].error is None
+        sessions.append(generator.http_client.stats()["sessions"])
+    assert sessions == [1] * 5
+    generator.http_client.close()
+
+
+def test_fake_upstream_injects_errors_and_requires_a_token():
+    """Test error injection, the token check, template revalidation and live reconfiguration"""
+    client = TestClient(create_app(FakeUpstreamConfig(error_rate=1.0)))
+    assert client.post(TEXT_TO_MEME_PATH, json={"text": "x"}).status_code == 401
+    assert client.post(TEXT_TO_MEME_PATH, json={"text": "x"}, headers={"token": "t"}).status_code == 500
+
+    client.put("/config", json={"results": 3})
+    response = client.post(TEXT_TO_MEME_PATH, json={"text": "x"}, headers={"token": "t"})
+    assert len(response.json()["response"]["results"]) == 3
+
+    template = client.get("/templates/Success Kid.jpg")
+    assert template.headers["content-type"] == "image/jpeg"
+    revalidated = client.get("/templates/Success Kid.jpg", headers={"If-None-Match": template.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert client.get("/stats").json()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_load_test_reports_throughput_and_latency():
+    """Test the load generator against the in-process API"""
+    generator = create_generator()
+    with patch("app.routers.memes.get_meme_generator", return_value=generator), \
+            patch("app.routers.memes.get_storage", return_value=generator.storage):
+        report = await run_load(
+            "http://test",
+            path="/api/v1/render",
+            concurrency=2,
+            duration=None,
+            requests=6,
+            transport=httpx.ASGITransport(app=app)
+        )
+    assert report["requests"] == 6 and report["statuses"] == {"200": 6}
+    assert report["rps"] > 0 and report["error_rate"] == 0
+    assert report["p50_ms"] <= report["p99_ms"] <= report["max_ms"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
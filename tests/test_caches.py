@@ -0,0 +1,228 @@
+"""
+Unit tests for the template and result caches and output retention
+"""
+import os
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.schemas.meme_schemas import MemeGenerationRequest
+from app.services.result_cache import (
+    MemoryResultCacheBackend,
+    ResultCache,
+    SQLiteResultCacheBackend,
+    request_cache_key
+)
+from app.services.output_janitor import OutputJanitor, touch
+from app.services.template_cache import TemplateCache
+
+
+class FakeResponse:
+    """Minimal stand-in for an HTTP response"""
+
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+def make_image_bytes(size=(40, 30), color="red", fmt="PNG"):
+    """Encode a solid-color image"""
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class FakeTemplateServer:
+    """Records template requests and answers conditional GETs"""
+
+    def __init__(self):
+        self.requests = []
+        self.payloads = {}
+
+    def fetch(self, url, headers):
+        self.requests.append((url, dict(headers)))
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304)
+        return FakeResponse(200, self.payloads[url], {"ETag": '"v1"'})
+
+
+def test_template_cache_hits_memory_then_disk(tmp_path):
+    """Test that repeated templates are served without new downloads"""
+    server = FakeTemplateServer()
+    server.payloads["http://cdn/a.png"] = make_image_bytes()
+    cache = TemplateCache(str(tmp_path), server.fetch)
+
+    first = cache.get_image("http://cdn/a.png")
+    assert cache.get_image("http://cdn/a.png") is first
+    assert first.size == (40, 30)
+
+    # A fresh cache instance finds the persisted copy on disk
+    restarted = TemplateCache(str(tmp_path), server.fetch)
+    assert restarted.get_image("http://cdn/a.png").size == (40, 30)
+
+    assert len(server.requests) == 1
+    assert cache.stats()["memory_hits"] == 1
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_template_cache_revalidates_stale_entries(tmp_path):
+    """Test ETag revalidation once the TTL has expired"""
+    server = FakeTemplateServer()
+    server.payloads["http://cdn/a.png"] = make_image_bytes()
+    cache = TemplateCache(str(tmp_path), server.fetch, ttl_seconds=0)
+
+    cache.get_image("http://cdn/a.png")
+    cache.get_image("http://cdn/a.png")
+
+    assert server.requests[1][1] == {"If-None-Match": '"v1"'}
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["revalidations"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_template_cache_evicts_by_disk_size(tmp_path):
+    """Test that the disk budget evicts least recently used templates"""
+    server = FakeTemplateServer()
+    for name in ("a", "b", "c"):
+        server.payloads[f"http://cdn/{name}.png"] = make_image_bytes(size=(200, 200))
+    payload_size = len(server.payloads["http://cdn/b.png"])
+    cache = TemplateCache(str(tmp_path), server.fetch, max_disk_bytes=payload_size * 2 + 10)
+
+    for name in ("a", "b", "c"):
+        cache.get_image(f"http://cdn/{name}.png")
+
+    assert cache.disk_bytes <= payload_size * 2 + 10
+    assert len(list(tmp_path.glob("*.bin"))) == 2
+
+
+def test_template_cache_downloads_again_when_evicted_mid_load(tmp_path):
+    """Test that a disk entry removed between the existence check and the read counts as a miss"""
+    server = FakeTemplateServer()
+    server.payloads["http://cdn/a.png"] = make_image_bytes()
+    TemplateCache(str(tmp_path), server.fetch).get_image("http://cdn/a.png")
+
+    cache = TemplateCache(str(tmp_path), server.fetch)
+    read_data = cache._read_data
+
+    def evict_then_read(data_path):
+        # Another thread's eviction wins the race for this entry once
+        if os.path.exists(data_path) and len(server.requests) == 1:
+            os.remove(data_path)
+        return read_data(data_path)
+
+    with patch.object(cache, "_read_data", side_effect=evict_then_read):
+        image = cache.get_image("http://cdn/a.png")
+
+    assert image.size == (40, 30)
+    assert len(server.requests) == 2
+    assert cache.stats()["misses"] == 1
+    assert len(list(tmp_path.glob("*.bin"))) == 1
+
+
+def test_request_cache_key_normalizes_prompt():
+    """Test that cache keys ignore case and whitespace but not request parameters"""
+    key = request_cache_key(MemeGenerationRequest(text_prompt="Cats  being dramatic"))
+    assert key == request_cache_key(MemeGenerationRequest(text_prompt=" cats being dramatic"))
+    assert key != request_cache_key(MemeGenerationRequest(text_prompt="cats being dramatic", output_language="fr"))
+    assert key != request_cache_key(MemeGenerationRequest(text_prompt="cats being dramatic"), {"output_format": "png"})
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_result_cache_ttl_and_size_bound(backend, tmp_path):
+    """Test expiry and size-bounded eviction in each result cache backend"""
+    if backend == "memory":
+        store = MemoryResultCacheBackend(max_entries=2)
+    else:
+        store = SQLiteResultCacheBackend(str(tmp_path / "results.sqlite3"), max_entries=2)
+    cache = ResultCache(store, ttl_seconds=60)
+    requests = [MemeGenerationRequest(text_prompt=f"prompt {n}") for n in range(3)]
+
+    for n, request in enumerate(requests):
+        cache.put_upstream(request, [{"id": n}], f"run{n}")
+
+    assert cache.get_upstream(requests[0]) is None
+    assert cache.get_upstream(requests[2]) == ([{"id": 2}], "run2")
+
+    expired = ResultCache(store, ttl_seconds=-1)
+    expired.put_upstream(requests[0], [{"id": 0}], "run0")
+    assert cache.get_upstream(requests[0]) is None
+
+    stats = cache.stats()["upstream"]
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    cache.close()
+
+
+def test_output_janitor_evicts_by_age_then_least_recently_used(tmp_path):
+    """Test retention by age, file count and total bytes, oldest access first"""
+    now = time.time()
+
+    def write(name, size, age):
+        path = tmp_path / name[:2] / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"x" * size)
+        os.utime(path, (now - age, now - age))
+        return path
+
+    expired = write("aa-expired.png", 10, 3 * 86400)
+    old = write("bb-old.png", 10, 3000)
+    used = write("cc-used.png", 10, 2000)
+    new = write("dd-new.png", 10, 1000)
+    newest = write("ee-newest.png", 10, 10)
+    in_progress = write(".tmp-partial", 10, 10)
+    touch(str(used))
+
+    janitor = OutputJanitor(str(tmp_path), max_age_seconds=86400, max_files=4, max_total_bytes=30, batch_size=1)
+    assert janitor.sweep() is True
+    # Shard directories stay, so a concurrent write never loses its directory
+    assert not expired.exists() and expired.parent.exists()
+    janitor.batch_size = 10
+    assert janitor.sweep() is False
+
+    # Age first, then the least recently accessed file until 30 bytes remain
+    assert not old.exists()
+    assert used.exists() and new.exists() and newest.exists() and in_progress.exists()
+    stats = janitor.stats()
+    assert stats["files"] == 3 and stats["bytes"] == 30
+    assert stats["evicted_files"] == 2 and stats["sweeps"] == 2
+
+
+def test_output_janitor_rescans_a_few_directories_per_sweep(tmp_path):
+    """Test that sweeps after the first resume the scan instead of walking the whole tree"""
+    for shard in ("aa", "bb", "cc", "dd"):
+        (tmp_path / shard).mkdir()
+        (tmp_path / shard / f"{shard}.png").write_bytes(b"x" * 10)
+
+    janitor = OutputJanitor(str(tmp_path), max_files=4, scan_directories=2)
+    scanned = []
+    real_scandir = os.scandir
+
+    def scandir(path):
+        scanned.append(path)
+        return real_scandir(path)
+
+    with patch("app.services.output_janitor.os.scandir", side_effect=scandir):
+        janitor.sweep()
+        assert len(scanned) == 5
+        (tmp_path / "aa" / "new.png").write_bytes(b"x" * 10)
+        for _ in range(3):
+            scanned.clear()
+            janitor.sweep()
+            assert len(scanned) <= 2
+
+    # The new file was indexed once its shard came round again, and the oldest file went
+    assert janitor.stats()["files"] == 4
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 4
+    assert sorted(os.listdir(tmp_path)) == ["aa", "bb", "cc", "dd"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
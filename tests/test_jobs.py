@@ -0,0 +1,133 @@
+"""
+Unit tests for the asynchronous job API
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.schemas.job_schemas import JobRecord, JobStatus
+from app.schemas.meme_schemas import MemeGenerationRequest
+from app.services.job_manager import JobManager
+from app.services.job_store import InMemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture
+def client():
+    """Test client fixture"""
+    with TestClient(app) as client:
+        yield client
+
+
+def make_generator(meme_results, run_id="run123"):
+    """Mock generator returning fixed upstream results"""
+    generator = Mock()
+    generator.generate_memes_from_text.return_value = (meme_results, run_id)
+    generator.fetch_base_image.return_value = None
+    generator.find_rendered.return_value = None
+    generator.generate_image_from_meme_data.side_effect = (
+        lambda meme_data, output_dir, base_image=None, **options: f"memes_1/meme_{meme_data['id']}.png"
+    )
+    return generator
+
+
+@patch('app.routers.memes.get_meme_generator')
+def test_job_lifecycle(mock_get_generator, client):
+    """Test submitting a job and awaiting its results"""
+    mock_get_generator.return_value = make_generator(
+        [{"id": str(i), "width": 100, "height": 100, "captions": []} for i in range(3)]
+    )
+
+    response = client.post("/api/v1/jobs", json={"text_prompt": "test meme"})
+    assert response.status_code == 202
+    submitted = response.json()
+    assert submitted["status"] == "queued"
+    assert submitted["status_url"].endswith(f"/api/v1/jobs/{submitted['job_id']}")
+
+    response = client.get(f"/api/v1/jobs/{submitted['job_id']}", params={"wait": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "completed"
+    assert data["total"] == 3 and data["completed"] == 3 and data["failed"] == 0
+    assert data["run_id"] == "run123"
+    assert [meme["id"] for meme in data["memes"]] == ["0", "1", "2"]
+    assert data["meme_list"][0].endswith("/static/memes/memes_1/meme_0.png")
+
+
+@patch('app.routers.memes.get_meme_generator')
+def test_job_failure_and_missing_job(mock_get_generator, client):
+    """Test upstream failures and unknown job ids"""
+    mock_get_generator.return_value = make_generator(None, None)
+
+    job_id = client.post("/api/v1/jobs", json={"text_prompt": "test meme"}).json()["job_id"]
+    data = client.get(f"/api/v1/jobs/{job_id}", params={"wait": 5}).json()
+    assert data["status"] == "failed"
+    assert data["success"] is False
+    assert "temporarily unavailable" in data["error"]
+
+    assert client.get("/api/v1/jobs/does-not-exist").status_code == 404
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_job_store_round_trip_and_ttl(backend, tmp_path):
+    """Test job persistence and TTL-based deletion in each store"""
+    store = InMemoryJobStore() if backend == "memory" else SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    request = MemeGenerationRequest(text_prompt="test")
+    old = JobRecord(
+        id="old", request=request, status=JobStatus.COMPLETED,
+        updated_at=datetime.now() - timedelta(hours=2)
+    )
+    running = JobRecord(
+        id="running", request=request, status=JobStatus.RUNNING,
+        updated_at=datetime.now() - timedelta(hours=2)
+    )
+    store.save(old)
+    store.save(running)
+
+    assert store.get("old").request.text_prompt == "test"
+    assert [job.id for job in store.list_unfinished()] == ["running"]
+    assert store.delete_finished_before(datetime.now() - timedelta(hours=1)) == 1
+    assert store.get("old") is None
+    assert store.get("running") is not None
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_job_updates_are_saved_off_the_event_loop_and_coalesced():
+    """Test that progress writes run on the store thread and queued ones are merged"""
+    class SlowStore(InMemoryJobStore):
+        def __init__(self):
+            super().__init__()
+            self.save_threads = []
+
+        def save(self, job):
+            self.save_threads.append(threading.current_thread().name)
+            time.sleep(0.01)
+            super().save(job)
+
+    async def runner(manager, job):
+        for _ in range(20):
+            manager.update(job, completed=job.completed + 1)
+
+    store = SlowStore()
+    manager = JobManager(store, runner, workers=1)
+    await manager.start()
+    try:
+        job = manager.submit(MemeGenerationRequest(text_prompt="test"))
+        finished = await manager.wait(job.id, timeout=5)
+    finally:
+        await manager.stop()
+
+    assert finished.status == JobStatus.COMPLETED and finished.completed == 20
+    assert set(store.save_threads) == {"meme-job-store_0"}
+    # Submit, running, 20 progress updates and completion would be 23 separate writes
+    assert len(store.save_threads) < 23
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,12 +1,21 @@
 """
 Unit tests for the Meme Generator API
 """
+import asyncio
+import json
+import threading
+import time
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch
 
 from main import app
+from app.routers import memes as memes_routes
 from app.schemas.meme_schemas import MemeGenerationRequest
+from app.core.concurrency import BlockingExecutor, GenerationCapacityError
+from app.services.meme_generator import SuperMemeGenerator
+from app.services.storage import MemoryStorage
 
 
 @pytest.fixture
@@ -79,7 +88,8 @@ def test_generate_meme_success(mock_get_generator, client):
         ],
         "run123"
     )
-    mock_generator.generate_image_from_meme_data.return_value = "generated_memes/test_meme_1.png"
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.return_value = "test_meme_1.png"
     mock_get_generator.return_value = mock_generator
     
     response = client.post("/api/v1/generate-meme", json={
@@ -95,6 +105,305 @@ def test_generate_meme_success(mock_get_generator, client):
     assert len(data["generated_files"]) == 1
 
 
+@patch('app.routers.memes.get_meme_generator')
+def test_generate_meme_preserves_order_and_isolates_errors(mock_get_generator, client):
+    """Test that concurrent rendering keeps input order and skips failed memes"""
+    def render(meme_data, output_dir, base_image=None, **options):
+        # Finish in reverse order to make sure results are not collected as completed
+        time.sleep(0.05 * (3 - int(meme_data["id"])))
+        if meme_data["id"] == "2":
+            raise RuntimeError("render failed")
+        return f"generated_memes/meme_{meme_data['id']}.png"
+
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.return_value = (
+        [{"id": str(i), "width": 100, "height": 100, "captions": []} for i in range(4)],
+        "run123"
+    )
+    mock_generator.fetch_base_image.return_value = None
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.side_effect = render
+    mock_get_generator.return_value = mock_generator
+
+    response = client.post("/api/v1/generate-meme", json={"text_prompt": "test meme"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 3
+    assert [meme["id"] for meme in data["memes"]] == ["0", "1", "3"]
+    assert [f["meme_id"] for f in data["generated_files"]] == ["0", "1", "3"]
+
+
+@pytest.mark.asyncio
+@patch('app.routers.memes.get_meme_generator')
+async def test_generate_meme_does_not_block_event_loop(mock_get_generator):
+    """Test that health checks are served while a generation is blocked upstream"""
+    def slow_upstream(**kwargs):
+        time.sleep(0.5)
+        return None, None
+
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.side_effect = slow_upstream
+    mock_get_generator.return_value = mock_generator
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        generation = asyncio.create_task(
+            client.post("/api/v1/generate-meme", json={"text_prompt": "test meme"})
+        )
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        health = await client.get("/health")
+        assert health.status_code == 200
+        assert time.monotonic() - started < 0.25
+        assert not generation.done()
+        assert (await generation).status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_blocking_executor_limits_concurrent_generations():
+    """Test that generation slots are bounded and time out when exhausted"""
+    executor = BlockingExecutor(max_workers=2, max_concurrent_generations=1, slot_timeout=0.05)
+    try:
+        async with executor.generation_slot():
+            assert executor.active_generations == 1
+            with pytest.raises(GenerationCapacityError):
+                async with executor.generation_slot():
+                    pass
+        assert executor.active_generations == 0
+        assert await executor.run(sum, [1, 2, 3]) == 6
+    finally:
+        executor.shutdown()
+
+
+@patch('app.routers.memes.get_meme_generator')
+def test_generate_meme_output_format(mock_get_generator, client):
+    """Test that the chosen output format is passed to the renderer and reported"""
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.return_value = (
+        [{"id": "1", "width": 100, "height": 100, "captions": []}],
+        "run123"
+    )
+    mock_generator.fetch_base_image.return_value = None
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.return_value = "memes_1/meme_1.webp"
+    mock_get_generator.return_value = mock_generator
+
+    response = client.post("/api/v1/generate-meme", json={
+        "text_prompt": "test meme",
+        "output_format": "webp",
+        "output_quality": 70
+    })
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["generated_files"][0]["format"] == "webp"
+    assert data["meme_list"][0].endswith("/static/memes/memes_1/meme_1.webp")
+    _, kwargs = mock_generator.generate_image_from_meme_data.call_args
+    assert kwargs["output_format"] == "webp"
+    assert kwargs["quality"] == 70
+
+    response = client.post("/api/v1/generate-meme", json={"text_prompt": "test meme", "output_format": "gif"})
+    assert response.status_code == 422
+
+
+@patch('app.routers.memes.get_meme_generator')
+def test_generate_meme_stream_emits_memes_as_completed(mock_get_generator, client):
+    """Test NDJSON streaming of memes in completion order followed by a summary"""
+    def render(meme_data, output_dir, base_image=None, **options):
+        time.sleep(0.05 * (3 - int(meme_data["id"])))
+        if meme_data["id"] == "1":
+            raise RuntimeError("render failed")
+        return f"memes_1/meme_{meme_data['id']}.png"
+
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.return_value = (
+        [{"id": str(i), "width": 100, "height": 100, "captions": []} for i in range(3)],
+        "run123"
+    )
+    mock_generator.fetch_base_image.return_value = None
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.side_effect = render
+    mock_get_generator.return_value = mock_generator
+
+    response = client.post("/api/v1/generate-meme/stream", json={"text_prompt": "test meme"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["started", "meme", "meme_error", "meme", "summary"]
+    assert [event["index"] for event in events[1:4]] == [3, 2, 1]
+    assert events[1]["meme"]["id"] == "2"
+    assert events[1]["image_url"].endswith("/static/memes/memes_1/meme_2.png")
+    assert events[-1]["count"] == 2
+    assert [url.rsplit("/", 1)[1] for url in events[-1]["meme_list"]] == ["meme_0.png", "meme_2.png"]
+
+
+@patch('app.routers.memes.get_meme_generator')
+def test_generate_meme_stream_server_sent_events(mock_get_generator, client):
+    """Test SSE framing and upstream failures on the streaming endpoint"""
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.return_value = (None, None)
+    mock_get_generator.return_value = mock_generator
+
+    response = client.post(
+        "/api/v1/generate-meme/stream",
+        json={"text_prompt": "test meme"},
+        headers={"Accept": "text/event-stream"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("event: error\ndata: ")
+    assert json.loads(response.text.split("data: ", 1)[1])["status_code"] == 503
+
+
+@patch('app.routers.memes.get_storage')
+@patch('app.routers.memes.get_meme_generator')
+def test_generate_meme_result_cache(mock_get_generator, mock_get_storage, client):
+    """Test that repeated prompts are served from the result cache unless opted out"""
+    storage = MemoryStorage()
+    mock_get_storage.return_value = storage
+
+    def render(meme_data, output_dir, base_image=None, **options):
+        key = f"memes/meme_{meme_data['id']}.{options['output_format']}"
+        storage.put(key, b"png")
+        return key
+
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.return_value = (
+        [{"id": "1", "width": 100, "height": 100, "captions": []}],
+        "run123"
+    )
+    mock_generator.fetch_base_image.return_value = None
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.side_effect = render
+    mock_get_generator.return_value = mock_generator
+
+    first = client.post("/api/v1/generate-meme", json={"text_prompt": "Cats being  dramatic"})
+    second = client.post("/api/v1/generate-meme", json={"text_prompt": "cats being dramatic "})
+
+    assert first.json()["cached"] is False
+    assert second.json()["cached"] is True
+    assert second.json()["meme_list"] == first.json()["meme_list"]
+    assert second.json()["run_id"] == "run123"
+    assert mock_generator.generate_memes_from_text.call_count == 1
+    assert mock_generator.generate_image_from_meme_data.call_count == 1
+
+    # A different output format reuses the upstream results but renders again
+    client.post("/api/v1/generate-meme", json={"text_prompt": "cats being dramatic", "output_format": "jpeg"})
+    assert mock_generator.generate_memes_from_text.call_count == 1
+    assert mock_generator.generate_image_from_meme_data.call_count == 2
+
+    third = client.post("/api/v1/generate-meme", json={"text_prompt": "cats being dramatic", "use_cache": False})
+    assert third.json()["cached"] is False
+    assert mock_generator.generate_memes_from_text.call_count == 2
+
+    # Cached sets whose files are gone from storage are rendered again
+    storage.delete("memes/meme_1.png")
+    fourth = client.post("/api/v1/generate-meme", json={"text_prompt": "cats being dramatic"})
+    assert fourth.json()["cached"] is False
+    assert mock_generator.generate_image_from_meme_data.call_count == 4
+
+
+@patch('app.routers.memes.get_meme_generator')
+def test_generate_meme_accepts_upstream_memes_outside_render_bounds(mock_get_generator, client):
+    """Test that the bounds on caller-supplied meme data do not reject upstream results"""
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.return_value = (
+        [{"id": "1", "width": 5000, "height": 100, "captions": [
+            {"x": 0, "y": 0, "width": 100, "text": "tiny", "fontSize": 0}
+        ]}],
+        "run123"
+    )
+    mock_generator.fetch_base_image.return_value = None
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.return_value = "ab/wide.png"
+    mock_get_generator.return_value = mock_generator
+
+    response = client.post("/api/v1/generate-meme", json={"text_prompt": "very wide meme", "use_cache": False})
+    assert response.status_code == 200
+    assert response.json()["memes"][0]["width"] == 5000
+
+
+@patch('app.routers.memes.get_storage')
+@patch('app.routers.memes.get_meme_generator')
+def test_generate_meme_does_not_cache_incomplete_sets(mock_get_generator, mock_get_storage, client):
+    """Test that sets with failed memes or placeholder renders are rendered again next time"""
+    storage = MemoryStorage()
+    mock_get_storage.return_value = storage
+    outcomes = {}
+
+    def render(meme_data, output_dir, base_image=None, **options):
+        outcome = outcomes[meme_data["id"]]
+        if isinstance(outcome, Exception):
+            raise outcome
+        storage.put(outcome, b"png")
+        return outcome
+
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.return_value = (
+        [{"id": str(i), "width": 100, "height": 100, "captions": []} for i in (1, 2)],
+        "run123"
+    )
+    mock_generator.fetch_base_image.return_value = None
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.side_effect = render
+    mock_get_generator.return_value = mock_generator
+
+    for prompt, second in (
+        ("failed render", RuntimeError("render failed")),
+        ("template outage", "ab/second.placeholder.png")
+    ):
+        outcomes.update({"1": "ab/first.png", "2": second})
+        assert client.post("/api/v1/generate-meme", json={"text_prompt": prompt}).json()["cached"] is False
+        outcomes["2"] = "ab/second.png"
+        retried = client.post("/api/v1/generate-meme", json={"text_prompt": prompt}).json()
+        assert retried["cached"] is False and len(retried["meme_list"]) == 2
+        # The complete set is cached
+        assert client.post("/api/v1/generate-meme", json={"text_prompt": prompt}).json()["cached"] is True
+
+
+@pytest.mark.asyncio
+@patch('app.routers.memes.get_meme_generator')
+async def test_generate_meme_coalesces_identical_requests(mock_get_generator):
+    """Test that concurrent identical prompts share one upstream call and render"""
+    def slow_upstream(**kwargs):
+        time.sleep(0.3)
+        return [{"id": "1", "width": 100, "height": 100, "captions": []}], "run123"
+
+    def render(meme_data, output_dir, base_image=None, **options):
+        return f"memes/meme_{meme_data['id']}.png"
+
+    mock_generator = Mock()
+    mock_generator.generate_memes_from_text.side_effect = slow_upstream
+    mock_generator.fetch_base_image.return_value = None
+    mock_generator.find_rendered.return_value = None
+    mock_generator.generate_image_from_meme_data.side_effect = render
+    mock_get_generator.return_value = mock_generator
+
+    single_flight = memes_routes.get_single_flight()
+    coalesced_before = single_flight.coalesced
+    request = {"text_prompt": "Burst  prompt", "use_cache": False, "include_timings": True}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*[
+            client.post("/api/v1/generate-meme", json=dict(request, text_prompt=prompt))
+            for prompt in ("Burst  prompt", "burst prompt", "BURST PROMPT ")
+        ])
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert {response.json()["meme_list"][0] for response in responses} == {
+        responses[0].json()["meme_list"][0]
+    }
+    assert mock_generator.generate_memes_from_text.call_count == 1
+    assert mock_generator.generate_image_from_meme_data.call_count == 1
+    # Requests that joined the generation report the stages it ran
+    timings = [response.json()["timings"] for response in responses]
+    assert timings[0] and timings[1] == timings[0] and timings[2] == timings[0]
+    assert single_flight.coalesced - coalesced_before == 2
+    assert single_flight.in_flight == 0
+    assert single_flight.waiting == 0
+
+
 @patch('app.routers.memes.get_meme_generator')
 def test_generate_meme_failure(mock_get_generator, client):
     """Test meme generation failure"""
@@ -115,7 +424,7 @@ def test_clear_token(client):
     """Test token clearing endpoint"""
     with patch('app.routers.memes.get_meme_generator') as mock_get_generator:
         mock_generator = Mock()
-        mock_generator.token_manager.clear_token.return_value = True
+        mock_generator.clear_token.return_value = True
         mock_get_generator.return_value = mock_generator
         
         response = client.post("/api/v1/clear-token")
@@ -125,6 +434,47 @@ def test_clear_token(client):
         assert data["success"] is True
 
 
+def test_concurrent_generations_refresh_the_token_once():
+    """Test that generations rejected with the same expired token sign up only once"""
+    generator = SuperMemeGenerator(
+        api_url="http://upstream.invalid",
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid"
+    )
+    generator.current_token = "expired"
+    all_rejected = threading.Barrier(4)
+
+    def post(url, headers, **kwargs):
+        if headers["token"] == "expired":
+            all_rejected.wait(timeout=5)
+            return Mock(status_code=401)
+        assert headers["token"] == "fresh"
+        return Mock(status_code=200, json=Mock(return_value={"response": {"results": [{}], "runId": "1"}}))
+
+    def sign_up(mail_api_url):
+        time.sleep(0.05)
+        return "fresh"
+
+    results = []
+    with patch.object(generator.http_client, "post", side_effect=post), \
+            patch.object(generator.token_generator, "generate_new_token", side_effect=sign_up) as generate, \
+            patch.object(generator, "token_manager") as token_manager:
+        token_manager.load_token.return_value = None
+        threads = [
+            threading.Thread(target=lambda: results.append(generator.generate_memes_from_text("hi")))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+    assert generate.call_count == 1
+    assert results == [([{}], "1")] * 4
+    assert generator.current_token == "fresh"
+
+
 def test_pydantic_models():
     """Test Pydantic model validation"""
     # Test valid request
@@ -0,0 +1,121 @@
+"""
+Unit tests for stage timings and the Prometheus metrics endpoint
+"""
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.core.config import settings
+from app.services.meme_generator import SuperMemeGenerator
+from app.services.render_pipeline import RenderPipeline
+from app.services.storage import MemoryStorage
+from app.utils.metrics import Histogram, collect_timings, timed
+
+
+def meme(meme_id, text="hello"):
+    """Build a small meme payload"""
+    return {
+        "id": meme_id, "width": 120, "height": 90,
+        "image_name": "https://cdn.example.com/template.jpg",
+        "captions": [{"x": 0, "y": 0, "width": 120, "text": text, "fontSize": 14}]
+    }
+
+
+@pytest.fixture
+def generator():
+    """Real renderer backed by memory storage, with template downloads stubbed out"""
+    generator = SuperMemeGenerator(
+        api_url="http://upstream.invalid",
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid",
+        storage=MemoryStorage()
+    )
+    with patch.object(generator, "download_image", return_value=Image.new("RGB", (240, 180), "blue")):
+        yield generator
+
+
+@pytest.fixture
+def client(generator):
+    """Test client whose routes render with the fixture generator"""
+    with TestClient(app) as client, \
+            patch.object(settings, "template_allowed_hosts", ["cdn.example.com"]), \
+            patch("app.routers.memes.get_meme_generator", return_value=generator), \
+            patch("app.routers.memes.meme_generator", generator), \
+            patch("app.routers.memes.get_storage", return_value=generator.storage):
+        yield client
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test the exposition of buckets, sum and count per label value"""
+    histogram = Histogram("test_seconds", "Test durations", label="stage", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.1, 2.0):
+        histogram.observe("encode", value)
+
+    lines = histogram.render()
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{stage="encode",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="encode",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="encode",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{stage="encode"} 2.65' in lines
+    assert 'test_seconds_count{stage="encode"} 4' in lines
+    assert histogram.snapshot() == {"encode": {"count": 4, "sum": pytest.approx(2.65)}}
+
+
+def test_collect_timings_follows_work_into_the_render_pipeline(generator):
+    """Test that stages timed on pipeline threads are attributed to the scheduling context"""
+    pipeline = RenderPipeline(download_workers=1, render_workers=1)
+    try:
+        with collect_timings() as timings:
+            with timed("outer"):
+                pipeline.submit(generator, meme("1"), "unused").result(timeout=10)
+        # Outside the block nothing is collected any more
+        pipeline.submit(generator, meme("2", text="world"), "unused").result(timeout=10)
+    finally:
+        pipeline.shutdown()
+
+    stages = timings.as_dict()
+    assert {"outer", "resize", "layout", "stroke", "encode", "store"} <= set(stages)
+    assert stages["encode"]["count"] == 1
+    assert stages["stroke"]["max_seconds"] <= stages["stroke"]["total_seconds"]
+
+
+def test_responses_include_timings_on_request(client, generator):
+    """Test the optional timing breakdown of the render and generate endpoints"""
+    plain = client.post("/api/v1/render", json={"memes": [meme("1")]})
+    timed_render = client.post("/api/v1/render", json={"memes": [meme("2", text="timed")], "include_timings": True})
+    assert plain.json()["timings"] is None
+    stages = timed_render.json()["timings"]
+    assert {"slot_wait", "resize", "encode", "store"} <= set(stages)
+    assert stages["encode"]["count"] == 1
+    assert set(stages["encode"]) == {"count", "total_seconds", "max_seconds"}
+
+    with patch.object(generator, "generate_memes_from_text", return_value=([meme("3", text="generated")], "run-1")):
+        response = client.post(
+            "/api/v1/generate-meme",
+            json={"text_prompt": "timings", "use_cache": False, "include_timings": True}
+        )
+    assert response.status_code == 200
+    # The coalesced generation runs as its own task but reports to the request that started it
+    assert {"slot_wait", "encode", "store"} <= set(response.json()["timings"])
+
+
+def test_metrics_endpoint_exposes_stages_caches_and_gauges(client):
+    """Test the Prometheus exposition after serving a render"""
+    assert client.post("/api/v1/render", json={"memes": [meme("1", text="scraped")]}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE meme_stage_duration_seconds histogram" in lines
+    assert any(line.startswith('meme_stage_duration_seconds_count{stage="encode"}') for line in lines)
+    assert any(line.startswith('meme_cache_hits_total{cache="fonts"}') for line in lines)
+    assert "meme_renders_in_flight 0" in lines
+    assert "meme_generations_active 0" in lines
+
+    with patch.object(settings, "metrics_enabled", False):
+        assert client.get("/metrics").status_code == 404
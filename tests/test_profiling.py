@@ -0,0 +1,130 @@
+"""
+Unit tests for the request sampling profiler
+"""
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.core.config import settings
+from app.routers import memes as memes_routes
+from app.services.meme_generator import SuperMemeGenerator
+from app.services.render_pipeline import RenderPipeline
+from app.services.request_profiler import RequestProfiler
+from app.services.storage import MemoryStorage
+
+
+def meme(meme_id, text="hello"):
+    """Build a small meme payload"""
+    return {
+        "id": meme_id, "width": 120, "height": 90,
+        "image_name": "https://cdn.example.com/template.jpg",
+        "captions": [{"x": 0, "y": 0, "width": 120, "text": text, "fontSize": 14}]
+    }
+
+
+@pytest.fixture
+def generator():
+    """Real renderer whose template download is slow enough to be sampled"""
+    generator = SuperMemeGenerator(
+        api_url="http://upstream.invalid",
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid",
+        storage=MemoryStorage()
+    )
+
+    def slow_template_download(url, draft_size=None):
+        time.sleep(0.05)
+        return Image.new("RGB", (240, 180), "blue")
+
+    with patch.object(generator, "download_image", side_effect=slow_template_download):
+        yield generator
+
+
+def wait_for_profiles(profiler, count, timeout=5):
+    """Profiles are written by the sampler thread after the request returns"""
+    deadline = time.monotonic() + timeout
+    while len(profiler.list_profiles()) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return profiler.list_profiles()
+
+
+def test_profiler_samples_only_the_request_worker_threads(generator, tmp_path):
+    """Test that a forced profile records the work done on render pipeline threads"""
+    profiler = RequestProfiler(str(tmp_path), interval_seconds=0.001)
+    pipeline = RenderPipeline(download_workers=1, render_workers=1)
+    try:
+        with profiler.profile("unit", forced=True) as sampler:
+            pipeline.submit(generator, meme("1"), "unused").result(timeout=10)
+        assert sampler is not None
+        profiles = wait_for_profiles(profiler, 1)
+    finally:
+        pipeline.shutdown()
+
+    assert len(profiles) == 1 and "-unit-" in profiles[0]["name"]
+    with open(profiler.path(profiles[0]["name"]), encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("slow_template_download" in line for line in lines)
+
+
+def test_profiler_keeps_only_slow_sampled_requests_within_the_file_limit(tmp_path):
+    """Test the sample rate, the slow threshold and the directory bound"""
+    never = RequestProfiler(str(tmp_path), sample_rate=0.0)
+    with never.profile("skipped") as sampler:
+        assert sampler is None
+
+    always = RequestProfiler(str(tmp_path), sample_rate=1.0, slow_threshold_seconds=10, max_files=2)
+    with always.profile("fast") as sampler:
+        assert sampler is not None
+    sampler.join(timeout=5)
+    assert always.list_profiles() == []
+
+    for i in range(3):
+        with always.profile(f"forced{i}", forced=True) as sampler:
+            # Sample the test thread itself so the profile is not empty
+            sampler.add_thread(threading.get_ident())
+            time.sleep(0.03)
+        sampler.join(timeout=5)
+    names = [profile["name"] for profile in always.list_profiles()]
+    assert len(names) == 2 and "-forced2-" in names[0]
+    assert always.path("../secrets.collapsed") is None
+    assert always.stats()["sampled"] == 4
+
+
+def test_profile_header_and_debug_routes(generator, tmp_path):
+    """Test profiling a generate-meme request on demand and fetching the profile"""
+    with patch.multiple(settings, profiling_enabled=True, profile_directory=str(tmp_path), debug=True), \
+            patch("app.routers.memes.request_profiler", None), \
+            patch("app.routers.memes.get_meme_generator", return_value=generator), \
+            patch("app.routers.memes.get_storage", return_value=generator.storage), \
+            patch.object(
+                generator, "generate_memes_from_text",
+                side_effect=lambda text_prompt, **_: ([meme("1", text=text_prompt)], "run-1")
+            ), \
+            TestClient(app) as client:
+        unprofiled = client.post("/api/v1/generate-meme", json={"text_prompt": "plain", "use_cache": False})
+        profiled = client.post(
+            "/api/v1/generate-meme",
+            json={"text_prompt": "profiled", "use_cache": False},
+            headers={settings.profile_header: "1"}
+        )
+        assert unprofiled.status_code == 200 and profiled.status_code == 200
+        profiles = wait_for_profiles(memes_routes.request_profiler, 1)
+        assert len(profiles) == 1 and "-generate-meme-" in profiles[0]["name"]
+
+        listing = client.get("/debug/profiles").json()
+        assert listing["profiles"][0]["name"] == profiles[0]["name"]
+        download = client.get(f"/debug/profiles/{profiles[0]['name']}")
+        assert download.status_code == 200 and download.text.strip()
+        assert client.get("/debug/profiles/missing.collapsed").status_code == 404
+
+        with patch.object(settings, "debug", False):
+            assert client.get("/debug/profiles").status_code == 404
+    assert os.listdir(tmp_path) == [profiles[0]["name"]]
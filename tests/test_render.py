@@ -0,0 +1,241 @@
+"""
+Unit tests for the direct rendering endpoint
+"""
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.core.config import settings
+from app.services.batch_renderer import BatchRenderer
+from app.services.meme_generator import SuperMemeGenerator
+from app.services.storage import MemoryStorage
+
+
+def meme(meme_id, text="hello", image_name="https://cdn.example.com/template.jpg"):
+    """Build a small meme payload"""
+    return {
+        "id": meme_id, "width": 120, "height": 90,
+        "image_name": image_name,
+        "captions": [{"x": 0, "y": 0, "width": 120, "text": text, "fontSize": 14}]
+    }
+
+
+def create_generator():
+    """Real renderer backed by memory storage"""
+    return SuperMemeGenerator(
+        api_url="http://upstream.invalid",
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid",
+        storage=MemoryStorage()
+    )
+
+
+@pytest.fixture
+def generator():
+    """Renderer with template downloads stubbed out"""
+    generator = create_generator()
+    with patch.object(generator, "download_image", return_value=Image.new("RGB", (240, 180), "blue")):
+        yield generator
+
+
+@pytest.fixture
+def client(generator):
+    """Test client whose routes render with the fixture generator"""
+    with TestClient(app) as client, \
+            patch.object(settings, "template_allowed_hosts", ["cdn.example.com"]), \
+            patch("app.routers.memes.get_meme_generator", return_value=generator), \
+            patch("app.routers.memes.get_storage", return_value=generator.storage):
+        yield client
+
+
+def test_render_accepts_single_list_and_wrapped_bodies(client, generator):
+    """Test each body shape and that nothing is requested from the upstream API"""
+    with patch.object(generator, "generate_memes_from_text") as upstream:
+        single = client.post("/api/v1/render", json=meme("1"))
+        bare_list = client.post("/api/v1/render", json=[meme("1"), meme("2", text="world")])
+        wrapped = client.post("/api/v1/render", json={"memes": [meme("3")], "output_format": "webp"})
+
+    assert upstream.call_count == 0
+    assert single.status_code == 200 and single.json()["count"] == 1
+    assert [f["meme_id"] for f in bare_list.json()["generated_files"]] == ["1", "2"]
+    # Identical inputs map to the same content-addressed file
+    assert bare_list.json()["meme_list"][0] == single.json()["meme_list"][0]
+    assert wrapped.json()["generated_files"][0]["format"] == "webp"
+    assert len(generator.storage) == 3
+
+    image = client.get(single.json()["meme_list"][0].replace("http://testserver", ""))
+    assert image.status_code == 200 and image.headers["content-type"] == "image/png"
+
+
+def test_render_isolates_failed_memes(client, generator):
+    """Test that one failing meme is reported without failing the others"""
+    original = generator.generate_image_from_meme_data
+
+    def render(meme_data, *args, **kwargs):
+        if meme_data["id"] == "2":
+            raise RuntimeError("render failed")
+        return original(meme_data, *args, **kwargs)
+
+    with patch.object(generator, "generate_image_from_meme_data", side_effect=render):
+        # Distinct captions, so meme 2 cannot reuse meme 1's content-addressed render
+        response = client.post("/api/v1/render", json=[meme(i, text=f"caption {i}") for i in ("1", "2", "3")])
+        assert response.status_code == 200
+        data = response.json()
+        assert [m["id"] for m in data["memes"]] == ["1", "3"]
+        assert data["errors"] == [{"index": 2, "meme_id": "2", "detail": "render failed"}]
+
+        failed = client.post("/api/v1/render", json=meme("2", text="never rendered"))
+        assert failed.status_code == 500
+
+
+def test_render_rejects_oversized_and_disallowed_requests(client):
+    """Test request limits and the template host allow-list"""
+    with patch.object(settings, "render_max_memes", 2):
+        response = client.post("/api/v1/render", json=[meme("1"), meme("2"), meme("3")])
+        assert response.status_code == 400
+
+    with patch.object(settings, "template_allowed_hosts", ["example.com"]):
+        assert client.post("/api/v1/render", json=meme("1")).status_code == 200
+        response = client.post("/api/v1/render", json=meme("2", image_name="http://169.254.169.254/latest"))
+        assert response.status_code == 400
+
+    # Allowed hosts must still not point into the server's own network
+    with patch.object(settings, "template_allowed_hosts", ["localhost", "169.254.169.254"]):
+        for url in ("http://localhost:8080/admin.png", "http://169.254.169.254/latest"):
+            assert client.post("/api/v1/render", json=meme("3", image_name=url)).status_code == 400
+        with patch.object(settings, "template_allow_private_hosts", True):
+            assert client.post("/api/v1/render", json=meme("3", image_name="http://localhost/t.png")).status_code == 200
+
+    for field, value in (("width", 0), ("width", -5), ("height", 100000)):
+        assert client.post("/api/v1/render", json={**meme("4"), field: value}).status_code == 422
+    zero_font = meme("4")
+    zero_font["captions"][0]["fontSize"] = 0
+    assert client.post("/api/v1/render", json=zero_font).status_code == 422
+
+    assert client.post("/api/v1/render", json=[]).status_code == 422
+    assert client.post("/api/v1/render", json={"memes": [meme("1")], "output_format": "bmp"}).status_code == 422
+
+
+@pytest.fixture
+def template_hosts():
+    """An "internal" server with a template, and a template host redirecting to it"""
+    buffer = BytesIO()
+    Image.new("RGB", (60, 40), "red").save(buffer, "PNG")
+    internal_hits = []
+
+    class Internal(BaseHTTPRequestHandler):
+        def do_GET(self):
+            internal_hits.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(buffer.getvalue())))
+            self.end_headers()
+            self.wfile.write(buffer.getvalue())
+
+        def log_message(self, *args):
+            pass
+
+    internal = ThreadingHTTPServer(("127.0.0.1", 0), Internal)
+
+    class Redirecting(Internal):
+        def do_GET(self):
+            self.send_response(302)
+            self.send_header("Location", f"http://127.0.0.1:{internal.server_port}/latest/meta-data")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    redirecting = ThreadingHTTPServer(("127.0.0.1", 0), Redirecting)
+    servers = [internal, redirecting]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield internal.server_port, redirecting.server_port, internal_hits
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_template_fetches_refuse_redirects_and_pin_the_checked_address(template_hosts):
+    """Test that a template host cannot redirect or re-resolve the renderer into an internal address"""
+    internal_port, redirecting_port, internal_hits = template_hosts
+    generator = create_generator()
+    generator.allow_private_templates = True
+
+    redirected = generator.download_image(f"http://127.0.0.1:{redirecting_port}/template.png")
+    assert redirected.info.get("placeholder") and internal_hits == []
+
+    # The fetch connects to the address it resolved and checked, not to a second lookup
+    def resolve(host, *args, **kwargs):
+        assert host == "templates.test"
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 0))]
+
+    url = f"http://templates.test:{internal_port}/template.png"
+    with patch("app.services.http_client.socket.getaddrinfo", side_effect=resolve):
+        assert generator.download_image(url).size == (60, 40)
+        assert internal_hits == ["/template.png"]
+        generator.allow_private_templates = False
+        assert generator.download_image(url).info.get("placeholder")
+    assert internal_hits == ["/template.png"]
+    generator.http_client.close()
+
+
+def test_batch_renderer_shares_one_base_per_template_group(generator):
+    """Test grouping by template within each window and output identical to single renders"""
+    templates = ["https://cdn.example.com/a.jpg", "https://cdn.example.com/b.jpg"]
+    memes = [meme(str(i), text=f"caption {i}", image_name=templates[i % 2]) for i in range(6)]
+    for earlier in (memes[0], memes[2]):
+        generator.generate_image_from_meme_data(earlier, output_format="webp")
+    generator.download_image.reset_mock()
+
+    renderer = BatchRenderer(generator, render_workers=2, window_size=3)
+    items = sorted(renderer.render(iter(memes), output_format="webp"))
+
+    assert [item.index for item in items] == [1, 2, 3, 4, 5, 6]
+    assert all(item.error is None for item in items)
+    # Window one only needs template b, since its template a memes were rendered before
+    assert generator.download_image.call_count == 3
+    assert len(generator.storage) == 6
+
+    single = create_generator()
+    with patch.object(single, "download_image", return_value=Image.new("RGB", (240, 180), "blue")):
+        key = single.generate_image_from_meme_data(memes[3], output_format="webp")
+    assert key == items[3].key
+    assert single.storage.get(key) == generator.storage.get(key)
+
+
+def test_render_batch_endpoint_streams_results(client, generator):
+    """Test NDJSON events for a batch, per-meme errors and the batch size limit"""
+    body = {"memes": [meme(str(i), text=f"batch {i}") for i in range(4)], "output_format": "webp"}
+    original = generator.generate_image_from_meme_data
+
+    def render(meme_data, *args, **kwargs):
+        if meme_data["id"] == "2":
+            raise RuntimeError("render failed")
+        return original(meme_data, *args, **kwargs)
+
+    with patch.object(generator, "generate_image_from_meme_data", side_effect=render):
+        response = client.post("/api/v1/render/batch", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert events[0] == {"event": "started", "total": 4}
+    assert sorted(e["index"] for e in events if e["event"] == "meme") == [1, 2, 4]
+    assert [e["meme_id"] for e in events if e["event"] == "meme_error"] == ["2"]
+    assert events[-1]["event"] == "summary"
+    assert events[-1]["count"] == 3 and events[-1]["errors"] == 1
+
+    with patch.object(settings, "render_batch_max_memes", 2):
+        assert client.post("/api/v1/render/batch", json=body).status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,257 @@
+"""
+Unit tests for the image rendering services
+"""
+import os
+import stat
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from app.services.font_registry import FontRegistry
+from app.services.image_encoder import ImageEncoder, UnsupportedFormatError
+from app.services.meme_generator import SuperMemeGenerator
+from app.services.template_cache import decode_image, image_nbytes
+from app.services.text_layout import TextLayoutEngine
+from app.utils.lru import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test LRU eviction by entry count and by size"""
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    sized = LRUCache(max_bytes=10, sizeof=len)
+    sized.put("x", b"12345")
+    sized.put("y", b"12345")
+    sized.put("z", b"123")
+    assert "x" not in sized
+    assert sized.current_bytes == 8
+    sized.put("huge", b"x" * 20)
+    assert "huge" not in sized and len(sized) == 2
+
+
+def test_font_registry_caches_fonts_by_size():
+    """Test that fonts are parsed once per size and counted"""
+    registry = FontRegistry(cache_size=2)
+    font = registry.get_font(18)
+    assert registry.get_font(18) is font
+    registry.get_font(20)
+    registry.get_font(22)
+
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+
+
+def test_font_registry_resolves_missing_fonts_to_default():
+    """Test fallback to the Pillow default font when no candidate exists"""
+    registry = FontRegistry(font_paths=["/nonexistent/font.ttf"])
+    assert registry.font_path is None
+    assert registry.get_font(18) is not None
+
+
+@pytest.fixture
+def generator():
+    """Meme generator fixture that never talks to the upstream API"""
+    return SuperMemeGenerator(
+        api_url="http://upstream.invalid",
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid"
+    )
+
+
+def draw_text_with_offset_stroke(draw, position, text, font, fill_color, stroke_color, stroke_width):
+    """Reference stroke implementation that redraws the text at every offset"""
+    x, y = position
+    for dx in range(-stroke_width, stroke_width + 1):
+        for dy in range(-stroke_width, stroke_width + 1):
+            if dx != 0 or dy != 0:
+                draw.text((x + dx, y + dy), text, font=font, fill=stroke_color)
+    draw.text((x, y), text, font=font, fill=fill_color)
+
+
+@pytest.mark.parametrize("stroke_width", [1, 2, 3])
+def test_draw_text_with_stroke_matches_offset_stroke(generator, stroke_width):
+    """Test single-pass stroke rendering against the per-offset reference"""
+    font = generator.get_font(20)
+    text = "When the build finally passes gjy"
+
+    expected = Image.new('RGB', (420, 60), 'gray')
+    draw_text_with_offset_stroke(
+        ImageDraw.Draw(expected), (12, 14), text, font, "white", "black", stroke_width
+    )
+    actual = Image.new('RGB', (420, 60), 'gray')
+    generator.draw_text_with_stroke(
+        ImageDraw.Draw(actual), (12, 14), text, font, "white", "black", stroke_width
+    )
+
+    diff = ImageChops.difference(expected.convert('L'), actual.convert('L'))
+    histogram = diff.histogram()
+    mean_diff = sum(value * count for value, count in enumerate(histogram)) / (420 * 60)
+    changed = sum(histogram[96:])
+    # Only anti-aliased edge pixels may differ, and only slightly
+    assert mean_diff < 1.0
+    assert changed == 0
+
+
+def test_text_layout_wraps_within_width():
+    """Test greedy wrapping, measured widths and oversized words"""
+    engine = TextLayoutEngine()
+    font = FontRegistry().get_font(18)
+    text = "when you finally fix the bug and another supercalifragilisticexpialidocious one appears"
+
+    layout = engine.layout(text, font, 120)
+
+    assert " ".join(layout.lines) == text
+    for line, width in zip(layout.lines, layout.line_widths):
+        assert abs(width - font.getlength(line)) <= 2
+        assert width <= 120 or " " not in line
+    assert "supercalifragilisticexpialidocious" in layout.lines
+    assert layout.line_height == font.getbbox("A")[3] - font.getbbox("A")[1] + 5
+
+
+def test_text_layout_memoizes_words_and_layouts():
+    """Test that words are measured once and layouts are reused"""
+    engine = TextLayoutEngine()
+    font = FontRegistry().get_font(18)
+
+    first = engine.layout("meme meme meme meme", font, 80)
+    assert engine.layout("meme meme meme meme", font, 80) is first
+    engine.layout("meme meme", font, 200)
+
+    stats = engine.stats()
+    assert stats["layouts"]["hits"] == 1
+    # One measurement for the space and one for the repeated word
+    assert stats["advances"]["misses"] == 2
+
+
+def test_text_layout_skips_caching_fonts_without_a_stable_identity():
+    """Test that in-memory fonts are never cached, since their id() may be reused"""
+    engine = TextLayoutEngine()
+    registry = FontRegistry()
+    assert engine.font_key(registry.get_font(18)) != engine.font_key(registry.get_font(24))
+
+    in_memory = ImageFont.load_default()
+    assert engine.font_key(in_memory) is None
+    layout = engine.layout("meme meme", in_memory, 200)
+    assert layout.lines == ["meme meme"]
+    assert engine.layout("meme meme", in_memory, 200) is not layout
+    stats = engine.stats()
+    assert stats["layouts"]["entries"] == 0 and stats["advances"]["entries"] == 0
+
+
+def test_resized_templates_are_reused(generator, tmp_path):
+    """Test that a template resized once is copied for later renders"""
+    generator.resized_template_cache = LRUCache(max_bytes=10 * 1024 * 1024, sizeof=image_nbytes)
+    meme_data = {
+        "id": "1", "width": 120, "height": 90,
+        "image_name": "https://cdn.example.com/template.jpg",
+        "captions": [{"x": 0, "y": 0, "width": 120, "text": "hello", "fontSize": 14}]
+    }
+
+    with patch.object(generator, "download_image", return_value=Image.new("RGB", (600, 450), "blue")) as download:
+        first = generator.generate_image_from_meme_data(meme_data, str(tmp_path / "a"))
+        second = generator.generate_image_from_meme_data(meme_data, str(tmp_path / "b"))
+
+    assert download.call_count == 1
+    assert generator.resized_template_cache.stats()["hits"] == 1
+    # The cached bitmap must not pick up captions from earlier renders
+    cached = generator.resized_template_cache.get(("https://cdn.example.com/template.jpg", 120, 90, "quality"))
+    assert cached.getcolors() == [(120 * 90, (0, 0, 255))]
+    with Image.open(tmp_path / "a" / first) as a, Image.open(tmp_path / "b" / second) as b:
+        assert ImageChops.difference(a.convert("RGB"), b.convert("RGB")).getbbox() is None
+
+
+def test_identical_renders_share_one_content_addressed_file(generator, tmp_path):
+    """Test that renders are named by their inputs and repeated renders are skipped"""
+    meme_data = {"id": "1", "width": 240, "height": 200, "top_header_caption": "same text"}
+
+    first = generator.generate_image_from_meme_data(meme_data, str(tmp_path))
+    with patch.object(generator, "add_caption_to_image") as add_caption:
+        second = generator.generate_image_from_meme_data(dict(meme_data, id="2"), str(tmp_path))
+    assert second == first
+    add_caption.assert_not_called()
+    assert generator.find_rendered(meme_data, str(tmp_path)) == first
+
+    changed = generator.generate_image_from_meme_data(dict(meme_data, top_header_caption="other"), str(tmp_path))
+    webp = generator.generate_image_from_meme_data(meme_data, str(tmp_path), output_format="webp")
+    assert len({first, changed, webp}) == 3
+    # Atomic writes leave no temporary files behind
+    assert not [path for path in tmp_path.rglob(".tmp-*")]
+    # and give files the usual umask-based mode rather than the temporary file's 0600
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE((tmp_path / first).stat().st_mode) == 0o666 & ~umask
+
+
+def test_placeholder_templates_are_not_cached(generator, tmp_path):
+    """Test that download failures do not poison the resized template cache"""
+    generator.resized_template_cache = LRUCache(max_bytes=10 * 1024 * 1024, sizeof=image_nbytes)
+    meme_data = {"id": "1", "width": 120, "height": 90, "image_name": "https://cdn.example.com/missing.jpg"}
+
+    with patch.object(generator, "download_image", side_effect=lambda url, draft_size=None: generator.create_placeholder_image()):
+        output = generator.generate_image_from_meme_data(meme_data, str(tmp_path))
+
+    assert len(generator.resized_template_cache) == 0
+    # The content address stays free for a later render with the real template
+    assert output.endswith(".placeholder.png")
+    assert generator.find_rendered(meme_data, str(tmp_path)) is None
+
+
+def test_fast_mode_decodes_jpeg_at_reduced_scale(generator, tmp_path):
+    """Test draft decoding of large JPEG templates in fast mode"""
+    buffer = BytesIO()
+    Image.new("RGB", (1600, 1200), "green").save(buffer, "JPEG")
+
+    assert decode_image(buffer.getvalue()).size == (1600, 1200)
+    assert decode_image(buffer.getvalue(), (200, 150)).size == (200, 150)
+    assert decode_image(buffer.getvalue(), (300, 300)).size == (400, 300)
+
+    meme_data = {"id": "1", "width": 200, "height": 150, "image_name": "https://cdn.example.com/big.jpg"}
+    with patch.object(generator, "fetch_template") as fetch_template:
+        fetch_template.return_value.content = buffer.getvalue()
+        base_image = generator.fetch_base_image(meme_data, resize_mode="fast")
+        output = generator.generate_image_from_meme_data(meme_data, str(tmp_path), base_image, "fast")
+
+    assert base_image.size == (200, 150)
+    with Image.open(tmp_path / output) as image:
+        assert image.size == (200, 150)
+
+
+@pytest.mark.parametrize("output_format,pil_format", [("png", "PNG"), ("webp", "WEBP"), ("jpeg", "JPEG")])
+def test_generate_image_in_each_output_format(generator, tmp_path, output_format, pil_format):
+    """Test that renders are written in the requested format and extension"""
+    meme_data = {"id": "7", "width": 240, "height": 200, "top_header_caption": "top text"}
+
+    output = generator.generate_image_from_meme_data(
+        meme_data, str(tmp_path), output_format=output_format, quality=70
+    )
+
+    assert output == generator.rendered_key(meme_data, output_format=output_format, quality=70)
+    assert output.endswith(f".{ImageEncoder.extension(output_format)}")
+    with Image.open(tmp_path / output) as image:
+        assert image.format == pil_format
+        assert image.size == (240, 200)
+
+
+def test_image_encoder_rejects_unknown_formats():
+    """Test format validation and mode conversion for lossy formats"""
+    encoder = ImageEncoder()
+    with pytest.raises(UnsupportedFormatError):
+        encoder.encode(Image.new("RGB", (10, 10)), "bmp")
+    jpeg = encoder.encode(Image.new("RGBA", (10, 10)), "jpeg")
+    assert jpeg[:2] == b"\xff\xd8"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,285 @@
+"""
+Unit tests for the rendered meme storage backends and the routes serving them
+"""
+import os
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.routers import files as files_routes
+from app.routers import memes as memes_routes
+from app.services.meme_generator import SuperMemeGenerator
+from app.services.output_janitor import AccessThrottle, OutputJanitor
+from app.services.storage import (
+    IMMUTABLE_CACHE_CONTROL,
+    CachingStorage,
+    InvalidStorageKeyError,
+    LocalStorage,
+    MemoryStorage,
+    S3Storage,
+    validate_key
+)
+from app.utils.http_cache import RangeNotSatisfiableError, etag_matches, parse_byte_range
+
+
+class FakeS3Error(Exception):
+    """Mimics botocore's ClientError for missing objects"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """In-memory stand-in for an S3-compatible server such as MinIO"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def _get(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("NoSuchKey")
+        return self.objects[(Bucket, Key)]
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = {"Body": bytes(Body), **kwargs}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("404")
+        return {}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": BytesIO(self._get(Bucket, Key)["Body"])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+@pytest.fixture(params=["local", "memory", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path))
+    if request.param == "memory":
+        return MemoryStorage()
+    return S3Storage("memes", prefix="renders", client=FakeS3Client())
+
+
+def test_storage_round_trip(storage):
+    """Test put/get/exists/delete and URLs in each backend"""
+    key = "ab/abc123.png"
+    assert not storage.exists(key) and storage.get(key) is None
+
+    storage.put(key, b"first", "image/png")
+    storage.put(key, b"second", "image/png")
+    assert storage.exists(key)
+    assert storage.get(key) == b"second"
+    assert storage.url(key, "http://api.test/") == "http://api.test/static/memes/ab/abc123.png"
+    assert storage.describe(key).endswith("ab/abc123.png")
+
+    storage.delete(key)
+    storage.delete(key)
+    assert not storage.exists(key)
+
+
+def test_s3_storage_uses_prefix_and_public_url():
+    """Test object keys, caching headers and CDN URLs for the S3 backend"""
+    client = FakeS3Client()
+    storage = S3Storage("memes", prefix="/renders/", client=client, public_url="https://cdn.example.com/")
+    storage.put("ab/abc123.webp", b"data", "image/webp", IMMUTABLE_CACHE_CONTROL)
+    storage.put("ab/abc123.placeholder.webp", b"data", "image/webp")
+
+    stored = client.objects[("memes", "renders/ab/abc123.webp")]
+    assert stored["ContentType"] == "image/webp"
+    assert "immutable" in stored["CacheControl"]
+    assert client.objects[("memes", "renders/ab/abc123.placeholder.webp")]["CacheControl"] == "no-cache"
+    assert storage.url("ab/abc123.webp", "http://api.test") == "https://cdn.example.com/renders/ab/abc123.webp"
+    assert storage.location == "s3://memes/renders"
+
+
+@pytest.mark.parametrize("key", ["", "../secret", "/etc/passwd", "ab/../../secret", ".."])
+def test_storage_keys_cannot_escape_the_root(key):
+    """Test that traversal and absolute keys are rejected"""
+    with pytest.raises(InvalidStorageKeyError):
+        validate_key(key)
+
+
+def test_meme_files_are_served_from_storage(tmp_path):
+    """Test the serving route for remote and local backends"""
+    memory = MemoryStorage()
+    memory.put("ab/abc123.png", b"\x89PNG data", "image/png")
+    local = LocalStorage(str(tmp_path))
+    local.put("cd/cde456.webp", b"RIFF data", "image/webp")
+
+    with TestClient(app) as client:
+        with patch("app.routers.memes.get_storage", return_value=memory):
+            response = client.get("/static/memes/ab/abc123.png")
+            assert response.status_code == 200
+            assert response.content == b"\x89PNG data"
+            assert response.headers["content-type"] == "image/png"
+            assert client.get("/static/memes/ab/missing.png").status_code == 404
+            assert client.get("/static/memes/..%2F..%2Fmain.py").status_code == 404
+
+        with patch("app.routers.memes.get_storage", return_value=local):
+            response = client.get("/static/memes/cd/cde456.webp")
+            assert response.status_code == 200
+            assert response.content == b"RIFF data"
+            assert client.get("/static/memes/cd/missing.webp").status_code == 404
+
+
+def test_caching_storage_serves_repeat_reads_from_memory(tmp_path):
+    """Test that written and read files are kept in the bounded memory cache"""
+    local = LocalStorage(str(tmp_path))
+    local.put("ab/old.png", b"old")
+    storage = CachingStorage(local, max_bytes=8)
+
+    storage.put("ab/new.png", b"new")
+    assert storage.get_cached("ab/new.png") == b"new"
+    assert storage.get_cached("ab/old.png") is None
+    assert storage.get("ab/old.png") == b"old"
+    assert storage.get_cached("ab/old.png") == b"old"
+
+    storage.put("ab/big.png", b"x" * 100)
+    assert storage.get_cached("ab/big.png") is None and storage.exists("ab/big.png")
+    local.delete("ab/new.png")
+    assert not storage.exists("ab/new.png")
+
+
+def test_byte_range_and_etag_parsing():
+    """Test single byte ranges, suffix ranges and If-None-Match matching"""
+    assert parse_byte_range("bytes=0-3", 10) == (0, 3)
+    assert parse_byte_range("bytes=5-", 10) == (5, 9)
+    assert parse_byte_range("bytes=-4", 10) == (6, 9)
+    assert parse_byte_range("bytes=2-100", 10) == (2, 9)
+    assert parse_byte_range("bytes=0-1,4-5", 10) is None
+    assert parse_byte_range("bytes=x-", 10) is None
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_byte_range("bytes=10-", 10)
+
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+
+
+def test_rendered_placeholders_are_never_stored_as_immutable():
+    """Test the cache policy the renderer passes for renders and placeholders"""
+    client = FakeS3Client()
+    generator = SuperMemeGenerator(
+        api_url="http://upstream.invalid",
+        supabase_url="http://supabase.invalid",
+        supabase_api_key="test",
+        mail_api_url="http://mail.invalid",
+        storage=S3Storage("memes", client=client)
+    )
+    meme_data = {"id": "1", "width": 120, "height": 90, "image_name": "https://cdn.example.com/t.jpg", "captions": []}
+    with patch.object(generator, "fetch_template", side_effect=ConnectionError("offline")):
+        placeholder_key = generator.generate_image_from_meme_data(meme_data, "unused")
+    with patch.object(generator, "download_image", return_value=Image.new("RGB", (120, 90), "blue")):
+        key = generator.generate_image_from_meme_data(meme_data, "unused")
+
+    assert ".placeholder." in placeholder_key and ".placeholder." not in key
+    assert client.objects[("memes", placeholder_key)]["CacheControl"] == "no-cache"
+    assert "immutable" in client.objects[("memes", key)]["CacheControl"]
+
+
+def test_content_addressed_memes_are_cacheable():
+    """Test strong ETags, immutable caching, conditional GET and range requests"""
+    digest = "ab" + "0" * 62
+    key = f"ab/{digest}.png"
+    storage = MemoryStorage()
+    storage.put(key, b"0123456789", "image/png")
+    storage.put(f"ab/{digest}.placeholder.png", b"placeholder", "image/png")
+
+    with TestClient(app) as client, patch("app.routers.memes.get_storage", return_value=storage):
+        response = client.get(f"/static/memes/{key}")
+        assert response.status_code == 200
+        assert response.headers["etag"] == f'"{digest}"'
+        assert "immutable" in response.headers["cache-control"]
+        assert response.headers["accept-ranges"] == "bytes"
+
+        not_modified = client.get(f"/static/memes/{key}", headers={"If-None-Match": f'"{digest}"'})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+
+        partial = client.get(f"/static/memes/{key}", headers={"Range": "bytes=2-5"})
+        assert partial.status_code == 206
+        assert partial.content == b"2345"
+        assert partial.headers["content-range"] == "bytes 2-5/10"
+
+        stale = client.get(f"/static/memes/{key}", headers={"Range": "bytes=2-5", "If-Range": '"other"'})
+        assert stale.status_code == 200 and stale.content == b"0123456789"
+
+        unsatisfiable = client.get(f"/static/memes/{key}", headers={"Range": "bytes=50-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == "bytes */10"
+
+        placeholder = client.get(f"/static/memes/ab/{digest}.placeholder.png")
+        assert placeholder.headers["cache-control"] == "no-cache"
+        assert placeholder.headers["etag"] != f'"{digest}"'
+
+
+def test_meme_variants_are_resized_reencoded_and_cached():
+    """Test thumbnails for allow-listed widths, format conversion and the variant cache"""
+    buffer = BytesIO()
+    Image.new("RGB", (640, 480), "red").save(buffer, "PNG")
+    digest = "cd" + "1" * 62
+    key = f"cd/{digest}.png"
+    storage = MemoryStorage()
+    storage.put(key, buffer.getvalue(), "image/png")
+
+    with TestClient(app) as client, patch("app.routers.memes.get_storage", return_value=storage):
+        renderer = memes_routes.get_variant_renderer()
+        thumbnail = client.get(f"/static/memes/{key}?w=160&format=webp")
+        assert thumbnail.status_code == 200
+        assert thumbnail.headers["content-type"] == "image/webp"
+        assert thumbnail.headers["etag"] == f'"{digest}-w160-webp"'
+        assert "immutable" in thumbnail.headers["cache-control"]
+        with Image.open(BytesIO(thumbnail.content)) as image:
+            assert image.format == "WEBP" and image.size == (160, 120)
+
+        hits = renderer.stats()["hits"]
+        again = client.get(f"/static/memes/{key}?w=160&format=webp")
+        assert again.content == thumbnail.content
+        assert renderer.stats()["hits"] == hits + 1
+
+        same_format = client.get(f"/static/memes/{key}?w=320")
+        assert same_format.headers["content-type"] == "image/png"
+        with Image.open(BytesIO(same_format.content)) as image:
+            assert image.size == (320, 240)
+
+        assert client.get(f"/static/memes/{key}?w=161").status_code == 400
+        assert client.get(f"/static/memes/{key}?format=bmp").status_code == 400
+        assert client.get("/static/memes/cd/missing.png?w=160").status_code == 404
+
+
+def test_served_memes_outlive_unserved_older_ones(tmp_path):
+    """Test that serving a meme, even from memory, protects it from least-recently-used eviction"""
+    storage = CachingStorage(LocalStorage(str(tmp_path)), max_bytes=1024)
+    served = f"ab/{'a' * 64}.png"
+    unserved = f"cd/{'c' * 64}.png"
+    storage.put(served, b"served", "image/png")
+    storage.put(unserved, b"unserved", "image/png")
+    now = time.time()
+    os.utime(storage.local_path(served), (now - 3000, now - 3000))
+    os.utime(storage.local_path(unserved), (now - 2000, now - 2000))
+
+    with TestClient(app) as client, \
+            patch("app.routers.memes.get_storage", return_value=storage), \
+            patch.object(files_routes, "access_throttle", AccessThrottle(60)):
+        assert storage.get_cached(served) is not None
+        for _ in range(3):
+            assert client.get(f"/static/memes/{served}").status_code == 200
+        assert files_routes.access_throttle.should_record(served) is False
+
+    OutputJanitor(str(tmp_path), max_files=1).sweep()
+    assert storage.backend.exists(served)
+    assert not storage.backend.exists(unserved)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])